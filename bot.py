@@ -6,6 +6,7 @@ from discord.ext import commands, tasks
 from dotenv import load_dotenv
 import os
 import logging
+from utils.db_utils import initialize_db
 
 # ───────────────────────────────────────────────────────────────
 # LOGGING
@@ -37,6 +38,7 @@ client = commands.Bot(command_prefix="c!", intents=intents)
 # GLOBAL ASYNCPG POOL (Supabase FIX)
 # ───────────────────────────────────────────────────────────────
 pool = None
+schema_ready = False  # initialize_db() has run in this process
 
 async def init_db_pool():
     global pool
@@ -176,6 +178,16 @@ async def on_ready():
 
     await init_db_pool()   
     client.pool = pool
+
+    # on_ready fires again after every reconnect; the schema setup takes
+    # ACCESS EXCLUSIVE locks, so it runs once per process
+    global schema_ready
+    if not schema_ready:
+        try:
+            await asyncio.to_thread(initialize_db)
+            schema_ready = True
+        except Exception as e:
+            logging.error(f"[DB ERROR] Could not run schema migrations: {e}")
     update_stats.start()   
 
     # Load command extensions
@@ -8,7 +8,9 @@ from discord.ext import commands, tasks
 from discord import Interaction
 from discord.app_commands import AppCommandError
 from utils.rank_utils import update_rank_role, get_rank
-from utils.db_utils import load_elo_data, save_elo_data, get_match_distribution
+from utils.db_utils import load_elo_data, get_match_distribution
+from utils.replay import rebuild_ratings, reset_season, set_rating, START_ELO
+from utils.rank_worker import rank_role_worker
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -23,10 +25,9 @@ class ResetConfirmModal(discord.ui.Modal, title="Are you sure you wish to reset
         required=True
     )
 
-    def __init__(self, interaction: Interaction, elo_data):
+    def __init__(self, interaction: Interaction):
         super().__init__()
         self.interaction = interaction
-        self.elo_data = elo_data
 
     async def on_submit(self, interaction: Interaction):
         if self.confirmation.value.strip().upper() != "CONFIRM":
@@ -34,14 +35,9 @@ class ResetConfirmModal(discord.ui.Modal, title="Are you sure you wish to reset
             return
         
         try:
-            # Reset data but keep uid, mirror_id, and points
-            for player_id, player_data in self.elo_data.items():
-                self.elo_data[player_id]["elo"] = 200
-                self.elo_data[player_id]["win_rate"] = 0.0
-                self.elo_data[player_id]["games_played"] = 0
-
-            # Save changes
-            save_elo_data(self.elo_data)
+            # Reset ratings but keep uid, mirror_id, and points; under the
+            # exclusive rating lock, recording the season boundary for replays
+            await asyncio.to_thread(reset_season)
 
             await interaction.response.send_message("It’s done… All player stats have been reset. A new season begins — may your journey be filled with grace.")
         except Exception as e:
@@ -225,8 +221,8 @@ class AdminCommands(commands.Cog):
                 old_elo = elo_data[player_id]["elo"]
                 elo_data[player_id]["elo"] = new_rating
 
-            # Save changes
-            save_elo_data(elo_data)
+            # Save changes (and rebase rating checkpoints so undos keep them)
+            await asyncio.to_thread(set_rating, player_id, new_rating)
 
             # Create embed response
             embed = discord.Embed(
@@ -279,8 +275,7 @@ class AdminCommands(commands.Cog):
 
         """Reset ELO, win rate, and games played for all players, keeping UID."""
         try:
-            elo_data = load_elo_data()
-            modal = ResetConfirmModal(interaction, elo_data)
+            modal = ResetConfirmModal(interaction)
             await interaction.response.send_modal(modal)
            
         except Exception as e:
@@ -292,6 +287,58 @@ class AdminCommands(commands.Cog):
             except Exception as inner:
                 print(f"❌ Could not send error message: {inner}")
 
+    @app_commands.command(name="replay-ratings", description="Replay the match history to recompute every rating.")
+    @app_commands.guilds(GUILD_ID)
+    @app_commands.describe(
+        since_match_id="First match to replay from (default: start of the current season)",
+        apply="Write the replayed ratings (default: preview only)"
+    )
+    async def replay_ratings(self, interaction: Interaction, since_match_id: int = None, apply: bool = False):
+        if interaction.user.id != OWNER_ID:
+            await interaction.response.send_message(
+                "<:Unamurice:1349309283669377064> O-oh… I’m sorry, but only Haya may realign the threads of fate like this...\n"
+                "*You’re not Haya, are you…?*",
+                ephemeral=True
+            )
+            return
+
+        await interaction.response.defer(ephemeral=True)
+        try:
+            summary = await asyncio.to_thread(rebuild_ratings, since_match_id, apply=apply)
+        except Exception as e:
+            await interaction.followup.send(f"❌ Replay failed: `{e}`", ephemeral=True)
+            return
+
+        movers = sorted(
+            ((pid, old, new) for pid, (old, new) in summary["changes"].items() if old is not None),
+            key=lambda x: abs(x[2] - x[1]),
+            reverse=True
+        )[:10]
+
+        embed = Embed(
+            title="Ratings Replayed" if apply else "Ratings Replay (preview)",
+            description=(
+                f"{summary['matches']} matches from #{summary['since_match_id']} "
+                f"for {summary['players']} players in {summary['seconds']:.2f}s"
+                + (f"\n{summary['skipped']} malformed matches skipped" if summary['skipped'] else "")
+            ),
+            color=0xB197FC
+        )
+        if movers:
+            embed.add_field(
+                name="Biggest Changes",
+                value="\n".join(f"<@{pid}>: {old:.0f} → {new:.0f} ({new - old:+.0f})" for pid, old, new in movers),
+                inline=False
+            )
+        embed.set_footer(text="Kyasutorisu Admin Stats Report")
+        await interaction.followup.send(embed=embed, ephemeral=True)
+
+        if apply:
+            rank_role_worker.enqueue(interaction.guild, {
+                pid: new - (old if old is not None else START_ELO)
+                for pid, (old, new) in summary["changes"].items()
+            })
+
     @app_commands.command(name="stats-match", description="Show detailed match stats by preban and joker count.")
     @app_commands.guilds(GUILD_ID)
     async def match_info(self, interaction: Interaction):
@@ -10,6 +10,8 @@ from typing import List
 import os
 from dotenv import load_dotenv
 
+from .registry import registry
+
 load_dotenv()
 POSTGRES_URL = os.getenv("DATABASE_URL")
 GUILD_ID = int(os.getenv("DISCORD_GUILD_ID"))
@@ -76,7 +78,8 @@ class UnitInfo(commands.Cog):
         self.cached_names: list[str] = []
         self.name_lookup_map: dict[str, str] = {}
         self.last_cache_time = 0.0
-        self.cache_duration = 300  # seconds
+        self.cache_duration = 300  # seconds, only used until the registry has loaded
+        self.names_version = 0     # registry.version the names were built from
         self._refreshing = False
 
     async def get_pool(self):
@@ -96,9 +99,7 @@ class UnitInfo(commands.Cog):
             )
         return self.db_pool
 
-    async def _refresh_names_task(self):
-        pool = await self.get_pool()
-        rows = await pool.fetch("SELECT name, subname FROM characters")
+    def _set_names(self, rows):
         name_map: dict[str, str] = {}
         for row in rows:
             name = row["name"]
@@ -111,7 +112,19 @@ class UnitInfo(commands.Cog):
         self.name_lookup_map = name_map
         self.last_cache_time = time.time()
 
+    async def _refresh_names_task(self):
+        pool = await self.get_pool()
+        rows = await pool.fetch("SELECT name, subname FROM characters")
+        self._set_names(rows)
+
     async def fetch_cached_names(self, non_blocking: bool = False):
+        # The character registry already tracks table changes; rebuild only when it swapped
+        if registry.loaded:
+            if self.names_version != registry.version:
+                self._set_names(registry.rows.values())
+                self.names_version = registry.version
+            return
+
         now = time.time()
         # If cache is fresh, nothing to do.
         if self.cached_names and now - self.last_cache_time <= self.cache_duration:
@@ -7,135 +7,14 @@ from discord import app_commands
 from discord import Interaction, Embed, Color
 from discord import Object
 from utils.db_utils import load_elo_data, save_elo_data
-from utils.views import UpdateEloView, TiebreakerView
+from utils.views import UpdateEloView, TiebreakerView, SeriesConfirmView
+from utils.submission import parse_submission_string
 from dotenv import load_dotenv
 
 load_dotenv()
 
 GUILD_ID = int(os.getenv("DISCORD_GUILD_ID"))
 
-# --- PARSE SUBMISSION STRING ---
-def parse_submission_string(submission: str):
-    # Slot map by position
-    slot_map = {
-        1: ("blue_bans", 2),
-        2: ("red_bans", 2),
-        3: ("blue_picks", 4),
-        4: ("red_picks", 4),
-        5: ("red_picks", 4),
-        6: ("blue_picks", 4),
-        7: ("blue_bans", 2),
-        8: ("red_bans", 2),
-        9: ("red_picks", 4),
-        10: ("blue_picks", 4),
-        11: ("blue_picks", 4),
-        12: ("red_picks", 4),
-        13: ("red_picks", 4),
-        14: ("blue_picks", 4),
-        15: ("blue_picks", 4),
-        16: ("red_picks", 4),
-        17: ("red_picks", 4),
-        18: ("blue_picks", 4),
-        19: ("blue_picks", 4),
-        20: ("red_picks", 4)
-    }
-
-    index = 0
-    parsed = {
-        "blue_bans": [], "red_bans": [],
-        "blue_picks": [], "red_picks": []
-    }
-
-    for slot in range(1, 21):
-        key, length = slot_map[slot]
-        raw = submission[index:index + length]
-        if length == 2:
-            parsed[key].append({"code": raw})
-        else:
-            parsed[key].append({
-                "code": raw[:2],
-                "eidolon": int(raw[2]),
-                "superimposition": int(raw[3])
-            })
-        index += length
-        
-    blue_first = int(submission[index:index+2])
-    index += 2
-    blue_second = int(submission[index:index+2])
-    index += 2
-    red_first = int(submission[index:index+2])
-    index += 2
-    red_second = int(submission[index:index+2])
-    index += 2
-
-    for name, value in zip(["blue_first", "blue_second", "red_first", "red_second"],
-                           [blue_first, blue_second, red_first, red_second]):
-        if value < 0 or value > 15:
-            raise ValueError(
-                f"U-Um… `{name}` was `{value}`, but only 0 to 15 cycles are allowed! "
-                "I’m really sorry… could you double-check your code?"
-            )
-
-    blue_cycle_penalty = int(submission[index:index+2])
-    index += 2
-    red_cycle_penalty = int(submission[index:index+2])
-    index += 2
-
-    blue_time_penalty = int(submission[index:index+2])
-    index += 2
-    red_time_penalty = int(submission[index:index+2])
-    index += 2
-
-    blue_penalty = blue_cycle_penalty + blue_time_penalty
-    red_penalty = red_cycle_penalty + red_time_penalty
-
-    blue_points = int(submission[index:index+2])
-    index += 2
-    red_points = int(submission[index:index+2])
-    index += 2
-
-    side_selector = submission[index]  # 'b' or 'r'
-    index += 1
-
-    # Parse prebans and jokers
-    split = submission[index:].split("|")
-    prebans = [split[0][i:i + 2] for i in range(0, len(split[0]), 2)] if split and split[0] else []
-    jokers = [split[1][i:i + 2] for i in range(0, len(split[1]), 2)] if len(split) > 1 else []
-
-    total_blue_cycles = blue_first + blue_second + blue_penalty
-    total_red_cycles = red_first + red_second + red_penalty
-
-    if total_blue_cycles < total_red_cycles:
-        winner = "blue"
-    elif total_red_cycles < total_blue_cycles:
-        winner = "red"
-    else:
-        # Cycle clear is tied, check points
-        if blue_points < red_points:
-            winner = "blue"
-        elif red_points < blue_points:
-            winner = "red"
-        else:
-            # Both cycle clear and points are tied
-            winner = "tie"
-    
-    parsed.update({
-        "blue_cycles": [blue_first, blue_second],
-        "red_cycles": [red_first, red_second],
-        "blue_penalty": blue_penalty,
-        "red_penalty": red_penalty,
-        "blue_points": blue_points,
-        "red_points": red_points,
-        "winner": winner,
-        "prebans": prebans,
-        "jokers": jokers,
-        "total_blue_cycles": total_blue_cycles,
-        "total_red_cycles": total_red_cycles,
-        "side_selector": side_selector
-    })
-
-    return parsed
-
 class EloCommands(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
@@ -281,5 +160,101 @@ class EloCommands(commands.Cog):
             print(f"A quiet fracture in update-elo command: {e}")
             await interaction.followup.send("I-I'm so sorry… something went wrong while adjusting the threads.\nPlease try again in a moment — I’ll stay right here.", ephemeral=True)
 
+    @app_commands.command(name="submit-series", description="Whisper a whole set (Bo3/Bo5)... and I shall weave every game at once.")
+    @app_commands.guilds(GUILD_ID)
+    @app_commands.describe(
+        blue_player_1="Blue Team Player 1",
+        blue_player_2="Blue Team Player 2",
+        red_player_1="Red Team Player 1",
+        red_player_2="Red Team Player 2",
+        game_1="Code from the match website for game 1",
+        game_2="Code for game 2",
+        game_3="Code for game 3 (optional)",
+        game_4="Code for game 4 (optional)",
+        game_5="Code for game 5 (optional)",
+    )
+    async def submit_series(
+        self,
+        interaction: Interaction,
+        blue_player_1: discord.Member,
+        blue_player_2: discord.Member,
+        red_player_1: discord.Member,
+        red_player_2: discord.Member,
+        game_1: str,
+        game_2: str,
+        game_3: str = None,
+        game_4: str = None,
+        game_5: str = None
+    ):
+        await interaction.response.defer()
+
+        try:
+            if (blue_player_1 in [red_player_1, red_player_2]) or (blue_player_2 in [red_player_1, red_player_2]):
+                await interaction.followup.send("<:Unamurice:1349309283669377064> U-Um… I think you might’ve listed the same soul on both teams... I’m sorry, but each thread must belong to just one side.", ephemeral=False)
+                return
+
+            games = []
+            for number, submission_string in enumerate([game_1, game_2, game_3, game_4, game_5], start=1):
+                if not submission_string:
+                    continue
+                try:
+                    data = parse_submission_string(submission_string.strip())
+                except (ValueError, IndexError) as e:
+                    await interaction.followup.send(f"Game {number}: {e}", ephemeral=True)
+                    return
+                if data["winner"] == "tie":
+                    await interaction.followup.send(
+                        f"Game {number} is a perfect tie in both cycles and points... "
+                        "Please submit that game on its own with `/submit-match` so destiny can be chosen by hand.",
+                        ephemeral=True
+                    )
+                    return
+                games.append(data)
+
+            blue_wins = sum(1 for data in games if data["winner"] == "blue")
+            red_wins = len(games) - blue_wins
+
+            embed = discord.Embed(
+                title="Threads of Fate: Series Summary",
+                color=discord.Color.blue() if blue_wins > red_wins else discord.Color.red(),
+                description="Many threads have crossed... and a longer tale unfolds."
+            )
+            embed.add_field(
+                name="Blue Team",
+                value=f"{blue_player_1.display_name} & {blue_player_2.display_name}",
+                inline=True
+            )
+            embed.add_field(
+                name="Red Team",
+                value=f"{red_player_1.display_name} & {red_player_2.display_name}",
+                inline=True
+            )
+            for number, data in enumerate(games, start=1):
+                embed.add_field(
+                    name=f"Game {number} — {'Blue' if data['winner'] == 'blue' else 'Red'} Team",
+                    value=f"Blue: {data['blue_cycles'][0]} + {data['blue_cycles'][1]} (+{data['blue_penalty']}) · {data['blue_points']} pts\n"
+                        f"Red: {data['red_cycles'][0]} + {data['red_cycles'][1]} (+{data['red_penalty']}) · {data['red_points']} pts",
+                    inline=False
+                )
+            embed.add_field(name="Series Score", value=f"Blue {blue_wins} – {red_wins} Red", inline=False)
+            embed.set_footer(text="Threads arranged with care… by Kyasutorisu")
+
+            view = SeriesConfirmView(
+                blue_team=[blue_player_1, blue_player_2],
+                red_team=[red_player_1, red_player_2],
+                games=games,
+                allowed_user_id=interaction.user.id
+            )
+
+            mentioned_users = {blue_player_1, blue_player_2, red_player_1, red_player_2}
+            user_mentions = " ".join(user.mention for user in mentioned_users)
+            message_content = f"{user_mentions}\nHave the threads of this series been woven as intended...? If something feels off, I shall mend it with care."
+
+            await interaction.followup.send(content=message_content, embed=embed, view=view)
+
+        except Exception as e:
+            print(f"A quiet fracture in submit-series command: {e}")
+            await interaction.followup.send("I-I'm so sorry… something went wrong while adjusting the threads.\nPlease try again in a moment — I’ll stay right here.", ephemeral=True)
+
 async def setup(bot):
     await bot.add_cog(EloCommands(bot))
\ No newline at end of file
@@ -1,10 +1,9 @@
 import discord
+import asyncio
 import random
 import os
 import re
-import io
-import math
-from typing import List, Optional, Dict
+from typing import List
 
 from discord.ext import commands
 from discord import app_commands
@@ -15,14 +14,10 @@ from utils.rank_utils import get_rank
 from dotenv import load_dotenv
 
 # for roster images
-import aiohttp
-from PIL import Image, ImageDraw, ImageEnhance, ImageFont
-
-from . import shared_cache  
+from .render import match_roster_parts, send_match_announcement
 
 load_dotenv()
 GUILD_ID = int(os.getenv("DISCORD_GUILD_ID"))
-ROSTER_API = os.getenv("ROSTER_API") or "https://draft-api.cipher.uno/user"
 
 ALLOWED_COLORS = {
     "red": 0xFF4C4C,
@@ -40,33 +35,6 @@ ALLOWED_COLORS = {
     "magenta": 0xFF00FF,
 }
 
-# ───────────── fonts for roster images ─────────────
-
-FONT_PATH = os.path.join(
-    os.path.dirname(__file__),
-    "fonts",
-    "NotoSansSC-VariableFont_wght.ttf",
-)
-
-try:
-    BADGE_FONT = ImageFont.truetype(
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 15
-    )
-except Exception:
-    BADGE_FONT = ImageFont.load_default()
-
-
-def load_title_font(size: int) -> ImageFont.FreeTypeFont:
-    """Try to load HSR-like font, fallback to default if missing."""
-    try:
-        return ImageFont.truetype(FONT_PATH, size)
-    except Exception:
-        try:
-            return ImageFont.truetype("DejaVuSans.ttf", size)
-        except Exception:
-            return ImageFont.load_default()
-
-
 # ───────────── Modals ─────────────
 
 
@@ -302,14 +270,8 @@ class MatchmakingTeamSelect(discord.ui.View):
         team1, team2 = ordered_players[:2], ordered_players[2:]
         channel = interaction.channel
 
-        # Announce match (same style as queue)
-        mentions = ", ".join(p.mention for p in ordered_players)
-        await channel.send(
-            f"**Match Found!**\n"
-            f"**Players:** {mentions}\n"
-            f"Fate has woven your paths together. Best of luck"
-        )
-
+        # Announce match (same style as queue): prebans and roster cards are
+        # prepared concurrently, then everything goes out as one message
         match_embed = discord.Embed(
             title="Threads Aligned",
             description="The threads have been gently woven… Here is your match.",
@@ -322,17 +284,24 @@ class MatchmakingTeamSelect(discord.ui.View):
             name="Team 2", value=f"{team2[0].mention} & {team2[1].mention}", inline=False
         )
         match_embed.set_footer(text="Woven gently by Kyasutorisu")
-        await channel.send(embed=match_embed)
-
-        # Prebans embed (same logic as queue)
-        prebans_embed = self.cog._build_prebans_embed(team1, team2)
-        await channel.send(embed=prebans_embed)
 
-        # Roster images (Team 1 then Team 2)
+        mentions = ", ".join(p.mention for p in ordered_players)
         try:
-            await self.cog._send_match_rosters(channel, team1, team2)
+            prebans_embed, (roster_embeds, roster_files) = await asyncio.gather(
+                asyncio.to_thread(self.cog._build_prebans_embed, team1, team2),
+                match_roster_parts(team1, team2),
+            )
+            await send_match_announcement(
+                channel,
+                f"**Match Found!**\n"
+                f"**Players:** {mentions}\n"
+                f"Fate has woven your paths together. Best of luck",
+                [match_embed, prebans_embed],
+                roster_embeds,
+                roster_files,
+            )
         except Exception as e:
-            print(f"[matchmaking] Failed to send match rosters: {e}")
+            print(f"[matchmaking] Failed to announce match: {e}")
 
         self.stop()
 
@@ -465,241 +434,6 @@ class MatchmakingCommands(commands.Cog):
         embed.set_footer(text="Handled with care by Kyasutorisu")
         return embed
 
-    # ─────────── roster helpers ───────────
-    async def _fetch_profile_characters(
-        self,
-        session: aiohttp.ClientSession,
-        discord_id: str
-    ) -> Optional[dict]:
-        if not discord_id:
-            return None
-
-        url = f"{ROSTER_API}/{discord_id}/profile-characters"
-        try:
-            async with session.get(url) as resp:
-                if resp.status == 404:
-                    return None
-                if resp.status != 200:
-                    return None
-
-                data = await resp.json()
-                if isinstance(data, dict) and isinstance(data.get("profileCharacters"), list):
-                    return data
-                return None
-        except Exception:
-            return None
-
-    def _build_team_roster_image(
-        self,
-        team: List[Member],
-        entry1: Optional[dict],
-        entry2: Optional[dict],
-        team_label: str,
-    ) -> Optional[io.BytesIO]:
-
-
-        # must be 2 players
-        if len(team) < 2:
-            return None
-
-        p1, p2 = team[0], team[1]
-
-        if not entry1 and not entry2:
-            return None
-
-        owned1 = {c["id"]: c["eidolon"] for c in entry1.get("profileCharacters", [])} if entry1 else {}
-        owned2 = {c["id"]: c["eidolon"] for c in entry2.get("profileCharacters", [])} if entry2 else {}
-
-        has_gp1 = "9999" in owned1
-        has_gp2 = "9999" in owned2
-
-        # union of both players' owned roster
-        combined_owned = set(owned1.keys()) | set(owned2.keys())
-
-        char_map_cache = shared_cache.char_map_cache
-        icon_cache = shared_cache.icon_cache
-        if not char_map_cache:
-            return None
-
-        # ******** sorting *******
-        def sort_key(c: dict):
-            return (
-                0 if c["id"] in combined_owned else 1,
-                -c["rarity"],
-                c["name"],
-            )
-
-        sorted_chars = sorted(char_map_cache.values(), key=sort_key)
-
-        # ******** layout ********
-        ICON = 110
-        GAP = 8
-        PADDING = 20
-        PER_ROW = 8
-
-        rows_count = max(1, math.ceil(len(sorted_chars) / PER_ROW))
-        width = PADDING * 2 + PER_ROW * ICON + (PER_ROW - 1) * GAP
-
-        title_text = f"{p1.display_name} • {p2.display_name}"
-
-        title_font = load_title_font(40)
-        dummy = Image.new("RGB", (1, 1))
-        draw_dummy = ImageDraw.Draw(dummy)
-        tb = draw_dummy.textbbox((0, 0), title_text, font=title_font)
-        title_h = tb[3] - tb[1]
-
-
-        TITLE_TOP = 30
-        UNDERLINE_GAP = 8
-        UNDERLINE_EXTRA = 24
-
-        title_block_bottom = TITLE_TOP + title_h + UNDERLINE_GAP + 3 + UNDERLINE_EXTRA
-        grid_top = title_block_bottom + PADDING
-        grid_height = rows_count * ICON + (rows_count - 1) * GAP + PADDING
-        height = grid_top + grid_height
-
-        canvas = Image.new("RGBA", (width, height), (10, 10, 10, 255))
-        draw = ImageDraw.Draw(canvas)
-
-        for y in range(height):
-            t = y / (height - 1)
-            r = int(14 + (28 - 14) * t)
-            g = int(10 + (18 - 10) * t)
-            b = int(30 + (52 - 30) * t)
-            draw.line([(0, y), (width, y)], fill=(r, g, b, 255))
-
-        # ******** Title + underline ********
-        title_bbox = draw.textbbox((0, 0), title_text, font=title_font)
-        title_w = title_bbox[2] - title_bbox[0]
-        title_x = (width - title_w) // 2
-        title_y = TITLE_TOP
-
-        draw.text(
-            (title_x, title_y),
-            title_text,
-            font=title_font,
-            fill="white",
-        )
-
-        gp_icon = shared_cache.gp_icon
-
-        if gp_icon:
-            icon_y = title_y + 5
-
-            def draw_gp_icon(x_pos, has_gp):
-                icon = gp_icon.copy()
-
-                if not has_gp:
-                    icon = ImageEnhance.Brightness(icon).enhance(0.3)
-                    icon = icon.convert("LA").convert("RGBA")
-
-                canvas.paste(icon, (x_pos, icon_y), icon)
-
-            draw_gp_icon(title_x - 40, has_gp1)
-            draw_gp_icon(title_x + title_w + 8, has_gp2)
-
-        underline_y = title_y + title_h + UNDERLINE_GAP + 10
-        margin = int(width * 0.28)
-        draw.line([(margin, underline_y), (width - margin, underline_y)],
-                fill=(255, 255, 255, 180), width=3)
-
-        # ******** Icons + Eidolon Badges ********
-        for idx, c in enumerate(sorted_chars):
-            col = idx % PER_ROW
-            row = idx // PER_ROW
-
-            x = PADDING + col * (ICON + GAP)
-            y = grid_top + row * (ICON + GAP)
-
-            icon = icon_cache.get(c["id"])
-            if not icon:
-                continue
-            
-            if icon.size != (ICON, ICON):
-                icon = icon.resize((ICON, ICON), Image.LANCZOS)
-
-            # dim unowned
-            icon = icon.copy()
-            if c["id"] not in combined_owned:
-                icon = ImageEnhance.Brightness(icon).enhance(0.35)
-                icon = icon.convert("LA").convert("RGBA")
-
-            # icon 
-            canvas.paste(icon, (x, y), icon)
-
-            # *****************
-            # EID BADGES 
-            # *****************
-            badge_w, badge_h = 40, 26
-            badge_y = y + ICON - badge_h - 4
-
-            def draw_badge(e_value: int, bx: int):
-
-                draw.rounded_rectangle(
-                    [bx, badge_y, bx + badge_w, badge_y + badge_h],
-                    radius=8,
-                    fill=(0, 0, 0, 190),
-                )
-
-
-                text = f"E{e_value}"
-                text_bbox = draw.textbbox((0, 0), text, font=BADGE_FONT)
-                tw = text_bbox[2] - text_bbox[0]
-                th = text_bbox[3] - text_bbox[1]
-
-                tx = bx + (badge_w - tw) // 2
-                ty = badge_y + (badge_h - th) // 2 - 3
-
-                draw.text((tx, ty), text, font=BADGE_FONT, fill="white")
-
-            e1 = owned1.get(c["id"])
-            e2 = owned2.get(c["id"])
-
-            if e1 is not None:
-                draw_badge(e1, x + 4)
-            if e2 is not None:
-                draw_badge(e2, x + ICON - badge_w - 4)
-
-        # return buffer
-        buffer = io.BytesIO()
-        canvas.save(buffer, "PNG")
-        buffer.seek(0)
-        return buffer
-
-
-
-    async def _send_match_rosters(
-        self,
-        channel: discord.abc.Messageable,
-        team1: List[Member],
-        team2: List[Member],
-    ):
-        char_map_cache = shared_cache.char_map_cache
-        icon_cache = shared_cache.icon_cache
-        if not char_map_cache or not icon_cache:
-            return
-
-        timeout = aiohttp.ClientTimeout(total=20, connect=5, sock_read=15)
-
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            team_pairs = [(team1, "Team 1"), (team2, "Team 2")]
-
-            for idx, (team, label) in enumerate(team_pairs, start=1):
-                if len(team) < 2:
-                    continue
-
-                id1 = str(team[0].id)
-                id2 = str(team[1].id)
-
-                entry1 = await self._fetch_profile_characters(session, id1)
-                entry2 = await self._fetch_profile_characters(session, id2)
-
-                buf = self._build_team_roster_image(team, entry1, entry2, label)
-                if buf:
-                    await channel.send(
-                        file=discord.File(buf, filename=f"team{idx}_roster.png")
-                    )
-
     # ─────────── Slash commands ───────────
 
     @app_commands.command(
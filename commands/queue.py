@@ -2,199 +2,136 @@
 import discord
 import os
 import asyncio
-import random
-import io
-import math
+import time
 from typing import Optional, List, Dict
 
 from discord.ext import commands
 from discord import app_commands, Interaction
 from dotenv import load_dotenv
 
-import aiohttp
-from PIL import Image, ImageDraw, ImageEnhance, ImageFont
-
 # DB helpers
-from utils.db_utils import load_elo_data
-from . import shared_cache
+from utils.db_utils import load_elo_data, load_players
+from utils.team_formation import DEFAULT_ELO, candidates_from, form_duels, form_matches
+from utils.queue_manager import NamedQueue, QueueManager, QueueSpec
+from utils.queue_store import QueueStore
+from utils.scheduler import TimerScheduler
+from .render import match_roster_parts, send_match_announcement
 
 load_dotenv()
 
 GUILD_ID = int(os.getenv("DISCORD_GUILD_ID", "0"))
-ROSTER_API = os.getenv("ROSTER_API") or "https://draft-api.cipher.uno/user"
 PVP_BANNED_ROLE = "pvp banned"
 
-# Font paths (same pattern as roster.py)
-FONT_PATH = os.path.join(
-    os.path.dirname(__file__),
-    "fonts",
-    "NotoSansSC-VariableFont_wght.ttf",
-)
+QUEUE_INACTIVITY_SECONDS = 45 * 60
+SINGLE_PLAYER_SECONDS = 15 * 60
+# How long a queued player may be out of voice before they are unwoven
+VOICE_GRACE_SECONDS = float(os.getenv("QUEUE_VOICE_GRACE_SECONDS", "60"))
+
+# Named queues (see utils/queue_manager.py); players may wait in several at once
+QUEUES = [
+    QueueSpec("2v2", "2v2", team_size=2),
+    QueueSpec("1v1", "1v1", team_size=1),
+]
+HIGH_BRACKET_ELO = os.getenv("QUEUE_HIGH_ELO")  # set to add a 2v2 queue for players at or above this ELO
+if HIGH_BRACKET_ELO:
+    QUEUES.append(QueueSpec("2v2-high", f"2v2 ({int(float(HIGH_BRACKET_ELO))}+ ELO)", team_size=2, min_elo=float(HIGH_BRACKET_ELO)))
+DEFAULT_QUEUE = "2v2"
+ALL_QUEUES = "all"
+QUEUE_CHOICES = [app_commands.Choice(name=spec.label, value=spec.name) for spec in QUEUES]
+
+# Timer kinds (see utils/scheduler.py); global monitors are keyed by queue name
+INACTIVITY = "inactivity"   # 45m when people are waiting
+SINGLE_PLAYER = "single"    # 15m when exactly one is waiting
+VOICE_CHECK = "voice"       # per user, while they are out of voice
 
-try:
-    BADGE_FONT = ImageFont.truetype(
-        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 15
-    )
-except Exception:
-    BADGE_FONT = ImageFont.load_default()
+Member = discord.Member  # alias for readability
 
 
-def load_title_font(size: int) -> ImageFont.FreeTypeFont:
-    """Try to load HSR-like font, fallback to default if missing."""
-    try:
-        return ImageFont.truetype(FONT_PATH, size)
-    except Exception:
-        try:
-            return ImageFont.truetype("DejaVuSans.ttf", size)
-        except Exception:
-            return ImageFont.load_default()
-
-
-Member = discord.Member  # alias for readability
+def _format_wait(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    return f"{minutes}m" if minutes else f"{int(seconds)}s"
 
 
 class MatchmakingQueue(commands.Cog):
     def __init__(self, bot: commands.Bot):
         self.bot = bot
 
-        # Queue & locks
-        self.queue: List[int] = []  # store user IDs (not Member objects)
-        self.queue_lock = asyncio.Lock()
+        # Queues, each with its own lock (user IDs, not Member objects, + join times, oldest first)
+        self.queues = QueueManager(QUEUES)
+        # Write-through copy of the queues so a restart doesn't drop anyone
+        self.store = QueueStore(getattr(bot, "pool", None))
 
-        # Per-user monitor (VOICE ONLY — AFK removed)
-        self.voice_channel_monitor: Dict[int, asyncio.Task] = {}
+        # Every queue timer (per-user voice checks + the per-queue monitors) runs on one scheduler
+        self.timers = TimerScheduler({
+            INACTIVITY: self.check_queue_inactivity,
+            SINGLE_PLAYER: self.check_single_player_in_queue,
+            VOICE_CHECK: self.check_voice_channel,
+        })
 
-        # Global monitors
-        self.queue_inactivity_monitor: Optional[asyncio.Task] = None  # 45m when people are waiting
-        self.single_player_monitor: Optional[asyncio.Task] = None     # 15m when exactly one is waiting
+    async def cog_unload(self):
+        self.timers.stop()
 
     # ─────────────────────────── helpers ───────────────────────────
 
     def _get_member(self, guild: discord.Guild, user_id: int) -> Optional[Member]:
         return guild.get_member(user_id)
 
+    def _selected(self, choice: Optional[app_commands.Choice[str]], default: Optional[str] = None) -> List[NamedQueue]:
+        name = choice.value if choice else default
+        if name is None or name == ALL_QUEUES:
+            return list(self.queues)
+        return [self.queues[name]]
+
     # Inactivity monitor (45m with people waiting)
-    def _ensure_inactivity_monitor(self, channel: discord.abc.Messageable):
-        if self.queue_inactivity_monitor is None:
-            self.queue_inactivity_monitor = asyncio.create_task(self.check_queue_inactivity(channel))
+    def _ensure_inactivity_monitor(self, q: NamedQueue, channel: discord.abc.Messageable, delay: float = QUEUE_INACTIVITY_SECONDS):
+        if (INACTIVITY, q.name) not in self.timers:
+            self.timers.schedule(INACTIVITY, q.name, delay, channel)
 
-    def _cancel_inactivity_monitor(self):
-        if self.queue_inactivity_monitor:
-            self.queue_inactivity_monitor.cancel()
-            self.queue_inactivity_monitor = None
+    def _cancel_inactivity_monitor(self, q: NamedQueue):
+        self.timers.cancel(INACTIVITY, q.name)
 
     # Single-player monitor (15m when exactly one is waiting)
-    def _ensure_single_player_monitor(self, guild_id: int, channel: discord.abc.Messageable):
-        if self.single_player_monitor is None and len(self.queue) == 1:
-            self.single_player_monitor = asyncio.create_task(self.check_single_player_in_queue(guild_id, channel))
-
-    def _cancel_single_player_monitor(self):
-        if self.single_player_monitor:
-            self.single_player_monitor.cancel()
-            self.single_player_monitor = None
-
-    # Bring monitors into a valid state for the current queue length (no forced resets)
-    def _sync_global_monitors(self, guild_id: int, channel: discord.abc.Messageable):
-        if len(self.queue) == 0:
-            self._cancel_inactivity_monitor()
-            self._cancel_single_player_monitor()
-        elif len(self.queue) == 1:
-            self._ensure_inactivity_monitor(channel)
-            self._cancel_single_player_monitor()
-            self._ensure_single_player_monitor(guild_id, channel)
+    def _ensure_single_player_monitor(self, q: NamedQueue, guild_id: int, channel: discord.abc.Messageable, delay: float = SINGLE_PLAYER_SECONDS):
+        if (SINGLE_PLAYER, q.name) not in self.timers and len(q) == 1:
+            self.timers.schedule(SINGLE_PLAYER, q.name, delay, (guild_id, channel))
+
+    def _cancel_single_player_monitor(self, q: NamedQueue):
+        self.timers.cancel(SINGLE_PLAYER, q.name)
+
+    # Voice grace timer (per user, armed by on_voice_state_update when they drop out of voice)
+    def _start_voice_monitor(self, guild_id: int, user_id: int):
+        self.timers.schedule(VOICE_CHECK, user_id, VOICE_GRACE_SECONDS, guild_id)
+
+    def _cancel_voice_monitor(self, user_id: int):
+        if user_id not in self.queues:  # still waiting somewhere else -> keep watching
+            self.timers.cancel(VOICE_CHECK, user_id)
+
+    # Bring a queue's monitors into a valid state for its length (no forced resets)
+    def _sync_global_monitors(self, q: NamedQueue, guild_id: int, channel: discord.abc.Messageable):
+        if len(q) == 0:
+            self._cancel_inactivity_monitor(q)
+            self._cancel_single_player_monitor(q)
+        elif len(q) == 1:
+            self._ensure_inactivity_monitor(q, channel)
+            self._cancel_single_player_monitor(q)
+            self._ensure_single_player_monitor(q, guild_id, channel)
         else:  # 2 or more
-            self._ensure_inactivity_monitor(channel)
-            self._cancel_single_player_monitor()
+            self._ensure_inactivity_monitor(q, channel)
+            self._cancel_single_player_monitor(q)
 
-    # Force reset global monitors after a match is formed (as requested)
-    def _reset_global_monitors(self, guild_id: int, channel: discord.abc.Messageable):
-        self._cancel_inactivity_monitor()
-        self._cancel_single_player_monitor()
+    # Force reset a queue's monitors after a match is formed (as requested)
+    def _reset_global_monitors(self, q: NamedQueue, guild_id: int, channel: discord.abc.Messageable):
+        self._cancel_inactivity_monitor(q)
+        self._cancel_single_player_monitor(q)
         # Start fresh according to current queue size
-        if len(self.queue) > 0:
-            self._ensure_inactivity_monitor(channel)
-            if len(self.queue) == 1:
-                self._ensure_single_player_monitor(guild_id, channel)
+        if len(q) > 0:
+            self._ensure_inactivity_monitor(q, channel)
+            if len(q) == 1:
+                self._ensure_single_player_monitor(q, guild_id, channel)
 
     def _is_pvp_banned(self, member: discord.Member) -> bool:
         return any(role.name.lower() == PVP_BANNED_ROLE.lower() for role in member.roles)
 
-    # ───────────────────────── background tasks ─────────────────────────
-
-    async def check_queue_inactivity(self, channel: discord.abc.Messageable):
-        try:
-            await asyncio.sleep(45 * 60)
-            async with self.queue_lock:
-                if len(self.queue) > 0:
-                    await channel.send(
-                        "The threads of fate have not woven any new paths for 45 minutes... "
-                        "As a result, the queue has been gently disbanded. May your threads intertwine again when the time is right."
-                    )
-                    # Clear queue and cancel all per-user voice monitors (FIX #1)
-                    self.queue.clear()
-                    for task in self.voice_channel_monitor.values():
-                        task.cancel()
-                    self.voice_channel_monitor.clear()
-
-                    self._cancel_inactivity_monitor()
-                    self._cancel_single_player_monitor()
-        except asyncio.CancelledError:
-            pass
-
-    async def check_single_player_in_queue(self, guild_id: int, channel: discord.abc.Messageable):
-        try:
-            await asyncio.sleep(15 * 60)
-            guild = self.bot.get_guild(guild_id)
-            if guild is None:
-                return
-
-            async with self.queue_lock:
-                if len(self.queue) == 1:
-                    uid = self.queue[0]
-                    member = self._get_member(guild, uid)
-                    self.queue.remove(uid)
-                    await channel.send(
-                        f"**{member.display_name if member else 'A player'}** , alas, your thread has been gently unwoven from the queue. "
-                        "You've waited with patience, but fate has not yet woven your match. Please return soon, dear one..."
-                    )
-                    vtask = self.voice_channel_monitor.pop(uid, None)
-                    if vtask: vtask.cancel()
-
-                    self._cancel_single_player_monitor()
-                    self._sync_global_monitors(guild_id, channel)
-        except asyncio.CancelledError:
-            pass
-
-    async def check_voice_channel(self, guild_id: int, user_id: int, channel: discord.abc.Messageable):
-        """
-        10s grace; if bot has voice_states intent and the user truly left voice, remove them.
-        If voice_states intent is not enabled, skip removal to avoid false positives.
-        """
-        try:
-            await asyncio.sleep(10)
-
-            if not getattr(self.bot, "intents", None) or not self.bot.intents.voice_states:
-                return  # safety: avoid false kicks when intent is off
-
-            guild = self.bot.get_guild(guild_id)
-            if guild is None:
-                return
-
-            async with self.queue_lock:
-                if user_id in self.queue:
-                    member = self._get_member(guild, user_id)
-                    if member and member.voice is None:
-                        self.queue.remove(user_id)
-                        await channel.send(
-                            f"**{member.display_name}**, your thread has been gently unwoven from the queue, "
-                            "as you are no longer in the voice channel. May the threads weave once more when you return."
-                        )
-                        self.voice_channel_monitor.pop(user_id, None)
-
-                        self._sync_global_monitors(guild_id, channel)
-        except asyncio.CancelledError:
-            pass
-
     async def _deny_pvp_banned(self, interaction: Interaction):
         await interaction.response.send_message(
             f"**{interaction.user.display_name} is banned from PvP matchmaking.**\n"
@@ -202,237 +139,89 @@ class MatchmakingQueue(commands.Cog):
             ephemeral=False  # public message
         )
 
+    # ───────────────────────── timer handlers ─────────────────────────
+    # Called by self.timers as handler(key, payload) once a timer is due.
 
-
-    async def _fetch_profile_characters(
-        self,
-        session: aiohttp.ClientSession,
-        discord_id: str
-    ) -> Optional[dict]:
-        if not discord_id:
-            return None
-
-        url = f"{ROSTER_API}/{discord_id}/profile-characters"
-        try:
-            async with session.get(url) as resp:
-                if resp.status == 404:
-                    return None
-                if resp.status != 200:
-                    return None
-
-                data = await resp.json()
-                if isinstance(data, dict) and isinstance(data.get("profileCharacters"), list):
-                    return data
-                return None
-        except Exception:
-            return None
-
-
-    def _build_team_roster_image(
-        self,
-        team: List[Member],
-        entry1: Optional[dict],
-        entry2: Optional[dict],
-        team_label: str,
-    ) -> Optional[io.BytesIO]:
-
-
-        # must be 2 players
-        if len(team) < 2:
-            return None
-
-        p1, p2 = team[0], team[1]
-
-        if not entry1 and not entry2:
-            return None
-
-        owned1 = {c["id"]: c["eidolon"] for c in entry1.get("profileCharacters", [])} if entry1 else {}
-        owned2 = {c["id"]: c["eidolon"] for c in entry2.get("profileCharacters", [])} if entry2 else {}
-
-        has_gp1 = "9999" in owned1
-        has_gp2 = "9999" in owned2
-
-        # union of both players' owned roster
-        combined_owned = set(owned1.keys()) | set(owned2.keys())
-
-        char_map_cache = shared_cache.char_map_cache
-        icon_cache = shared_cache.icon_cache
-        if not char_map_cache:
-            return None
-
-        # ******** sorting *******
-        def sort_key(c: dict):
-            return (
-                0 if c["id"] in combined_owned else 1,
-                -c["rarity"],
-                c["name"],
-            )
-
-        sorted_chars = sorted(char_map_cache.values(), key=sort_key)
-
-        # ******** layout ********
-        ICON = 110
-        GAP = 8
-        PADDING = 20
-        PER_ROW = 8
-
-        rows_count = max(1, math.ceil(len(sorted_chars) / PER_ROW))
-        width = PADDING * 2 + PER_ROW * ICON + (PER_ROW - 1) * GAP
-
-        title_text = f"{p1.display_name} • {p2.display_name}"
-
-        title_font = load_title_font(40)
-        dummy = Image.new("RGB", (1, 1))
-        draw_dummy = ImageDraw.Draw(dummy)
-        tb = draw_dummy.textbbox((0, 0), title_text, font=title_font)
-        title_h = tb[3] - tb[1]
-
-
-        TITLE_TOP = 30
-        UNDERLINE_GAP = 8
-        UNDERLINE_EXTRA = 24
-
-        title_block_bottom = TITLE_TOP + title_h + UNDERLINE_GAP + 3 + UNDERLINE_EXTRA
-        grid_top = title_block_bottom + PADDING
-        grid_height = rows_count * ICON + (rows_count - 1) * GAP + PADDING
-        height = grid_top + grid_height
-
-        canvas = Image.new("RGBA", (width, height), (10, 10, 10, 255))
-        draw = ImageDraw.Draw(canvas)
-
-        for y in range(height):
-            t = y / (height - 1)
-            r = int(14 + (28 - 14) * t)
-            g = int(10 + (18 - 10) * t)
-            b = int(30 + (52 - 30) * t)
-            draw.line([(0, y), (width, y)], fill=(r, g, b, 255))
-
-        # ******** Title + underline ********
-        title_bbox = draw.textbbox((0, 0), title_text, font=title_font)
-        title_w = title_bbox[2] - title_bbox[0]
-        title_x = (width - title_w) // 2
-        title_y = TITLE_TOP
-
-        draw.text(
-            (title_x, title_y),
-            title_text,
-            font=title_font,
-            fill="white",
-        )
-
-        gp_icon = shared_cache.gp_icon
-
-        if gp_icon:
-            icon_y = title_y + 5
-
-            def draw_gp_icon(x_pos, has_gp):
-                icon = gp_icon.copy()
-
-                if not has_gp:
-                    icon = ImageEnhance.Brightness(icon).enhance(0.3)
-                    icon = icon.convert("LA").convert("RGBA")
-
-                canvas.paste(icon, (x_pos, icon_y), icon)
-
-            draw_gp_icon(title_x - 40, has_gp1)
-            draw_gp_icon(title_x + title_w + 8, has_gp2)
-
-        underline_y = title_y + title_h + UNDERLINE_GAP + 10
-        margin = int(width * 0.28)
-        draw.line([(margin, underline_y), (width - margin, underline_y)],
-                fill=(255, 255, 255, 180), width=3)
-
-        # ******** Icons + Eidolon Badges ********
-        for idx, c in enumerate(sorted_chars):
-            col = idx % PER_ROW
-            row = idx // PER_ROW
-
-            x = PADDING + col * (ICON + GAP)
-            y = grid_top + row * (ICON + GAP)
-
-            icon = icon_cache.get(c["id"])
-            if not icon:
-                continue
-            
-            if icon.size != (ICON, ICON):
-                icon = icon.resize((ICON, ICON), Image.LANCZOS)
-
-            # dim unowned
-            icon = icon.copy()
-            if c["id"] not in combined_owned:
-                icon = ImageEnhance.Brightness(icon).enhance(0.35)
-                icon = icon.convert("LA").convert("RGBA")
-
-            # icon (already includes rarity background)
-            canvas.paste(icon, (x, y), icon)
-
-            # *****************
-            # EID BADGES (same)
-            # *****************
-            badge_w, badge_h = 40, 26
-            badge_y = y + ICON - badge_h - 4
-
-            def draw_badge(e_value: int, bx: int):
-
-                draw.rounded_rectangle(
-                    [bx, badge_y, bx + badge_w, badge_y + badge_h],
-                    radius=8,
-                    fill=(0, 0, 0, 190),
+    async def check_queue_inactivity(self, name: str, channel: discord.abc.Messageable):
+        q = self.queues[name]
+        async with q.lock:
+            if len(q) > 0:
+                await channel.send(
+                    f"The threads of fate have not woven any new paths in the **{q.spec.label}** queue for 45 minutes... "
+                    "As a result, it has been gently disbanded. May your threads intertwine again when the time is right."
                 )
+                # Clear queue and cancel the voice monitors of anyone not waiting elsewhere (FIX #1)
+                removed = self.queues.clear(name)
+                self.store.remove(removed, name)
+                for uid in removed:
+                    self._cancel_voice_monitor(uid)
+
+                self._cancel_single_player_monitor(q)
+
+    async def check_single_player_in_queue(self, name: str, ctx: tuple):
+        guild_id, channel = ctx
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
+            return
 
+        q = self.queues[name]
+        async with q.lock:
+            if len(q) == 1:
+                uid = q.waiting.peek()
+                member = self._get_member(guild, uid)
+                self.queues.leave(name, uid)
+                self.store.remove([uid], name)
+                await channel.send(
+                    f"**{member.display_name if member else 'A player'}** , alas, your thread has been gently unwoven from the **{q.spec.label}** queue. "
+                    "You've waited with patience, but fate has not yet woven your match. Please return soon, dear one..."
+                )
+                self._cancel_voice_monitor(uid)
+                self._sync_global_monitors(q, guild_id, channel)
 
-                text = f"E{e_value}"
-                text_bbox = draw.textbbox((0, 0), text, font=BADGE_FONT)
-                tw = text_bbox[2] - text_bbox[0]
-                th = text_bbox[3] - text_bbox[1]
-
-                tx = bx + (badge_w - tw) // 2
-                ty = badge_y + (badge_h - th) // 2 - 3
-
-                draw.text((tx, ty), text, font=BADGE_FONT, fill="white")
-
-            e1 = owned1.get(c["id"])
-            e2 = owned2.get(c["id"])
-
-            if e1 is not None:
-                draw_badge(e1, x + 4)
-            if e2 is not None:
-                draw_badge(e2, x + ICON - badge_w - 4)
-
-        # return buffer
-        buffer = io.BytesIO()
-        canvas.save(buffer, "PNG")
-        buffer.seek(0)
-        return buffer
-        
-    async def _send_match_rosters(
-        self,
-        channel: discord.abc.Messageable,
-        team1: List[Member],
-        team2: List[Member],
-    ):
-        if not shared_cache.char_map_cache or not shared_cache.icon_cache:
+    async def check_voice_channel(self, user_id: int, guild_id: int):
+        """Grace period is over: unweave them from every queue if they still haven't come back to voice."""
+        guild = self.bot.get_guild(guild_id)
+        if guild is None:
             return
 
-        timeout = aiohttp.ClientTimeout(total=20, connect=5, sock_read=15)
-
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            team_pairs = [(team1, "Team 1"), (team2, "Team 2")]
+        member = self._get_member(guild, user_id)
+        if user_id not in self.queues or (member is not None and member.voice is not None):
+            return
 
-            for idx, (team, label) in enumerate(team_pairs, start=1):
-                if len(team) < 2:
-                    continue
+        removed = self.queues.leave_all(user_id)
+        self.store.remove([user_id])
+        channel = next((self.bot.get_channel(e.channel_id) for e in removed.values() if e.channel_id), None)
 
-                id1 = str(team[0].id)
-                id2 = str(team[1].id)
+        # The queues shrank whether or not there is a channel to tell, so their timers follow first
+        for name in removed:
+            q = self.queues[name]
+            async with q.lock:
+                q_channel = channel or next(
+                    (self.bot.get_channel(e.channel_id) for e in q.waiting.snapshot() if e.channel_id), None
+                )
+                if q_channel is not None:
+                    self._sync_global_monitors(q, guild_id, q_channel)
+                elif len(q) == 0:
+                    self._cancel_inactivity_monitor(q)
+                    self._cancel_single_player_monitor(q)
 
-                entry1 = await self._fetch_profile_characters(session, id1)
-                entry2 = await self._fetch_profile_characters(session, id2)
+        if channel is None:
+            return
+        await channel.send(
+            f"**{member.display_name if member else 'A player'}**, your thread has been gently unwoven from the queue, "
+            "as you are no longer in the voice channel. May the threads weave once more when you return."
+        )
 
-                buf = self._build_team_roster_image(team, entry1, entry2, label)
-                if buf:
-                    await channel.send(file=discord.File(buf, filename=f"team{idx}_roster.png"))
+    # ───────────────────────── voice events ─────────────────────────
 
+    @commands.Cog.listener()
+    async def on_voice_state_update(self, member: Member, before: discord.VoiceState, after: discord.VoiceState):
+        if member.id not in self.queues or before.channel == after.channel:
+            return
+        if after.channel is None:
+            self._start_voice_monitor(member.guild.id, member.id)
+        else:
+            self.timers.cancel(VOICE_CHECK, member.id)  # back in voice (or just switched channels)
 
     # ────────────────────── prebans builder (exact same as /prebans) ──────────────────────
 
@@ -536,11 +325,166 @@ class MatchmakingQueue(commands.Cog):
         embed.set_footer(text="Handled with care by Kyasutorisu")
         return embed
 
+    # ────────────────────────── match formation ──────────────────────────
+
+    async def _form_matches(self, q: NamedQueue, guild: discord.Guild, channel: discord.abc.Messageable):
+        """Form as many balanced matches as the queue allows (see utils/team_formation.py) and announce them."""
+        spec = q.spec
+        players_data: Dict[str, dict] = {}
+        if len(q) >= spec.match_size:
+            players_data = await asyncio.to_thread(load_players, list(q.waiting))
+
+        policy = form_matches if spec.team_size == 2 else form_duels
+        match_groups: List[tuple] = []
+        async with q.lock:
+            if len(q) >= spec.match_size:
+                for formation in policy(candidates_from(q.waiting, players_data, q.waiting.waited())):
+                    ids = [*formation.team1, *formation.team2]
+                    # Out of this queue and every other queue they were waiting in, in one step
+                    claimed = self.queues.claim(ids)
+                    self.store.remove(ids)
+
+                    # Cancel voice monitor for these players
+                    for pid in ids:
+                        self._cancel_voice_monitor(pid)
+
+                    match_groups.append((formation, claimed))
+
+            # After forming matches, reset global timers for remaining queued
+            self._reset_global_monitors(q, guild.id, channel)
+
+        # Other queues these players were also waiting in just got shorter
+        for name in {name for _, claimed in match_groups for name in claimed} - {q.name}:
+            other = self.queues[name]
+            async with other.lock:
+                self._sync_global_monitors(other, guild.id, channel)
+
+        # Announce each match outside the lock, all at once
+        announcements = []
+        for formation, claimed in match_groups:
+            team1 = [self._get_member(guild, i) for i in formation.team1]
+            team2 = [self._get_member(guild, i) for i in formation.team2]
+            players = [p for p in team1 + team2 if p is not None]
+            if len(players) < spec.match_size:
+                # Someone bailed; requeue remaining into every queue they were in (keeping their
+                # place in line) and RESTART the grace timer of anyone already out of voice (FIX #2)
+                present = {p.id for p in players}
+                for name, entries in claimed.items():
+                    other = self.queues[name]
+                    back = [e for e in entries if e.uid in present]
+                    async with other.lock:
+                        self.queues.requeue(name, back)
+                        self.store.add(guild.id, name, back)
+                        self._reset_global_monitors(other, guild.id, channel)
+                for p in players:
+                    if p.voice is None:
+                        self._start_voice_monitor(guild.id, p.id)
+                continue
+
+            announcements.append(self._announce_match(spec, channel, team1, team2))
+
+        for result in await asyncio.gather(*announcements, return_exceptions=True):
+            if isinstance(result, Exception):
+                print(f"[queue] Failed to announce match: {result}")
+
+    async def _announce_match(self, spec: QueueSpec, channel: discord.abc.Messageable, team1: List[Member], team2: List[Member]):
+        """
+        One message per match: mentions, teams, prebans and roster cards.
+        Prebans (a DB read) and the roster fetches/renders are prepared
+        concurrently, then everything goes out in a single send (resent
+        without the rosters if that fails).
+        """
+        match_embed = discord.Embed(
+            title="Threads Aligned",
+            description=f"The threads have been gently woven… Here is your {spec.label} match.",
+            color=discord.Color.blue()
+        )
+        match_embed.add_field(name="Team 1", value=" & ".join(p.mention for p in team1), inline=False)
+        match_embed.add_field(name="Team 2", value=" & ".join(p.mention for p in team2), inline=False)
+        match_embed.set_footer(text="Woven gently by Kyasutorisu")
+
+        prebans_embed, (roster_embeds, roster_files) = await asyncio.gather(
+            asyncio.to_thread(self._build_prebans_embed, team1, team2),
+            match_roster_parts(team1, team2),
+        )
+
+        mentions = ", ".join(p.mention for p in team1 + team2)
+        await send_match_announcement(
+            channel,
+            f"**Match Found!** ({spec.label})\n"
+            f"**Players:** {mentions}\n"
+            f"Fate has woven your paths together. Best of luck",
+            [match_embed, prebans_embed],
+            roster_embeds,
+            roster_files,
+        )
+
+    # ────────────────────────── restart recovery ──────────────────────────
+
+    async def restore_queue(self):
+        """
+        Re-queue whoever was waiting before a restart. Players who left voice,
+        left the server or got pvp banned in the meantime are dropped; timers
+        pick up from the stored join times instead of starting over.
+        """
+        guild = self.bot.get_guild(GUILD_ID)
+        if guild is None or not self.store.enabled:
+            return
+
+        stored = await self.store.load(guild.id)
+        if not stored:
+            return
+
+        kept, dropped = [], set()
+        for name, entry in stored:
+            if name not in self.queues.queues:
+                self.store.remove([entry.uid], name)  # queue no longer configured
+                continue
+            member = self._get_member(guild, entry.uid)
+            if member is None or member.voice is None or self._is_pvp_banned(member):
+                dropped.add(entry.uid)
+            else:
+                kept.append((name, entry))
+        self.store.remove(dropped)
+
+        channel = next((self.bot.get_channel(e.channel_id) for _, e in reversed(kept) if e.channel_id), None)
+        if channel is None:
+            # Nowhere to speak or run timers from; start clean rather than strand anyone
+            self.store.remove({e.uid for _, e in kept})
+            print(f"[queue] Dropped {len(stored)} stored queue entries (no channel to restore into)")
+            return
+
+        for name, entry in kept:
+            self.queues.join(name, entry.uid, entry.joined_at, entry.channel_id)
+
+        now = time.time()
+        restored = [q for q in self.queues if len(q)]
+        for q in restored:
+            entries = q.waiting.snapshot()
+            async with q.lock:
+                last_join = max(e.joined_at for e in entries)
+                self._ensure_inactivity_monitor(q, channel, max(0.0, QUEUE_INACTIVITY_SECONDS - (now - last_join)))
+                if len(q) == 1:
+                    self._ensure_single_player_monitor(q, guild.id, channel, max(0.0, SINGLE_PLAYER_SECONDS - (now - entries[0].joined_at)))
+
+        players = len({e.uid for _, e in kept})
+        print(f"[queue] Restored {players} queued player(s) across {len(restored)} queue(s), dropped {len(dropped)}")
+        message = f"The threads of fate held through the restart… **{players}** still woven into the queue."
+        if dropped:
+            message += f" {len(dropped)} drifted away while I was gone and were gently unwoven."
+        await channel.send(message)
+
+        for q in restored:
+            if len(q) >= q.spec.match_size:
+                await self._form_matches(q, guild, channel)
+
     # ────────────────────────── slash commands ──────────────────────────
 
     @app_commands.command(name="joinqueue", description="Tie your thread to the matchmaking queue.")
     @app_commands.guilds(GUILD_ID)
-    async def join_queue(self, interaction: Interaction):
+    @app_commands.describe(queue="Which queue to join (default 2v2); 'All' joins every queue you're eligible for")
+    @app_commands.choices(queue=QUEUE_CHOICES + [app_commands.Choice(name="All", value=ALL_QUEUES)])
+    async def join_queue(self, interaction: Interaction, queue: Optional[app_commands.Choice[str]] = None):
         if interaction.guild is None:
             await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
             return
@@ -559,157 +503,123 @@ class MatchmakingQueue(commands.Cog):
             return
 
         uid = member.id
-
-        async with self.queue_lock:
-            if uid in self.queue:
-                await interaction.response.send_message("You're already woven into the queue", ephemeral=True)
+        targets = self._selected(queue, DEFAULT_QUEUE)
+
+        # Rating brackets: only look the player up when a target queue has one
+        if any(q.spec.min_elo is not None or q.spec.max_elo is not None for q in targets):
+            row = (await asyncio.to_thread(load_players, [uid])).get(str(uid)) or {}
+            elo = float(row.get("elo") or DEFAULT_ELO)
+            eligible = [q for q in targets if q.spec.accepts(elo)]
+            if not eligible:
+                await interaction.response.send_message(
+                    f"Your thread ({elo:.0f} ELO) doesn't belong to the **{targets[0].spec.label}** bracket just yet.",
+                    ephemeral=True
+                )
                 return
+            targets = eligible
 
-            self.queue.append(uid)
+        joined: List[NamedQueue] = []
+        for q in targets:
+            async with q.lock:
+                entry = self.queues.join(q.name, uid, channel_id=interaction.channel.id)
+                if entry is None:
+                    continue
+                self.store.add(interaction.guild.id, q.name, [entry])
+                joined.append(q)
 
-            # Start voice monitor ONLY (AFK removed)
-            self.voice_channel_monitor[uid] = asyncio.create_task(
-                self.check_voice_channel(interaction.guild.id, uid, interaction.channel)
-            )
+                # Bring this queue's monitors into a valid state
+                self._sync_global_monitors(q, interaction.guild.id, interaction.channel)
 
-            # Bring global monitors into a valid state
-            self._sync_global_monitors(interaction.guild.id, interaction.channel)
+        if not joined:
+            await interaction.response.send_message("You're already woven into the queue", ephemeral=True)
+            return
 
+        labels = ", ".join(f"**{q.spec.label}**" for q in joined)
         await interaction.response.send_message(
-            f"{member.display_name} has joined the queue. The threads of fate are being woven.", ephemeral=False
+            f"{member.display_name} has joined the {labels} queue. The threads of fate are being woven.", ephemeral=False
         )
 
-        # ── Form as many matches as possible (drain in groups of 4) ──
-        match_groups: List[List[int]] = []
-        async with self.queue_lock:
-            while len(self.queue) >= 4:
-                ids = self.queue[:4]
-                self.queue = self.queue[4:]
-
-                # Cancel voice monitor for these 4
-                for pid in ids:
-                    t = self.voice_channel_monitor.pop(pid, None)
-                    if t:
-                        t.cancel()
-
-                match_groups.append(ids)
-
-            # After forming matches, reset global timers for remaining queued
-            self._reset_global_monitors(interaction.guild.id, interaction.channel)
-
-        # Announce each match outside the lock
-        guild = interaction.guild
-        for ids in match_groups:
-            players = [self._get_member(guild, i) for i in ids]
-            players = [p for p in players if p is not None]
-            if len(players) < 4:
-                # Someone bailed; requeue remaining and RESTART their voice monitors (FIX #2)
-                async with self.queue_lock:
-                    self.queue = [p.id for p in players] + self.queue
-
-                    for p in players:
-                        old = self.voice_channel_monitor.pop(p.id, None)
-                        if old:
-                            old.cancel()
-                        self.voice_channel_monitor[p.id] = asyncio.create_task(
-                            self.check_voice_channel(interaction.guild.id, p.id, interaction.channel)
-                        )
-
-                    self._reset_global_monitors(interaction.guild.id, interaction.channel)
-                continue
-
-            random.shuffle(players)
-            team1, team2 = players[:2], players[2:]
-            mentions = ", ".join(p.mention for p in players)
-
-            await interaction.channel.send(
-                f"**Match Found!**\n"
-                f"**Players:** {mentions}\n"
-                f"Fate has woven your paths together. Best of luck"
-            )
-
-            match_embed = discord.Embed(
-                title="Threads Aligned",
-                description="The threads have been gently woven… Here is your match.",
-                color=discord.Color.blue()
-            )
-            match_embed.add_field(name="Team 1", value=f"{team1[0].mention} & {team1[1].mention}", inline=False)
-            match_embed.add_field(name="Team 2", value=f"{team2[0].mention} & {team2[1].mention}", inline=False)
-            match_embed.set_footer(text="Woven gently by Kyasutorisu")
-            await interaction.channel.send(embed=match_embed)
-
-            prebans_embed = self._build_prebans_embed(team1, team2)
-            await interaction.channel.send(embed=prebans_embed)
-
-            try:
-                await self._send_match_rosters(interaction.channel, team1, team2)
-            except Exception as e:
-
-                print(f"[queue] Failed to send match rosters: {e}")
+        for q in joined:
+            await self._form_matches(q, interaction.guild, interaction.channel)
 
     @app_commands.command(name="leavequeue", description="Untie your thread from the queue.")
     @app_commands.guilds(GUILD_ID)
-    async def leave_queue(self, interaction: Interaction):
+    @app_commands.describe(queue="Which queue to leave (default: all of them)")
+    @app_commands.choices(queue=QUEUE_CHOICES)
+    async def leave_queue(self, interaction: Interaction, queue: Optional[app_commands.Choice[str]] = None):
         if interaction.guild is None:
             await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
             return
 
         uid = interaction.user.id
 
-        async with self.queue_lock:
-            if uid not in self.queue:
-                await interaction.response.send_message("You were never in the thread to begin with.", ephemeral=True)
-                return
-
-            self.queue.remove(uid)
+        left: List[NamedQueue] = []
+        for q in self._selected(queue):
+            async with q.lock:
+                if self.queues.leave(q.name, uid) is None:
+                    continue
+                self.store.remove([uid], q.name)
+                left.append(q)
 
-            vtask = self.voice_channel_monitor.pop(uid, None)
-            if vtask:
-                vtask.cancel()
+                self._sync_global_monitors(q, interaction.guild.id, interaction.channel)
 
-            self._sync_global_monitors(interaction.guild.id, interaction.channel)
+        if not left:
+            await interaction.response.send_message("You were never in the thread to begin with.", ephemeral=True)
+            return
 
+        self._cancel_voice_monitor(uid)
         await interaction.response.send_message("Your thread has been untied from the queue.", ephemeral=False)
 
     @app_commands.command(name="queue", description="Peek at those waiting in the thread.")
     @app_commands.guilds(GUILD_ID)
-    async def show_queue(self, interaction: Interaction):
+    @app_commands.describe(queue="Which queue to show (default: all of them)")
+    @app_commands.choices(queue=QUEUE_CHOICES)
+    async def show_queue(self, interaction: Interaction, queue: Optional[app_commands.Choice[str]] = None):
         if interaction.guild is None:
             await interaction.response.send_message("This command can only be used in a server.", ephemeral=True)
             return
-        
+
         member = interaction.guild.get_member(interaction.user.id)
 
         if member and self._is_pvp_banned(member):
             await self._deny_pvp_banned(interaction)
             return
 
-        async with self.queue_lock:
-            if not self.queue:
-                await interaction.response.send_message(
-                    "It’s so quiet in here... The threads of fate are still at rest.",
-                    ephemeral=False
-                )
-                return
+        waiting = [q for q in self._selected(queue) if len(q)]
+        if not waiting:
+            await interaction.response.send_message(
+                "It’s so quiet in here... The threads of fate are still at rest.",
+                ephemeral=False
+            )
+            return
 
-            guild = interaction.guild
+        guild = interaction.guild
+        embed = discord.Embed(
+            title="🧵 Matchmaking Queue",
+            color=discord.Color.purple()
+        )
+        for q in waiting:
+            waited = q.waiting.waited()
+            stats = q.waiting.wait_stats()
             lines = []
-            for i, uid in enumerate(self.queue, start=1):
+            for i, uid in enumerate(q.waiting, start=1):
                 m = guild.get_member(uid)
-                lines.append(f"{i}. {m.display_name if m else f'User {uid}'}")
+                lines.append(f"{i}. {m.display_name if m else f'User {uid}'} · {_format_wait(waited[uid])}")
+            lines.append(f"*Longest: {_format_wait(stats.longest)} • Median: {_format_wait(stats.median)}*")
 
-            embed = discord.Embed(
-                title="🧵 Matchmaking Queue",
-                description="\n".join(lines),
-                color=discord.Color.purple()
-            )
-            embed.set_footer(text="Kyasutorisu are watching over the threads of fate...")
+            value = "\n".join(lines)
+            if len(value) > 1024:
+                value = value[:1000].rsplit("\n", 1)[0] + "\n…"
+            embed.add_field(name=f"{q.spec.label} ({len(q)})", value=value, inline=False)
+        embed.set_footer(text="Kyasutorisu are watching over the threads of fate...")
 
         await interaction.response.send_message(embed=embed)
 
     @app_commands.command(name="clearqueue", description="Gently unravel all threads from the queue.")
     @app_commands.guilds(GUILD_ID)
-    async def clear_queue(self, interaction: Interaction):
+    @app_commands.describe(queue="Which queue to clear (default: all of them)")
+    @app_commands.choices(queue=QUEUE_CHOICES)
+    async def clear_queue(self, interaction: Interaction, queue: Optional[app_commands.Choice[str]] = None):
         required_role = "Stonehearts"
 
         if interaction.guild is None:
@@ -725,16 +635,22 @@ class MatchmakingQueue(commands.Cog):
             )
             return
 
-        async with self.queue_lock:
-            self.queue.clear()
-            for task in self.voice_channel_monitor.values():
-                task.cancel()
-            self.voice_channel_monitor.clear()
-            self._cancel_inactivity_monitor()
-            self._cancel_single_player_monitor()
+        for q in self._selected(queue):
+            async with q.lock:
+                removed = self.queues.clear(q.name)
+                self.store.remove(removed, q.name)
+                for uid in removed:
+                    self._cancel_voice_monitor(uid)
+                self._cancel_inactivity_monitor(q)
+                self._cancel_single_player_monitor(q)
 
         await interaction.response.send_message("The threads of fate have been gently unraveled. The queue is now empty.", ephemeral=False)
 
 
 async def setup(bot: commands.Bot):
-    await bot.add_cog(MatchmakingQueue(bot))
+    cog = MatchmakingQueue(bot)
+    await bot.add_cog(cog)
+    try:
+        await cog.restore_queue()
+    except Exception as e:
+        print(f"[queue] Could not restore the queue: {e}")
@@ -0,0 +1,337 @@
+# registry.py
+"""
+Character registry: metadata and processed icons for roster cards.
+
+refresh() diffs the characters table against what is loaded, fetches only
+the rows and icons that changed, and swaps the new char map + atlas into
+shared_cache in one step. It runs once at startup, then every
+CHARACTER_REFRESH_SECONDS and whenever Postgres sends a `characters_changed`
+notification (trigger installed by initialize_db).
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import aiohttp
+import asyncpg
+from dotenv import load_dotenv
+from PIL import Image, ImageDraw, ImageEnhance
+
+from utils.db_utils import get_cursor
+from . import shared_cache
+from .render import ICON, build_atlas, render_service
+
+load_dotenv()
+
+DATABASE_URL = os.getenv("DATABASE_URL")
+NOTIFY_CHANNEL = "characters_changed"
+CHARACTER_REFRESH_SECONDS = int(os.getenv("CHARACTER_REFRESH_SECONDS", "300"))
+
+GP_ICON_URL = "https://storage.googleapis.com/cipher-zzz/hsr/Sw999gp.webp"
+ICON_CACHE_DIR = os.getenv("ICON_CACHE_DIR") or os.path.join(os.path.dirname(os.path.dirname(__file__)), ".icon_cache")
+ICON_DOWNLOADS = int(os.getenv("ICON_DOWNLOADS", "12"))
+ICON_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=5, sock_read=20)
+# A failed icon URL is retried after ICON_RETRY_SECONDS, doubling per failure up to the max
+ICON_RETRY_SECONDS = int(os.getenv("ICON_RETRY_SECONDS", "300"))
+ICON_RETRY_MAX_SECONDS = 6 * 3600
+# Bump whenever _process_icon / _process_gp_icon change, so stale files are not reused
+ICON_PROCESS_VERSION = 1
+
+
+# ───────────── icons ─────────────
+
+def _process_icon(raw: bytes, rarity: int) -> Image.Image:
+    img = Image.open(io.BytesIO(raw)).convert("RGBA")
+
+    # Tighter smart zoom
+    w, h = img.size
+    crop_size = int(min(w, h) * 0.85)
+
+    x_center = w // 2
+    y_center = int(h * 0.35)
+
+    left = max(0, x_center - crop_size // 2)
+    right = min(w, x_center + crop_size // 2)
+    top = max(0, y_center - crop_size // 2)
+    bottom = min(h, y_center + crop_size // 2)
+
+    img = img.crop((left, top, right, bottom))
+
+    # Soften slightly
+    img = ImageEnhance.Brightness(img).enhance(0.95)
+    img = ImageEnhance.Contrast(img).enhance(0.96)
+
+    img = img.resize((ICON, ICON), Image.LANCZOS)
+
+    # Rarity background
+    if rarity == 5:
+        bg_color = (174, 150, 92, 255)   # gold-ish
+    elif rarity == 4:
+        bg_color = (88, 61, 116, 255)    # purple
+    else:
+        bg_color = (54, 54, 54, 255)     # gray
+
+    bg = Image.new("RGBA", (ICON, ICON), bg_color)
+
+    # Rounded mask
+    mask = Image.new("L", (ICON, ICON), 0)
+    draw_mask = ImageDraw.Draw(mask)
+    draw_mask.rounded_rectangle([0, 0, ICON, ICON], radius=22, fill=255)
+
+    # Paste face on top of bg
+    bg.paste(img, (0, 0), img)
+
+    rounded = Image.new("RGBA", (ICON, ICON))
+    rounded.paste(bg, (0, 0), mask)
+    return rounded
+
+
+def _process_gp_icon(raw: bytes, *_) -> Image.Image:
+    img = Image.open(io.BytesIO(raw)).convert("RGBA")
+    return img.resize((32, 32), Image.LANCZOS)
+
+
+def _icon_path(url: str, *variant) -> str:
+    key = "|".join([url, *map(str, variant), f"v{ICON_PROCESS_VERSION}"])
+    return os.path.join(ICON_CACHE_DIR, hashlib.sha1(key.encode()).hexdigest() + ".png")
+
+
+def _read_cached_icon(path: str) -> Optional[Image.Image]:
+    try:
+        with Image.open(path) as img:
+            return img.convert("RGBA")
+    except (FileNotFoundError, OSError):
+        return None
+
+
+def _write_cached_icon(path: str, img: Image.Image):
+    try:
+        os.makedirs(ICON_CACHE_DIR, exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        img.save(tmp, "PNG")
+        os.replace(tmp, path)
+    except OSError as e:
+        logging.warning(f"[Roster] Could not cache icon on disk: {e}")
+
+
+async def _load_icon(session: aiohttp.ClientSession, limit: asyncio.Semaphore, url: str, process, *variant) -> Optional[Image.Image]:
+    """Disk cache first; otherwise download (bounded by `limit`) and process in a thread."""
+    path = _icon_path(url, *variant)
+    img = await asyncio.to_thread(_read_cached_icon, path)
+    if img is not None:
+        return img
+
+    try:
+        async with limit:
+            async with session.get(url) as resp:
+                if resp.status != 200:
+                    return None
+                raw = await resp.read()
+        img = await asyncio.to_thread(process, raw, *variant)
+    except Exception:
+        return None
+
+    await asyncio.to_thread(_write_cached_icon, path, img)
+    return img
+
+
+# ───────────── database ─────────────
+
+def _load_fingerprints() -> Dict[str, str]:
+    """code -> hash of the columns the registry cares about (cheap to diff)."""
+    with get_cursor() as cur:
+        cur.execute(
+            "SELECT code, md5(concat_ws('|', name, subname, rarity, image_url)) AS fp FROM characters"
+        )
+        return {r["code"]: r["fp"] for r in cur.fetchall()}
+
+
+def _load_rows(codes: List[str]) -> List[dict]:
+    with get_cursor() as cur:
+        cur.execute(
+            "SELECT code, name, subname, rarity, image_url FROM characters WHERE code = ANY(%s)",
+            (codes,),
+        )
+        return cur.fetchall()
+
+
+def _char_map(rows) -> Dict[str, dict]:
+    char_map: Dict[str, dict] = {}
+    for r in rows:
+        url = r["image_url"]
+        if not url:
+            continue
+        fid = url.split("/")[-1].split(".")[0]  # 1003.png -> "1003"
+        char_map[fid] = {
+            "id": fid,
+            "name": r["name"],
+            "rarity": r["rarity"],
+            "image": url,
+        }
+    return char_map
+
+
+# ───────────── registry ─────────────
+
+class CharacterRegistry:
+    """
+    Owns shared_cache.char_map_cache / icon_cache / gp_icon.
+
+    `rows` holds every characters row (code -> name, subname, rarity,
+    image_url) and `version` goes up on every swap, so other caches
+    (e.g. unit name autocomplete) can rebuild only when something changed.
+    It also gives every character id a bit position for roster masks
+    (shared_cache.char_ids / char_index, see roster_model.py).
+
+    Icon URLs that failed to download are remembered with a backoff, so a
+    dead image is not re-requested (and the atlas not rebuilt) every refresh.
+    """
+
+    def __init__(self):
+        self.rows: Dict[str, dict] = {}
+        self.fingerprints: Dict[str, str] = {}
+        self.version = 0
+        self._failed_urls: Dict[str, Tuple[float, int]] = {}  # url -> (retry at, failures)
+        self._lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._listener: Optional[asyncpg.Connection] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.version > 0
+
+    def _retry_due(self, url: str, now: float) -> bool:
+        failed = self._failed_urls.get(url)
+        return failed is None or now >= failed[0]
+
+    def _note_download(self, url: str, ok: bool, now: float):
+        if ok:
+            self._failed_urls.pop(url, None)
+            return
+        failures = self._failed_urls.get(url, (0, 0))[1] + 1
+        delay = min(ICON_RETRY_SECONDS * 2 ** (failures - 1), ICON_RETRY_MAX_SECONDS)
+        self._failed_urls[url] = (now + delay, failures)
+        logging.warning(f"[Registry] Icon download failed ({failures}x), retrying in {delay}s: {url}")
+
+    async def refresh(self) -> bool:
+        """Apply whatever changed in the characters table; True if anything was swapped."""
+        async with self._lock:
+            fingerprints = await asyncio.to_thread(_load_fingerprints)
+            changed = [code for code, fp in fingerprints.items() if self.fingerprints.get(code) != fp]
+            removed = set(self.fingerprints) - set(fingerprints)
+
+            rows = {code: row for code, row in self.rows.items() if code not in removed}
+            if changed:
+                for r in await asyncio.to_thread(_load_rows, changed):
+                    rows[r["code"]] = dict(r)
+
+            old_map = shared_cache.char_map_cache or {}
+            old_icons = shared_cache.icon_cache
+            char_map = _char_map(rows.values())
+
+            # New characters, new art, new rarity (background colour) or a
+            # previously failed download whose backoff has run out
+            now = time.monotonic()
+            stale = [
+                fid for fid, meta in char_map.items()
+                if (
+                    fid not in old_icons
+                    or old_map.get(fid, {}).get("image") != meta["image"]
+                    or old_map.get(fid, {}).get("rarity") != meta["rarity"]
+                )
+                and self._retry_due(meta["image"], now)
+            ]
+            need_gp = shared_cache.gp_icon is None and self._retry_due(GP_ICON_URL, now)
+
+            if self.loaded and not changed and not removed and not stale and not need_gp:
+                return False
+
+            limit = asyncio.Semaphore(ICON_DOWNLOADS)
+            async with aiohttp.ClientSession(timeout=ICON_TIMEOUT) as session:
+                fetched = await asyncio.gather(*(
+                    _load_icon(session, limit, char_map[fid]["image"], _process_icon, char_map[fid]["rarity"])
+                    for fid in stale
+                ))
+                gp_icon = await _load_icon(session, limit, GP_ICON_URL, _process_gp_icon) if need_gp else None
+
+            for fid, icon in zip(stale, fetched):
+                self._note_download(char_map[fid]["image"], icon is not None, now)
+            if need_gp:
+                self._note_download(GP_ICON_URL, gp_icon is not None, now)
+
+            # Only retries, and they all failed again: the current atlas and
+            # worker pool are still right, so keep them
+            got = sum(icon is not None for icon in fetched) + (gp_icon is not None)
+            if self.loaded and not changed and not removed and not got:
+                return False
+
+            icon_cache = {fid: old_icons[fid] for fid in char_map if fid in old_icons and fid not in stale}
+            icon_cache.update((fid, icon) for fid, icon in zip(stale, fetched) if icon is not None)
+
+            # Swap: nothing below awaits, so no render sees half of the new version
+            self.rows = rows
+            self.fingerprints = fingerprints
+            shared_cache.char_map_cache = char_map
+            for fid in char_map:
+                if fid not in shared_cache.char_index:
+                    shared_cache.char_index[fid] = len(shared_cache.char_ids)
+                    shared_cache.char_ids.append(fid)
+            build_atlas(icon_cache, gp_icon)
+            self.version += 1
+
+        logging.info(
+            f"[Registry] v{self.version}: {len(changed)} changed, {len(removed)} removed, "
+            f"{len(icon_cache)}/{len(char_map)} icons ({got} fetched)"
+        )
+        # Workers copy the atlas once, so give them the new one
+        render_service.start()
+        return True
+
+    # ───────────── background refresh ─────────────
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._listener is not None and not self._listener.is_closed():
+            await self._listener.close()
+        self._listener = None
+
+    async def _listen(self):
+        try:
+            self._listener = await asyncpg.connect(DATABASE_URL, statement_cache_size=0)
+            await self._listener.add_listener(NOTIFY_CHANNEL, lambda *_: self._wake.set())
+        except Exception as e:
+            # e.g. behind a transaction pooler; the periodic refresh still runs
+            logging.warning(f"[Registry] LISTEN {NOTIFY_CHANNEL} unavailable, polling only: {e}")
+            self._listener = None
+
+    async def _run(self):
+        await self._listen()
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), CHARACTER_REFRESH_SECONDS)
+                await asyncio.sleep(1)  # let a burst of edits settle into one refresh
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+            try:
+                await self.refresh()
+            except Exception as e:
+                logging.error(f"[Registry] Refresh failed: {e}")
+
+            if self._listener is None or self._listener.is_closed():
+                await self._listen()
+
+
+registry = CharacterRegistry()
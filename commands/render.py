@@ -0,0 +1,662 @@
+# render.py
+"""
+Roster image rendering shared by /roster, /matchmaking and the queue.
+
+RosterRenderer draws the character grid for one player (single), two
+players with one badge each (dual), or a 2-player team (team). Icons and
+the GP icon come from shared_cache, filled by the character registry
+(registry.py).
+"""
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import discord
+import numpy as np
+from PIL import Image, ImageDraw, ImageEnhance, ImageFont
+
+from . import shared_cache
+from .roster_api import owned_map, roster_client
+from .roster_model import coverage_embed, mask_for
+
+GP_ID = "9999"
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0")) or max(1, min(4, (os.cpu_count() or 2) - 1))
+RENDER_QUEUE_LIMIT = int(os.getenv("RENDER_QUEUE_LIMIT", "32"))
+RENDER_CACHE_BYTES = int(os.getenv("RENDER_CACHE_BYTES", str(32 * 1024 * 1024)))
+
+# ───────────── output encoding ─────────────
+# png | png8 (palette) | webp (lossless) | webp-lossy
+ROSTER_FORMAT = os.getenv("ROSTER_FORMAT", "png8")
+ROSTER_MAX_BYTES = int(os.getenv("ROSTER_MAX_BYTES", str(4 * 1024 * 1024)))
+ROSTER_PNG_LEVEL = int(os.getenv("ROSTER_PNG_LEVEL", "3"))
+ROSTER_WEBP_QUALITY = int(os.getenv("ROSTER_WEBP_QUALITY", "85"))
+
+# ───────────── layout ─────────────
+
+ICON = 110
+GAP = 8
+PADDING = 20
+PER_ROW = 8
+
+TITLE_SIZE = 40
+TITLE_TOP = 30
+UNDERLINE_GAP = 8
+UNDERLINE_EXTRA = 24
+
+BADGE_W, BADGE_H = 40, 26
+
+WIDTH = PADDING * 2 + PER_ROW * ICON + (PER_ROW - 1) * GAP
+
+# Compact style: owned units only, smaller icons, capped with a "+N more" tile
+COMPACT_ICON = 72
+COMPACT_GAP = 6
+COMPACT_PER_ROW = (WIDTH - PADDING * 2 + COMPACT_GAP) // (COMPACT_ICON + COMPACT_GAP)
+COMPACT_BADGE_W, COMPACT_BADGE_H = 30, 20
+COMPACT_MAX = int(os.getenv("ROSTER_COMPACT_MAX", "48"))
+
+# full | compact; match announcements (queue, matchmaking) use ROSTER_MATCH_STYLE
+STYLES = ("full", "compact")
+ROSTER_MATCH_STYLE = os.getenv("ROSTER_MATCH_STYLE", "compact")
+
+# ───────────── fonts ─────────────
+
+FONT_PATH = os.path.join(
+    os.path.dirname(__file__),
+    "fonts",
+    "NotoSansSC-VariableFont_wght.ttf",
+)
+
+try:
+    BADGE_FONT = ImageFont.truetype(
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 15
+    )
+    COMPACT_BADGE_FONT = ImageFont.truetype(
+        "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 12
+    )
+except Exception:
+    BADGE_FONT = COMPACT_BADGE_FONT = ImageFont.load_default()
+
+
+@lru_cache(maxsize=8)
+def load_title_font(size: int) -> ImageFont.FreeTypeFont:
+    """Try to load HSR-like font, fallback to default."""
+    try:
+        return ImageFont.truetype(FONT_PATH, size)
+    except Exception:
+        try:
+            return ImageFont.truetype("DejaVuSans.ttf", size)
+        except Exception:
+            return ImageFont.load_default()
+
+
+class GridSpec(NamedTuple):
+    icon: int
+    gap: int
+    per_row: int
+    badge_w: int
+    badge_h: int
+    compact: bool
+
+
+FULL_GRID = GridSpec(ICON, GAP, PER_ROW, BADGE_W, BADGE_H, False)
+COMPACT_GRID = GridSpec(COMPACT_ICON, COMPACT_GAP, COMPACT_PER_ROW, COMPACT_BADGE_W, COMPACT_BADGE_H, True)
+
+
+class GridLayout(NamedTuple):
+    rows: int
+    grid_height: int
+    cells: Tuple[Tuple[int, int], ...]  # (x, y) of each icon, y relative to the grid top
+
+
+@lru_cache(maxsize=64)
+def grid_layout(count: int, spec: GridSpec = FULL_GRID) -> GridLayout:
+    """Icon positions for `count` characters; computed once per roster size."""
+    rows = max(1, math.ceil(count / spec.per_row))
+    step = spec.icon + spec.gap
+    left = (WIDTH - (spec.per_row * step - spec.gap)) // 2
+    cells = tuple(
+        (left + (i % spec.per_row) * step, (i // spec.per_row) * step)
+        for i in range(count)
+    )
+    return GridLayout(rows, rows * spec.icon + (rows - 1) * spec.gap + PADDING, cells)
+
+
+@lru_cache(maxsize=32)
+def gradient_background(width: int, height: int) -> Image.Image:
+    """Vertical background gradient for a canvas size; callers paint on a copy()."""
+    t = np.arange(height, dtype=np.float64) / max(1, (height - 1))
+    column = np.empty((height, 4), dtype=np.uint8)
+    column[:, 0] = (14 + (28 - 14) * t).astype(np.uint8)
+    column[:, 1] = (10 + (18 - 10) * t).astype(np.uint8)
+    column[:, 2] = (30 + (52 - 30) * t).astype(np.uint8)
+    column[:, 3] = 255
+    rows = np.broadcast_to(column[:, None, :], (height, width, 4))
+    return Image.fromarray(np.ascontiguousarray(rows), "RGBA")
+
+
+class RenderedImage(NamedTuple):
+    data: bytes
+    ext: str
+
+    def file(self, stem: str) -> discord.File:
+        return discord.File(io.BytesIO(self.data), filename=f"{stem}.{self.ext}")
+
+
+def _save(canvas: Image.Image, fmt: str, quality: int = ROSTER_WEBP_QUALITY, level: int = ROSTER_PNG_LEVEL) -> RenderedImage:
+    buffer = io.BytesIO()
+    if fmt == "png":
+        canvas.save(buffer, "PNG", compress_level=level)
+    elif fmt == "png8":
+        canvas.quantize(256, method=Image.Quantize.FASTOCTREE).save(buffer, "PNG", compress_level=level)
+    elif fmt == "webp":
+        canvas.save(buffer, "WEBP", lossless=True, quality=25, method=2)
+    elif fmt == "webp-lossy":
+        canvas.save(buffer, "WEBP", quality=quality, method=4)
+    else:
+        raise ValueError(f"Unknown roster format {fmt!r}")
+    return RenderedImage(buffer.getvalue(), "png" if fmt.startswith("png") else "webp")
+
+
+def encode_image(canvas: Image.Image, fmt: str = None, max_bytes: int = None) -> RenderedImage:
+    """
+    Encode a finished canvas in `fmt` (default ROSTER_FORMAT). If the result
+    exceeds `max_bytes`, progressively smaller encodings are tried and the
+    smallest one is returned.
+    """
+    fmt = fmt or ROSTER_FORMAT
+    max_bytes = max_bytes or ROSTER_MAX_BYTES
+
+    image = _save(canvas, fmt)
+    if len(image.data) <= max_bytes:
+        return image
+
+    fallbacks = [("png8", ROSTER_WEBP_QUALITY), ("webp-lossy", ROSTER_WEBP_QUALITY), ("webp-lossy", 70), ("webp-lossy", 50)]
+    for fallback, quality in fallbacks:
+        if fallback == fmt and quality == ROSTER_WEBP_QUALITY:
+            continue
+        candidate = _save(canvas, fallback, quality)
+        if len(candidate.data) < len(image.data):
+            image = candidate
+        if len(image.data) <= max_bytes:
+            break
+    return image
+
+
+def _dim(icon: Image.Image, brightness: float) -> Image.Image:
+    icon = ImageEnhance.Brightness(icon).enhance(brightness)
+    return icon.convert("LA").convert("RGBA")
+
+
+@lru_cache(maxsize=16)
+def badge_sprite(e_value: int, compact: bool = False) -> Tuple[Image.Image, Image.Image]:
+    """Pre-drawn "E{n}" badge and the mask of its rounded box."""
+    w, h = (COMPACT_BADGE_W, COMPACT_BADGE_H) if compact else (BADGE_W, BADGE_H)
+    font = COMPACT_BADGE_FONT if compact else BADGE_FONT
+    radius = 6 if compact else 8
+
+    size = (w + 1, h + 1)
+    sprite = Image.new("RGBA", size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(sprite)
+    # dark, no white outline (softer on the eyes)
+    draw.rounded_rectangle([0, 0, w, h], radius=radius, fill=(0, 0, 0, 190))
+
+    text = f"E{e_value}"
+    tb = draw.textbbox((0, 0), text, font=font)
+    tw = tb[2] - tb[0]
+    th = tb[3] - tb[1]
+    draw.text(((w - tw) // 2, (h - th) // 2 - (2 if compact else 3)), text, font=font, fill="white")
+
+    mask = Image.new("L", size, 0)
+    ImageDraw.Draw(mask).rounded_rectangle([0, 0, w, h], radius=radius, fill=255)
+    return sprite, mask
+
+
+@lru_cache(maxsize=32)
+def more_tile(hidden: int) -> Image.Image:
+    """Compact-style "+N more" tile standing in for the units past COMPACT_MAX."""
+    tile = Image.new("RGBA", (COMPACT_ICON, COMPACT_ICON), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(tile)
+    draw.rounded_rectangle([0, 0, COMPACT_ICON - 1, COMPACT_ICON - 1], radius=14, fill=(255, 255, 255, 40))
+
+    for text, font, y in ((f"+{hidden}", load_title_font(24), 14), ("more", COMPACT_BADGE_FONT, 46)):
+        tb = draw.textbbox((0, 0), text, font=font)
+        draw.text(((COMPACT_ICON - (tb[2] - tb[0])) // 2 - tb[0], y - tb[1]), text, font=font, fill="white")
+    return tile
+
+
+# character id -> the icon its dimmed / compact variants were made from
+_variant_sources: Dict[str, Image.Image] = {}
+
+
+def build_atlas(icon_cache: Optional[dict] = None, gp_icon=None):
+    """
+    Precompute every per-render image operation once, after icons are loaded:
+    icons at grid size, their dimmed and compact-size variants, the dimmed
+    GP icon and the E0–E6 badge sprites.
+
+    The result replaces the shared_cache dicts in one step instead of
+    mutating them, so a render already in progress keeps the atlas it
+    started with. Variants of unchanged icons are reused.
+    """
+    icons = shared_cache.icon_cache if icon_cache is None else icon_cache
+    gp_icon = shared_cache.gp_icon if gp_icon is None else gp_icon
+    old_dim, old_small = shared_cache.icon_dim_cache, shared_cache.icon_small_cache
+
+    fitted, dimmed, small = {}, {}, {}
+    for cid, icon in icons.items():
+        if icon.size != (ICON, ICON):
+            icon = icon.resize((ICON, ICON), Image.LANCZOS)
+        fitted[cid] = icon
+        if _variant_sources.get(cid) is icon and cid in old_dim and cid in old_small:
+            dimmed[cid] = old_dim[cid]
+            small[cid] = old_small[cid]
+        else:
+            dimmed[cid] = _dim(icon, 0.35)
+            small[cid] = icon.resize((COMPACT_ICON, COMPACT_ICON), Image.LANCZOS)
+            _variant_sources[cid] = icon
+
+    for cid in set(_variant_sources) - set(fitted):
+        del _variant_sources[cid]
+
+    for e_value in range(7):
+        badge_sprite(e_value)
+        badge_sprite(e_value, True)
+
+    shared_cache.icon_cache = fitted
+    shared_cache.icon_dim_cache = dimmed
+    shared_cache.icon_small_cache = small
+    shared_cache.gp_icon = gp_icon
+    shared_cache.gp_icon_dim = _dim(gp_icon, 0.3) if gp_icon else None
+    shared_cache.atlas_version += 1
+
+
+class RosterRenderer:
+    """
+    Draws roster cards.
+
+    Owned maps are {character id: eidolon}. Characters owned by nobody are
+    dimmed; the left badge belongs to the first player, the right one to
+    the second. The "compact" style leaves unowned characters out, uses
+    smaller icons and shows at most COMPACT_MAX of them, so its cost
+    follows the roster rather than the catalogue.
+    """
+
+    def __init__(self, char_map: Optional[dict] = None, icon_cache: Optional[dict] = None):
+        self._char_map = char_map
+        self._icon_cache = icon_cache
+
+    @property
+    def char_map(self) -> dict:
+        return self._char_map if self._char_map is not None else (shared_cache.char_map_cache or {})
+
+    @property
+    def icon_cache(self) -> dict:
+        return self._icon_cache if self._icon_cache is not None else shared_cache.icon_cache
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.char_map) and bool(self.icon_cache)
+
+    # ───────────── public layouts ─────────────
+
+    def single(self, title: str, owned: Dict[str, int], fmt: str = None, style: str = "full") -> RenderedImage:
+        return encode_image(self._draw(title, owned, {}, dual=False, style=style), fmt)
+
+    def dual(self, title: str, owned1: Dict[str, int], owned2: Dict[str, int], fmt: str = None, style: str = "full") -> RenderedImage:
+        return encode_image(self._draw(title, owned1, owned2, dual=True, style=style), fmt)
+
+    def team(self, team: List[discord.Member], entry1: Optional[dict], entry2: Optional[dict], style: str = "full") -> Optional[RenderedImage]:
+        """Combined card for a 2-player team, or None if neither has a roster."""
+        if len(team) < 2 or (not entry1 and not entry2) or not self.char_map:
+            return None
+        title = f"{team[0].display_name} • {team[1].display_name}"
+        return self.dual(title, owned_map(entry1), owned_map(entry2), style=style)
+
+    # ───────────── drawing ─────────────
+
+    def _draw(self, title_text: str, owned1: Dict[str, int], owned2: Dict[str, int], dual: bool, style: str = "full") -> Image.Image:
+        combined_owned = set(owned1) | set(owned2)
+        compact = style == "compact"
+        spec = COMPACT_GRID if compact else FULL_GRID
+
+        # One consistent view of the atlas, even if a registry refresh swaps it mid-draw
+        icon_cache = self.icon_cache
+        dim_cache = shared_cache.icon_dim_cache if self._icon_cache is None else {}
+        small_cache = shared_cache.icon_small_cache if self._icon_cache is None else {}
+        gp_icon, gp_icon_dim = shared_cache.gp_icon, shared_cache.gp_icon_dim
+
+        hidden = 0
+        if compact:
+            # Owned only, rarity then name; past COMPACT_MAX the last cell becomes "+N more"
+            char_map = self.char_map
+            sorted_chars = sorted(
+                (char_map[cid] for cid in combined_owned if cid in char_map and cid in icon_cache),
+                key=lambda c: (-c["rarity"], c["name"]),
+            )
+            if len(sorted_chars) > COMPACT_MAX:
+                hidden = len(sorted_chars) - (COMPACT_MAX - 1)
+                sorted_chars = sorted_chars[:COMPACT_MAX - 1]
+        else:
+            # Owned first, then rarity, then name
+            sorted_chars = sorted(
+                self.char_map.values(),
+                key=lambda c: (0 if c["id"] in combined_owned else 1, -c["rarity"], c["name"]),
+            )
+        layout = grid_layout(len(sorted_chars) + (1 if hidden else 0), spec)
+
+        title_font = load_title_font(TITLE_SIZE)
+        canvas = Image.new("RGBA", (1, 1))
+        draw = ImageDraw.Draw(canvas)
+        title_bbox = draw.textbbox((0, 0), title_text, font=title_font)
+        title_w = title_bbox[2] - title_bbox[0]
+        title_h = title_bbox[3] - title_bbox[1]
+
+        title_block_bottom = TITLE_TOP + title_h + UNDERLINE_GAP + 3 + UNDERLINE_EXTRA
+        grid_top = title_block_bottom + PADDING
+        height = grid_top + layout.grid_height
+
+        canvas = gradient_background(WIDTH, height).copy()
+        draw = ImageDraw.Draw(canvas)
+
+        # Title + GP icon(s) + underline
+        title_x = (WIDTH - title_w) // 2
+        title_y = TITLE_TOP
+        draw.text((title_x, title_y), title_text, font=title_font, fill="white")
+
+        if gp_icon:
+            gp_icon_dim = gp_icon_dim or _dim(gp_icon, 0.3)
+
+            def draw_gp_icon(x_pos, has_gp):
+                icon = gp_icon if has_gp else gp_icon_dim
+                canvas.paste(icon, (x_pos, title_y + 5), icon)
+
+            if dual:
+                draw_gp_icon(title_x - 40, GP_ID in owned1)
+                draw_gp_icon(title_x + title_w + 8, GP_ID in owned2)
+            else:
+                draw_gp_icon(title_x + title_w + 8, GP_ID in owned1)
+
+        underline_y = title_y + title_h + UNDERLINE_GAP + 10
+        margin = int(WIDTH * 0.28)
+        draw.line(
+            [(margin, underline_y), (WIDTH - margin, underline_y)],
+            fill=(255, 255, 255, 180),
+            width=3,
+        )
+
+        # Icons + Eidolon badges: only pastes, every variant is precomputed
+        size = spec.icon
+        for c, (x, y) in zip(sorted_chars, layout.cells):
+            cid = c["id"]
+            icon = icon_cache.get(cid)
+            if not icon:
+                continue
+            y += grid_top
+
+            if compact:
+                icon = small_cache.get(cid) or icon.resize((size, size), Image.LANCZOS)
+            elif cid not in combined_owned:
+                icon = dim_cache.get(cid) or _dim(self._fit(icon), 0.35)
+            elif icon.size != (ICON, ICON):
+                icon = self._fit(icon)
+            canvas.paste(icon, (x, y), icon)
+
+            badge_y = y + size - spec.badge_h - 4
+            e1 = owned1.get(cid)
+            e2 = owned2.get(cid) if dual else None
+            if e1 is not None:
+                self._paste_badge(canvas, e1, x + 4, badge_y, compact)
+            if e2 is not None:
+                self._paste_badge(canvas, e2, x + size - spec.badge_w - 4, badge_y, compact)
+
+        if hidden:
+            x, y = layout.cells[-1]
+            tile = more_tile(hidden)
+            canvas.paste(tile, (x, y + grid_top), tile)
+
+        return canvas
+
+    @staticmethod
+    def _fit(icon: Image.Image) -> Image.Image:
+        return icon if icon.size == (ICON, ICON) else icon.resize((ICON, ICON), Image.LANCZOS)
+
+    @staticmethod
+    def _paste_badge(canvas: Image.Image, e_value: int, bx: int, by: int, compact: bool = False):
+        sprite, mask = badge_sprite(e_value, compact)
+        canvas.paste(sprite, (bx, by), mask)
+
+
+renderer = RosterRenderer()
+
+
+# ───────────── process pool ─────────────
+
+def _init_worker(char_map: dict, icon_cache: dict, icon_dim_cache: dict, icon_small_cache: dict, gp_icon, gp_icon_dim):
+    """Runs once in every worker: install the icon atlas this process renders from."""
+    shared_cache.char_map_cache = char_map
+    shared_cache.icon_cache = icon_cache
+    shared_cache.icon_dim_cache = icon_dim_cache
+    shared_cache.icon_small_cache = icon_small_cache
+    shared_cache.gp_icon = gp_icon
+    shared_cache.gp_icon_dim = gp_icon_dim
+    for e_value in range(7):
+        badge_sprite(e_value)
+        badge_sprite(e_value, True)
+
+
+def _render_job(layout: str, title: str, owned1: Dict[str, int], owned2: Dict[str, int], style: str = "full") -> RenderedImage:
+    if layout == "dual":
+        return renderer.dual(title, owned1, owned2, style=style)
+    return renderer.single(title, owned1, style=style)
+
+
+class RenderQueueFull(Exception):
+    pass
+
+
+class RenderService:
+    """
+    Renders roster cards off the event loop.
+
+    Workers receive the icon atlas once through the pool initializer, so a
+    job only ships the title and owned maps. At most RENDER_QUEUE_LIMIT
+    renders may be waiting or running; beyond that render() raises
+    RenderQueueFull instead of piling up work.
+    """
+
+    def __init__(self, workers: int = RENDER_WORKERS, limit: int = RENDER_QUEUE_LIMIT):
+        self.workers = workers
+        self.limit = limit
+        self.pending = 0
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.slots = asyncio.Semaphore(workers * 2)
+
+    def start(self):
+        """(Re)start the workers with the current contents of shared_cache."""
+        old, self.pool = self.pool, None
+        if old is not None:
+            old.shutdown(wait=False, cancel_futures=False)
+        if not renderer.ready:
+            return
+        try:
+            self.pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(
+                    dict(renderer.char_map),
+                    dict(renderer.icon_cache),
+                    dict(shared_cache.icon_dim_cache),
+                    dict(shared_cache.icon_small_cache),
+                    shared_cache.gp_icon,
+                    shared_cache.gp_icon_dim,
+                ),
+            )
+        except Exception as e:
+            logging.error(f"[RenderService] Could not start worker pool, rendering in threads: {e}")
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    async def render(self, layout: str, title: str, owned1: Dict[str, int], owned2: Optional[Dict[str, int]] = None, style: str = "full") -> RenderedImage:
+        if self.pending >= self.limit:
+            raise RenderQueueFull()
+
+        self.pending += 1
+        try:
+            async with self.slots:
+                args = (layout, title, owned1, owned2 or {}, style)
+                if self.pool is not None:
+                    try:
+                        return await asyncio.get_running_loop().run_in_executor(self.pool, _render_job, *args)
+                    except BrokenProcessPool:
+                        logging.error("[RenderService] Worker pool died, restarting")
+                        self.start()
+                return await asyncio.to_thread(_render_job, *args)
+        finally:
+            self.pending -= 1
+
+
+render_service = RenderService()
+
+
+# ───────────── rendered output cache ─────────────
+
+class RenderCache:
+    """LRU of finished images, bounded by total bytes rather than entry count."""
+
+    def __init__(self, max_bytes: int = RENDER_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries: "OrderedDict[str, RenderedImage]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(layout: str, title: str, owned1: Dict[str, int], owned2: Optional[Dict[str, int]], style: str = "full") -> str:
+        payload = json.dumps(
+            [layout, style, title, sorted(owned1.items()), sorted((owned2 or {}).items()), shared_cache.atlas_version, ROSTER_FORMAT],
+            ensure_ascii=False,
+        )
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[RenderedImage]:
+        data = self.entries.get(key)
+        if data is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return data
+
+    def put(self, key: str, image: RenderedImage):
+        if len(image.data) > self.max_bytes:
+            return
+        old = self.entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old.data)
+        self.entries[key] = image
+        self.size += len(image.data)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted.data)
+
+
+render_cache = RenderCache()
+
+
+async def render_roster(layout: str, title: str, owned1: Dict[str, int], owned2: Optional[Dict[str, int]] = None, style: str = "full") -> RenderedImage:
+    """
+    Render a "single" or "dual" roster card, in the "full" or "compact"
+    style, without blocking the event loop.
+
+    Identical requests (same owned maps, title, layout and atlas) are served
+    from render_cache without touching Pillow.
+    """
+    key = RenderCache.key(layout, title, owned1, owned2, style)
+    image = render_cache.get(key)
+    if image is None:
+        image = await render_service.render(layout, title, owned1, owned2, style)
+        render_cache.put(key, image)
+    return image
+
+
+async def render_team(team: List[discord.Member], entry1: Optional[dict], entry2: Optional[dict], style: str = "full") -> Optional[RenderedImage]:
+    """Combined card for a 2-player team, or None if neither has a roster."""
+    if len(team) < 2 or (not entry1 and not entry2) or not renderer.char_map:
+        return None
+    title = f"{team[0].display_name} • {team[1].display_name}"
+    return await render_roster("dual", title, owned_map(entry1), owned_map(entry2), style)
+
+
+async def match_roster_parts(
+    team1: List[discord.Member],
+    team2: List[discord.Member],
+    style: str = ROSTER_MATCH_STYLE,
+) -> Tuple[List[discord.Embed], List[discord.File]]:
+    """
+    Team coverage summary (see roster_model.py) and one combined roster card
+    per 2-player team, ready to attach to a single match announcement.
+
+    All rosters come from one batched fetch and both cards render
+    concurrently. Never raises: on failure the announcement just goes out
+    without rosters.
+    """
+    if not renderer.ready:
+        return [], []
+
+    try:
+        teams = [team for team in (team1, team2) if len(team) >= 2]
+        entries = await roster_client.profiles(str(m.id) for team in teams for m in team[:2])
+
+        embeds = []
+        if len(teams) == 2 and any(entries.values()):
+            embed = coverage_embed(teams, {did: mask_for(did, entry) for did, entry in entries.items()})
+            if embed:
+                embeds.append(embed)
+
+        async def card(idx: int, team: List[discord.Member]) -> Optional[discord.File]:
+            try:
+                image = await render_team(team, entries.get(str(team[0].id)), entries.get(str(team[1].id)), style)
+            except RenderQueueFull:
+                logging.warning("[RenderService] Render queue full, skipping team roster")
+                return None
+            return image.file(f"team{idx}_roster") if image else None
+
+        files = await asyncio.gather(*(card(idx, team) for idx, team in enumerate((team1, team2), start=1) if len(team) >= 2))
+        return embeds, [f for f in files if f is not None]
+    except Exception as e:
+        logging.error(f"[RenderService] Failed to prepare match rosters: {e}")
+        return [], []
+
+
+async def send_match_announcement(
+    channel: discord.abc.Messageable,
+    content: str,
+    embeds: List[discord.Embed],
+    roster_embeds: List[discord.Embed],
+    roster_files: List[discord.File],
+) -> discord.Message:
+    """
+    Send a match announcement in one message. If that fails (an attachment
+    too large, a rejected embed), send it again without the roster cards and
+    coverage embed so the players still learn the match formed.
+    """
+    try:
+        return await channel.send(content, embeds=[*embeds, *roster_embeds], files=roster_files)
+    except discord.HTTPException as e:
+        if not roster_embeds and not roster_files:
+            raise
+        logging.error(f"[RenderService] Match announcement with rosters failed, resending without: {e}")
+        return await channel.send(content, embeds=embeds)
@@ -0,0 +1,78 @@
+# render_bench.py
+"""
+Compare roster output formats: encode time vs. upload size.
+
+    python -m commands.render_bench                  # synthetic 150-character roster
+    python -m commands.render_bench --image card.png # a real saved roster card
+"""
+import argparse
+import random
+import time
+
+from PIL import Image, ImageFilter
+
+from . import shared_cache
+from .render import ROSTER_PNG_LEVEL, ROSTER_WEBP_QUALITY, _save, build_atlas, renderer
+
+# label, format, webp quality, png compress level
+FORMATS = [
+    ("png (level 6, old default)", "png", ROSTER_WEBP_QUALITY, 6),
+    (f"png (level {ROSTER_PNG_LEVEL})", "png", ROSTER_WEBP_QUALITY, ROSTER_PNG_LEVEL),
+    (f"png8 (level {ROSTER_PNG_LEVEL})", "png8", ROSTER_WEBP_QUALITY, ROSTER_PNG_LEVEL),
+    ("webp lossless", "webp", ROSTER_WEBP_QUALITY, ROSTER_PNG_LEVEL),
+    ("webp q85", "webp-lossy", 85, ROSTER_PNG_LEVEL),
+    ("webp q70", "webp-lossy", 70, ROSTER_PNG_LEVEL),
+]
+
+
+def _synthetic_canvas(characters: int) -> Image.Image:
+    """Draw a realistic-looking card from blurred noise portraits."""
+    random.seed(7)
+    shared_cache.char_map_cache = {
+        str(1000 + i): {"id": str(1000 + i), "name": f"Character {i:03d}", "rarity": random.choice([4, 5]), "image": ""}
+        for i in range(characters)
+    }
+    shared_cache.icon_cache = {
+        cid: Image.merge("RGB", [
+            Image.effect_noise((110, 110), random.randint(20, 60)).filter(ImageFilter.GaussianBlur(3))
+            for _ in range(3)
+        ]).convert("RGBA")
+        for cid in shared_cache.char_map_cache
+    }
+    shared_cache.gp_icon = Image.new("RGBA", (32, 32), (220, 200, 90, 255))
+    build_atlas()
+
+    ids = list(shared_cache.char_map_cache)
+    owned1 = {cid: random.randint(0, 6) for cid in random.sample(ids, characters // 2)}
+    owned2 = {cid: random.randint(0, 6) for cid in random.sample(ids, characters // 3)}
+    return renderer._draw("Benchmark • Roster", owned1, owned2, dual=True)
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m commands.render_bench", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--image", default=None, help="benchmark an existing roster image instead of a synthetic one")
+    parser.add_argument("--characters", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    canvas = Image.open(args.image).convert("RGBA") if args.image else _synthetic_canvas(args.characters)
+    print(f"canvas {canvas.width}x{canvas.height}")
+    print(f"{'format':<28}{'encode ms':>10}{'size KB':>10}")
+
+    for label, fmt, quality, level in FORMATS:
+        seconds = _time(lambda: _save(canvas, fmt, quality, level), args.repeat)
+        size = len(_save(canvas, fmt, quality, level).data)
+        print(f"{label:<28}{seconds * 1000:>10.1f}{size / 1024:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
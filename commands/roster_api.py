@@ -0,0 +1,242 @@
+# roster_api.py
+"""
+Client for the draft-api roster endpoint (`{ROSTER_API}/{discord_id}/profile-characters`).
+
+One long-lived RosterClient shares a bounded connection pool between
+/roster and match announcements. Profiles are cached per user: fresh for
+ROSTER_FRESH_SECONDS, then served stale while a background request
+revalidates them (conditional, via ETag or body hash) for up to
+ROSTER_STALE_SECONDS. A circuit breaker stops waiting on the API after
+repeated failures and answers from the cache until it recovers.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+load_dotenv()
+
+ROSTER_API = os.getenv("ROSTER_API") or "https://draft-api.cipher.uno/user"
+ROSTER_TIMEOUT = aiohttp.ClientTimeout(total=20, connect=5, sock_read=15)
+ROSTER_CONNECTIONS = int(os.getenv("ROSTER_CONNECTIONS", "8"))
+ROSTER_FRESH_SECONDS = float(os.getenv("ROSTER_FRESH_SECONDS", "60"))
+ROSTER_STALE_SECONDS = float(os.getenv("ROSTER_STALE_SECONDS", "3600"))
+PROFILE_CACHE_SIZE = 512
+
+BREAKER_FAILURES = 3    # consecutive failures before the breaker opens
+BREAKER_COOLDOWN = 30   # seconds to stop calling the API once open
+
+
+class CircuitBreaker:
+    """
+    Closed: every call goes through. After `failures` consecutive failures
+    it opens for `cooldown` seconds and allow() says no; then a single trial
+    call is let through (half-open) and its outcome closes or re-opens it.
+    """
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN, clock: Callable[[], float] = time.monotonic):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.clock = clock
+        self.consecutive = 0
+        self.opened_at: Optional[float] = None
+        self.trial = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.trial or self.clock() - self.opened_at < self.cooldown:
+            return False
+        self.trial = True
+        return True
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logging.info("[RosterAPI] Circuit closed")
+        self.consecutive = 0
+        self.opened_at = None
+        self.trial = False
+
+    def record_failure(self):
+        self.consecutive += 1
+        if self.trial or self.consecutive >= self.failures:
+            if self.opened_at is None or self.trial:
+                logging.warning(f"[RosterAPI] Circuit open for {self.cooldown}s after {self.consecutive} failures")
+            self.opened_at = self.clock()
+            self.trial = False
+
+
+class _Profile:
+    __slots__ = ("etag", "body_hash", "data", "fetched_at")
+
+    def __init__(self, etag: Optional[str], body_hash: Optional[str], data: Optional[dict], fetched_at: float):
+        self.etag = etag
+        self.body_hash = body_hash
+        self.data = data
+        self.fetched_at = fetched_at
+
+
+class RosterClient:
+    """
+    Long-lived roster API client.
+
+    `base_url`, `clock` and `breaker` can be injected, e.g. to point it at a
+    local stub server with a fake clock.
+    """
+
+    def __init__(
+        self,
+        base_url: str = ROSTER_API,
+        timeout: aiohttp.ClientTimeout = ROSTER_TIMEOUT,
+        connections: int = ROSTER_CONNECTIONS,
+        fresh_seconds: float = ROSTER_FRESH_SECONDS,
+        stale_seconds: float = ROSTER_STALE_SECONDS,
+        cache_size: int = PROFILE_CACHE_SIZE,
+        breaker: Optional[CircuitBreaker] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.connections = connections
+        self.fresh_seconds = fresh_seconds
+        self.stale_seconds = stale_seconds
+        self.cache_size = cache_size
+        self.clock = clock
+        self.breaker = breaker or CircuitBreaker(clock=clock)
+        self._session: Optional[aiohttp.ClientSession] = None
+        # discord_id -> last response, least recently used first
+        self._profiles: "OrderedDict[str, _Profile]" = OrderedDict()
+        # discord_id -> request in flight, shared by everyone asking for that user
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=self.timeout,
+                connector=aiohttp.TCPConnector(limit=self.connections, ttl_dns_cache=300),
+            )
+        return self._session
+
+    async def close(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    # ───────────── public ─────────────
+
+    async def profile(self, discord_id: Optional[str]) -> Optional[dict]:
+        """A player's saved roster, or None if they have none (or the API is unavailable)."""
+        if not discord_id:
+            return None
+
+        cached = self._profiles.get(discord_id)
+        if cached is not None:
+            self._profiles.move_to_end(discord_id)
+            age = self.clock() - cached.fetched_at
+            if age < self.fresh_seconds:
+                return cached.data
+            if age < self.stale_seconds or self.breaker.is_open:
+                self._revalidate(discord_id)
+                return cached.data
+
+        return await asyncio.shield(self._revalidate(discord_id))
+
+    async def profiles(self, discord_ids: Iterable[Optional[str]]) -> Dict[str, Optional[dict]]:
+        """Fetch several players at once; {discord_id: roster or None}."""
+        ids = list(dict.fromkeys(i for i in discord_ids if i))
+        results = await asyncio.gather(*(self.profile(i) for i in ids))
+        return dict(zip(ids, results))
+
+    # ───────────── internals ─────────────
+
+    def _revalidate(self, discord_id: str) -> asyncio.Task:
+        task = self._inflight.get(discord_id)
+        if task is None:
+            task = asyncio.create_task(self._fetch(discord_id))
+            self._inflight[discord_id] = task
+            task.add_done_callback(lambda _: self._inflight.pop(discord_id, None))
+        return task
+
+    def _remember(self, discord_id: str, etag: Optional[str], body_hash: Optional[str], data: Optional[dict]) -> Optional[dict]:
+        self._profiles[discord_id] = _Profile(etag, body_hash, data, self.clock())
+        self._profiles.move_to_end(discord_id)
+        while len(self._profiles) > self.cache_size:
+            self._profiles.popitem(last=False)
+        return data
+
+    def _record(self, healthy: Optional[bool]):
+        if healthy:
+            self.breaker.record_success()
+        elif healthy is False or self.breaker.trial:
+            # A half-open trial must always resolve, or the breaker never closes again
+            self.breaker.record_failure()
+
+    async def _fetch(self, discord_id: str) -> Optional[dict]:
+        cached = self._profiles.get(discord_id)
+        fallback = cached.data if cached else None
+        if not self.breaker.allow():
+            return fallback
+
+        url = f"{self.base_url}/{discord_id}/profile-characters"
+        headers = {"If-None-Match": cached.etag} if cached and cached.etag else None
+        # True/False: the API is up/down. None: it answered, but not usefully
+        # (e.g. 403); only a half-open trial counts that as a failure.
+        healthy: Optional[bool] = None
+        try:
+            async with self._get_session().get(url, headers=headers) as resp:
+                if resp.status == 304 and cached:
+                    healthy = True
+                    return self._remember(discord_id, cached.etag, cached.body_hash, cached.data)
+                if resp.status == 404:
+                    healthy = True
+                    return self._remember(discord_id, None, None, None)
+                if resp.status != 200:
+                    if resp.status >= 500 or resp.status == 429:
+                        healthy = False
+                    return fallback
+
+                body = await resp.read()
+                etag = resp.headers.get("ETag")
+                healthy = True
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            healthy = False
+            return fallback
+        finally:
+            self._record(healthy)
+
+        body_hash = hashlib.sha1(body).hexdigest()
+        if cached and cached.body_hash == body_hash:
+            return self._remember(discord_id, etag or cached.etag, body_hash, cached.data)
+
+        try:
+            data = json.loads(body)
+        except ValueError:
+            return fallback
+        if isinstance(data, dict) and isinstance(data.get("profileCharacters"), list):
+            return self._remember(discord_id, etag, body_hash, data)
+        return fallback
+
+
+roster_client = RosterClient()
+
+
+def owned_map(entry: Optional[dict]) -> Dict[str, int]:
+    """{character id: eidolon} for a profile-characters payload."""
+    if not entry:
+        return {}
+    return {c["id"]: c["eidolon"] for c in entry.get("profileCharacters", [])}
@@ -0,0 +1,147 @@
+# roster_api_check.py
+"""
+Exercise RosterClient against a local stub of the roster API.
+
+    python -m commands.roster_api_check
+
+Starts an aiohttp server on 127.0.0.1 whose responses each scenario
+scripts, drives the client with a fake clock, and prints one line per
+check. Exits non-zero if any check fails. No network or database needed.
+"""
+import asyncio
+import json
+import sys
+from typing import List
+
+from aiohttp import web
+
+from .roster_api import CircuitBreaker, RosterClient
+
+PROFILE = {"profileCharacters": [{"id": "1001", "eidolon": 2}]}
+
+
+class StubApi:
+    """Answers each request with the next scripted status (the last one repeats)."""
+
+    def __init__(self):
+        self.statuses: List[int] = [200]
+        self.hits = 0
+        self.runner = None
+        self.url = ""
+
+    def script(self, *statuses: int):
+        self.statuses = list(statuses)
+        self.hits = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.hits += 1
+        status = self.statuses[min(self.hits, len(self.statuses)) - 1]
+        if status == 200:
+            return web.json_response(PROFILE, headers={"ETag": '"v1"'})
+        return web.Response(status=status)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/user/{discord_id}/profile-characters", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/user"
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _client(api: StubApi, clock: FakeClock) -> RosterClient:
+    return RosterClient(api.url, fresh_seconds=60, stale_seconds=3600, breaker=CircuitBreaker(failures=3, cooldown=30, clock=clock), clock=clock)
+
+
+async def _open_breaker(client: RosterClient, api: StubApi, clock: FakeClock):
+    api.script(500)
+    for i in range(3):
+        await client.profile(f"down{i}")
+    clock.now += 31  # cooldown over: the next request is the half-open trial
+
+
+async def check_cache_and_revalidate(api: StubApi) -> bool:
+    clock = FakeClock()
+    client = _client(api, clock)
+    try:
+        api.script(200, 304)
+        first = await client.profile("1")
+        again = await client.profile("1")         # fresh: no request
+        clock.now += 120
+        stale = await client.profile("1")         # stale: served, revalidated in the background
+        await asyncio.sleep(0.05)
+        return first == PROFILE and again is first and stale is first and api.hits == 2
+    finally:
+        await client.close()
+
+
+async def check_breaker_opens(api: StubApi) -> bool:
+    clock = FakeClock()
+    client = _client(api, clock)
+    try:
+        api.script(500)
+        for i in range(3):
+            await client.profile(f"down{i}")
+        hits = api.hits
+        await client.profile("down9")             # open: answered without a request
+        return client.breaker.is_open and api.hits == hits
+    finally:
+        await client.close()
+
+
+async def check_trial_resolves(api: StubApi, trial_status: int) -> bool:
+    """A half-open trial answered with `trial_status` must not wedge the breaker."""
+    clock = FakeClock()
+    client = _client(api, clock)
+    try:
+        await _open_breaker(client, api, clock)
+        api.script(trial_status)
+        await client.profile("trial")
+        if client.breaker.trial:
+            return False                          # stuck half-open: allow() would say no forever
+
+        clock.now += 31
+        api.script(200)
+        recovered = await client.profile("after")
+        return recovered == PROFILE and not client.breaker.is_open
+    finally:
+        await client.close()
+
+
+async def main() -> int:
+    api = StubApi()
+    await api.start()
+    try:
+        checks = [
+            ("cache + conditional revalidation", check_cache_and_revalidate(api)),
+            ("breaker opens after repeated 5xx", check_breaker_opens(api)),
+            ("half-open trial answered 200", check_trial_resolves(api, 200)),
+            ("half-open trial answered 403", check_trial_resolves(api, 403)),
+            ("half-open trial answered 304 (nothing cached)", check_trial_resolves(api, 304)),
+            ("half-open trial answered 500", check_trial_resolves(api, 500)),
+        ]
+        failed = 0
+        for label, check in checks:
+            ok = await check
+            failed += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {label}")
+        return 1 if failed else 0
+    finally:
+        await api.stop()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,199 @@
+# roster_model.py
+"""
+Compact roster ownership: one integer bitmask per player.
+
+Bit i stands for shared_cache.char_ids[i], so comparing or combining rosters is a
+single big-int operation (|, &, & ~) instead of building dicts and sets.
+Masks are cached per player and rebuilt only when the roster payload or
+the atlas version changes.
+"""
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import discord
+
+from . import shared_cache
+from .roster_api import PROFILE_CACHE_SIZE, owned_map
+
+
+class RosterMask(NamedTuple):
+    owned: int        # bit i set -> owns shared_cache.char_ids[i]
+    eidolons: bytes   # eidolon per bit position, 0 where not owned
+
+    def eidolon(self, cid: str) -> Optional[int]:
+        i = shared_cache.char_index.get(cid)
+        if i is None or not self.owned >> i & 1:
+            return None
+        return self.eidolons[i]
+
+
+EMPTY = RosterMask(0, b"")
+
+# discord_id -> (payload the mask was built from, atlas version, mask)
+_masks: "OrderedDict[str, Tuple[Optional[dict], int, RosterMask]]" = OrderedDict()
+
+
+def to_mask(owned: Dict[str, int]) -> RosterMask:
+    index = shared_cache.char_index
+    bits = 0
+    eidolons = bytearray(len(index))
+    for cid, e_value in owned.items():
+        i = index.get(cid)
+        if i is None:
+            continue
+        bits |= 1 << i
+        eidolons[i] = e_value
+    return RosterMask(bits, bytes(eidolons))
+
+
+def mask_for(discord_id: str, entry: Optional[dict]) -> RosterMask:
+    """Cached mask for a player's profile-characters payload (as returned by roster_client)."""
+    if not entry:
+        return EMPTY
+    cached = _masks.get(discord_id)
+    if cached is not None and cached[0] is entry and cached[1] == shared_cache.atlas_version:
+        _masks.move_to_end(discord_id)
+        return cached[2]
+
+    mask = to_mask(owned_map(entry))
+    _masks[discord_id] = (entry, shared_cache.atlas_version, mask)
+    _masks.move_to_end(discord_id)
+    while len(_masks) > PROFILE_CACHE_SIZE:
+        _masks.popitem(last=False)
+    return mask
+
+
+_registry_masks: Tuple[int, int, int] = (-1, 0, 0)   # (atlas version, every character, 5★ only)
+
+
+def _masks_for_registry() -> Tuple[int, int]:
+    global _registry_masks
+    if _registry_masks[0] != shared_cache.atlas_version:
+        index = shared_cache.char_index
+        total = five_star = 0
+        for cid, meta in (shared_cache.char_map_cache or {}).items():
+            i = index.get(cid)
+            if i is None:
+                continue
+            total |= 1 << i
+            if meta["rarity"] == 5:
+                five_star |= 1 << i
+        _registry_masks = (shared_cache.atlas_version, total, five_star)
+    return _registry_masks[1], _registry_masks[2]
+
+
+def all_mask() -> int:
+    """Every character currently in the registry."""
+    return _masks_for_registry()[0]
+
+
+def five_star_mask() -> int:
+    return _masks_for_registry()[1]
+
+
+def count(bits: int) -> int:
+    return bits.bit_count()
+
+
+def ids_of(bits: int) -> List[str]:
+    ids = shared_cache.char_ids
+    out = []
+    while bits:
+        low = bits & -bits
+        out.append(ids[low.bit_length() - 1])
+        bits ^= low
+    return out
+
+
+def sorted_chars(bits: int) -> List[dict]:
+    """Characters in a mask, 5★ first, then by name."""
+    char_map = shared_cache.char_map_cache or {}
+    chars = [char_map[cid] for cid in ids_of(bits) if cid in char_map]
+    return sorted(chars, key=lambda c: (-c["rarity"], c["name"]))
+
+
+# ───────────── summaries ─────────────
+
+def _name_list(chars: Sequence[dict], masks: Sequence[RosterMask] = (), limit: int = 1000) -> str:
+    if not chars:
+        return "—"
+    parts = []
+    for c in chars:
+        eidolons = [m.eidolon(c["id"]) for m in masks]
+        label = c["name"]
+        if eidolons:
+            label += " " + "/".join("–" if e is None else f"E{e}" for e in eidolons)
+        parts.append(label)
+
+    text, shown = "", 0
+    for part in parts:
+        piece = part if not text else f", {part}"
+        if len(text) + len(piece) > limit:
+            break
+        text += piece
+        shown += 1
+    if shown < len(parts):
+        text += f" … +{len(parts) - shown} more"
+    return text
+
+
+def compare_embed(name1: str, mask1: RosterMask, name2: str, mask2: RosterMask) -> discord.Embed:
+    total = all_mask()
+    a, b = mask1.owned & total, mask2.owned & total
+    both, only_a, only_b = a & b, a & ~b, b & ~a
+    neither = total & ~(a | b)
+
+    embed = discord.Embed(
+        title=f"{name1} vs {name2}",
+        description=(
+            f"{name1}: **{count(a)}** units • {name2}: **{count(b)}** units\n"
+            f"Together: **{count(a | b)}** of {count(total)} • Neither: **{count(neither)}**"
+        ),
+        color=0xB197FC,
+    )
+    embed.add_field(name=f"Both own ({count(both)})", value=_name_list(sorted_chars(both), (mask1, mask2)), inline=False)
+    embed.add_field(name=f"Only {name1} ({count(only_a)})", value=_name_list(sorted_chars(only_a), (mask1,)), inline=False)
+    embed.add_field(name=f"Only {name2} ({count(only_b)})", value=_name_list(sorted_chars(only_b), (mask2,)), inline=False)
+    embed.set_footer(text="Handled with care by Kyasutorisu")
+    return embed
+
+
+def coverage_embed(teams: Sequence[Sequence[discord.Member]], masks: Dict[str, RosterMask]) -> Optional[discord.Embed]:
+    """Per-team coverage for a 2v2 match, plus what only one side can field."""
+    total = all_mask()
+    if not total:
+        return None
+
+    team_bits = []
+    for team in teams:
+        team_masks = [masks.get(str(m.id), EMPTY).owned & total for m in team]
+        union, both = 0, total
+        for bits in team_masks:
+            union |= bits
+            both &= bits
+        team_bits.append((union, both if team_masks else 0))
+
+    embed = discord.Embed(
+        title="Roster Coverage",
+        description="Which threads each side can draw on.",
+        color=0xB197FC,
+    )
+    five_star = five_star_mask()
+    for idx, (union, both) in enumerate(team_bits, start=1):
+        embed.add_field(
+            name=f"Team {idx}",
+            value=(
+                f"**{count(union)}**/{count(total)} units • **{count(union & five_star)}** 5★\n"
+                f"Both players own **{count(both)}**"
+            ),
+            inline=True,
+        )
+
+    if len(team_bits) == 2:
+        (u1, _), (u2, _) = team_bits
+        embed.add_field(name="Contested", value=f"**{count(u1 & u2)}** units both teams can field", inline=False)
+        embed.add_field(name=f"Only Team 1 ({count(u1 & ~u2)})", value=_name_list(sorted_chars(u1 & ~u2 & five_star), limit=500), inline=False)
+        embed.add_field(name=f"Only Team 2 ({count(u2 & ~u1)})", value=_name_list(sorted_chars(u2 & ~u1 & five_star), limit=500), inline=False)
+        embed.add_field(name="Nobody owns", value=f"**{count(total & ~(u1 | u2))}** units", inline=False)
+    embed.set_footer(text="Only-team lists show 5★ units • Woven gently by Kyasutorisu")
+    return embed
@@ -1,3 +1,16 @@
 char_map_cache = None
 icon_cache = {}
 gp_icon = None
+
+# Variants precomputed by render.build_atlas() after every preload
+icon_dim_cache = {}
+icon_small_cache = {}   # compact-style icons (render.COMPACT_ICON)
+gp_icon_dim = None
+
+# Bumped whenever the atlas is rebuilt; part of every rendered-image cache key
+atlas_version = 0
+
+# Bit position of every character id for roster masks (roster_model.py).
+# Positions are only ever appended, so older masks stay valid.
+char_ids = []
+char_index = {}
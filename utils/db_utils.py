@@ -11,18 +11,34 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Advisory lock key guarding rating writes: match commits take it shared (so
+# they still run in parallel), history replays take it exclusive.
+RATING_LOCK_KEY = 0x43495048
+
+# Ratings are checkpointed into rating_checkpoints every this many matches,
+# so undoing an older match only replays what came after (utils/replay.py).
+RATING_CHECKPOINT_INTERVAL = int(os.getenv("RATING_CHECKPOINT_INTERVAL", "1000"))
+
 @contextmanager
-def get_connection():
+def get_connection(dsn: str = None):
     """Context manager for database connections to ensure proper closing."""
     conn = None
     try:
-        conn = psycopg2.connect(DATABASE_URL, cursor_factory=RealDictCursor)
+        conn = psycopg2.connect(dsn or DATABASE_URL, cursor_factory=RealDictCursor)
         yield conn
     finally:
         if conn is not None:
             conn.close()
 
 
+def hold_rating_lock(cursor, exclusive=False):
+    """Take the rating advisory lock until the current transaction ends."""
+    if exclusive:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (RATING_LOCK_KEY,))
+    else:
+        cursor.execute("SELECT pg_advisory_xact_lock_shared(%s)", (RATING_LOCK_KEY,))
+
+
 @contextmanager
 def get_cursor(commit=False):
     """Context manager for database cursors with optional commit."""
@@ -46,6 +62,7 @@ def initialize_db():
                 elo INTEGER NOT NULL,
                 games_played INTEGER NOT NULL,
                 win_rate REAL NOT NULL,
+                wins INTEGER NOT NULL DEFAULT 0,
                 uid TEXT,
                 mirror_id TEXT,
                 points INTEGER DEFAULT 0,
@@ -63,39 +80,150 @@ def initialize_db():
                 has_character_data BOOLEAN DEFAULT FALSE
             )
         ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rating_checkpoints (
+                match_id INTEGER PRIMARY KEY,  -- state after this match was applied
+                player_ids TEXT[] NOT NULL,
+                elo DOUBLE PRECISION[] NOT NULL,
+                games_played INTEGER[] NOT NULL,
+                wins INTEGER[] NOT NULL,
+                created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        ''')
+        # Base checkpoint, so undos can re-rate later matches from day one
+        # instead of waiting for the first interval or a manual replay
+        cursor.execute("SELECT EXISTS (SELECT 1 FROM rating_checkpoints) AS present")
+        if not cursor.fetchone()['present']:
+            hold_rating_lock(cursor, exclusive=True)
+            _save_players_checkpoint(cursor)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rating_seasons (
+                season_id SERIAL PRIMARY KEY,
+                starts_after_match_id INTEGER NOT NULL,  -- last match of the previous season
+                started_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+            )
+        ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS queue_entries (
+                discord_id TEXT NOT NULL,
+                queue_name TEXT NOT NULL,        -- see QUEUES in commands/queue.py
+                guild_id BIGINT NOT NULL,
+                channel_id BIGINT,               -- where they joined (queue messages go there)
+                joined_at TIMESTAMPTZ NOT NULL,
+                PRIMARY KEY (discord_id, queue_name)
+            )
+        ''')
+        # The queue used to be a single 2v2 queue; a player can now wait in several
+        cursor.execute(
+            "SELECT 1 FROM information_schema.columns WHERE table_name = 'queue_entries' AND column_name = 'queue_name'"
+        )
+        if cursor.fetchone() is None:
+            cursor.execute("ALTER TABLE queue_entries ADD COLUMN queue_name TEXT NOT NULL DEFAULT '2v2'")
+            cursor.execute("ALTER TABLE queue_entries DROP CONSTRAINT queue_entries_pkey")
+            cursor.execute("ALTER TABLE queue_entries ADD PRIMARY KEY (discord_id, queue_name)")
+        # Older tables only tracked the win_rate float; backfill an integer
+        # win counter so matches can be applied as atomic increments.
+        cursor.execute("ALTER TABLE players ADD COLUMN IF NOT EXISTS wins INTEGER")
+        cursor.execute("UPDATE players SET wins = ROUND(win_rate * games_played) WHERE wins IS NULL")
+        cursor.execute("ALTER TABLE players ALTER COLUMN wins SET DEFAULT 0")
+        cursor.execute("ALTER TABLE players ALTER COLUMN wins SET NOT NULL")
+
+        # Tell the character registry (commands/registry.py) when a unit's
+        # name, rarity or art changes; counter updates don't fire it.
+        cursor.execute("SELECT to_regclass('characters') IS NOT NULL AS present")
+        if cursor.fetchone()['present']:
+            cursor.execute('''
+                CREATE OR REPLACE FUNCTION notify_characters_changed() RETURNS trigger AS $$
+                BEGIN
+                    IF TG_OP = 'DELETE' THEN
+                        PERFORM pg_notify('characters_changed', OLD.code);
+                    ELSE
+                        PERFORM pg_notify('characters_changed', NEW.code);
+                    END IF;
+                    RETURN NULL;
+                END
+                $$ LANGUAGE plpgsql
+            ''')
+            cursor.execute("DROP TRIGGER IF EXISTS characters_changed ON characters")
+            cursor.execute('''
+                CREATE TRIGGER characters_changed
+                AFTER INSERT OR DELETE OR UPDATE OF name, subname, rarity, image_url ON characters
+                FOR EACH ROW EXECUTE FUNCTION notify_characters_changed()
+            ''')
+
+
+def _row_wins(row):
+    wins = row.get('wins')
+    if wins is None:
+        wins = round((row.get('win_rate') or 0.0) * (row.get('games_played') or 0))
+    return wins
+
+
+def _player_from_row(row):
+    return {
+        "nickname": row.get('nickname', ''),
+        "elo": row['elo'],
+        "games_played": row['games_played'],
+        "win_rate": row['win_rate'],
+        "wins": _row_wins(row),
+        "uid": row.get('uid', 'Not Registered'),
+        "mirror_id": row.get('mirror_id', 'Not Set'),
+        "points": row.get('points', 0),
+        "description": row.get('description', ''),
+        "color": row.get('color', 0xB197FC),
+        "banner_url": row.get('banner_url', None)
+    }
 
 
 def load_elo_data():
     with get_cursor() as cursor:
         cursor.execute("SELECT * FROM players")
         rows = cursor.fetchall()
-        return {
-            row['discord_id']: {
-                "nickname": row.get('nickname', ''),
-                "elo": row['elo'],
-                "games_played": row['games_played'],
-                "win_rate": row['win_rate'],
-                "uid": row.get('uid', 'Not Registered'),
-                "mirror_id": row.get('mirror_id', 'Not Set'),
-                "points": row.get('points', 0),
-                "description": row.get('description', ''),
-                "color": row.get('color', 0xB197FC),
-                "banner_url": row.get('banner_url', None)
-            } for row in rows
-        }
+        return {row['discord_id']: _player_from_row(row) for row in rows}
+
+
+def load_players(player_ids):
+    """Just the given players, in the same shape as load_elo_data()."""
+    ids = sorted({str(pid) for pid in player_ids})
+    with get_cursor() as cursor:
+        cursor.execute("SELECT * FROM players WHERE discord_id = ANY(%s)", (ids,))
+        rows = cursor.fetchall()
+        return {row['discord_id']: _player_from_row(row) for row in rows}
+
+
+def load_rank_context(player_ids):
+    """
+    Load just enough of the players table to rank the given players.
+
+    Returns the given players plus the current top (3 + len(player_ids)) by
+    ELO, in the same shape as load_elo_data(). That covers the Cipher
+    Champion top 3 and anyone the given players may have pushed out of it.
+    """
+    ids = sorted({str(pid) for pid in player_ids})
+    with get_cursor() as cursor:
+        cursor.execute('''
+            SELECT * FROM players
+            WHERE discord_id = ANY(%s)
+               OR discord_id IN (
+                   SELECT discord_id FROM players ORDER BY elo DESC LIMIT %s
+               )
+        ''', (ids, 3 + len(ids)))
+        rows = cursor.fetchall()
+        return {row['discord_id']: _player_from_row(row) for row in rows}
 
 
 def save_elo_data(data):
     with get_cursor(commit=True) as cursor:
         for discord_id, stats in data.items():
             cursor.execute('''
-                INSERT INTO players (discord_id, nickname, elo, games_played, win_rate, uid, mirror_id, points, description, color, banner_url)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                INSERT INTO players (discord_id, nickname, elo, games_played, win_rate, wins, uid, mirror_id, points, description, color, banner_url)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
                 ON CONFLICT (discord_id) DO UPDATE SET
                     nickname = EXCLUDED.nickname,
                     elo = EXCLUDED.elo,
                     games_played = EXCLUDED.games_played,
                     win_rate = EXCLUDED.win_rate,
+                    wins = EXCLUDED.wins,
                     uid = EXCLUDED.uid,
                     mirror_id = EXCLUDED.mirror_id,
                     points = EXCLUDED.points,
@@ -108,6 +236,7 @@ def save_elo_data(data):
                 stats.get("elo", 200),
                 stats.get("games_played", 0),
                 stats.get("win_rate", 0.0),
+                _row_wins(stats),
                 stats.get("uid", "Not Registered"),
                 stats.get("mirror_id", "Not Set"),
                 stats.get("points", 0),
@@ -126,26 +255,31 @@ def load_match_history():
 def save_match_history(match_data):
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO matches (timestamp, elo_gains, raw_data, has_character_data)
-            VALUES (%s, %s, %s, %s)
-            RETURNING match_id
-        ''', (
-            datetime.now().isoformat(),
-            json.dumps(match_data.get("elo_gains", {})),
-            json.dumps(match_data),
-            True
-        ))  
-        match_id = cursor.fetchone()['match_id']
+        match_id = _insert_match(cursor, match_data)
         conn.commit()
         return match_id
 
 
+def _insert_match(cursor, match_data):
+    cursor.execute('''
+        INSERT INTO matches (timestamp, elo_gains, raw_data, has_character_data)
+        VALUES (%s, %s, %s, %s)
+        RETURNING match_id
+    ''', (
+        datetime.now().isoformat(),
+        json.dumps(match_data.get("elo_gains", {})),
+        json.dumps(match_data),
+        True
+    ))
+    return cursor.fetchone()['match_id']
+
+
 def initialize_player_data(player_id):
     return {
         "elo": 200,
         "games_played": 0,
         "win_rate": 0.0,
+        "wins": 0,
         "uid": "Not Registered",
         "mirror_id": "Not Set",
         "points": 0,
@@ -154,114 +288,294 @@ def initialize_player_data(player_id):
     }
 
 
+def _lock_players(cursor, player_ids, create_missing=False):
+    """
+    Lock the given player rows for the rest of the transaction.
+
+    Rows are always locked in discord_id order so two transactions touching
+    overlapping players queue up instead of deadlocking. Returns
+    {discord_id: {"elo", "games_played", "wins", "win_rate"}} for locked rows.
+    """
+    ids = sorted({str(pid) for pid in player_ids})
+    if not ids:
+        return {}
+
+    if create_missing:
+        defaults = initialize_player_data(None)
+        cursor.execute('''
+            INSERT INTO players (discord_id, nickname, elo, games_played, win_rate, wins, uid, mirror_id, points, description, color)
+            SELECT pid, '', %s, 0, 0.0, 0, %s, %s, %s, %s, %s
+            FROM unnest(%s::text[]) AS pid
+            ON CONFLICT (discord_id) DO NOTHING
+        ''', (
+            defaults["elo"],
+            defaults["uid"],
+            defaults["mirror_id"],
+            defaults["points"],
+            defaults["description"],
+            defaults["color"],
+            ids
+        ))
+
+    cursor.execute('''
+        SELECT discord_id, elo, games_played, wins, win_rate
+        FROM players
+        WHERE discord_id = ANY(%s)
+        ORDER BY discord_id
+        FOR UPDATE
+    ''', (ids,))
+    return {
+        row['discord_id']: {
+            "elo": row['elo'],
+            "games_played": row['games_played'],
+            "wins": _row_wins(row),
+            "win_rate": row['win_rate'],
+        } for row in cursor.fetchall()
+    }
+
+
+def _apply_match_ratings(cursor, winning_team, losing_team, **elo_params):
+    """
+    Rate one match against freshly locked rows and write the result back as
+    relative updates. Returns the per-player ELO gains for the match record.
+    """
+    players = _lock_players(
+        cursor,
+        [p.id for p in winning_team + losing_team],
+        create_missing=True
+    )
+    before = {pid: dict(stats) for pid, stats in players.items()}
+
+    elo_gains = calculate_team_elo_change(
+        winning_team=winning_team,
+        losing_team=losing_team,
+        elo_data=players,
+        **elo_params
+    )
+
+    for player_id in sorted(elo_gains):
+        old, new = before[player_id], players[player_id]
+        cursor.execute('''
+            UPDATE players SET
+                elo = elo + %s,
+                games_played = games_played + 1,
+                wins = wins + %s,
+                win_rate = (wins + %s)::real / (games_played + 1)
+            WHERE discord_id = %s
+        ''', (
+            round(new["elo"] - old["elo"], 2),
+            new["wins"] - old["wins"],
+            new["wins"] - old["wins"],
+            player_id
+        ))
+
+    return elo_gains
+
+
+def commit_match(match_data, winning_team, losing_team, **elo_params):
+    """
+    Rate, record and count one match in a single transaction.
+
+    Only the participants' rows are locked, so unrelated matches commit in
+    parallel while matches sharing a player are applied one after another.
+    Fills match_data["elo_gains"] and returns (match_id, elo_gains).
+    """
+    return commit_series([(match_data, winning_team, losing_team)], **elo_params)[0]
+
+
+def commit_series(games, **elo_params):
+    """
+    Commit several matches in order in one transaction.
+
+    `games` is a list of (match_data, winning_team, losing_team); each game is
+    rated on top of the ratings the previous one produced. Returns a list of
+    (match_id, elo_gains) in the same order. Nothing is written if any game fails.
+    """
+    results = []
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            hold_rating_lock(cursor)
+            for match_data, winning_team, losing_team in games:
+                elo_gains = _apply_match_ratings(cursor, winning_team, losing_team, **elo_params)
+                match_data["elo_gains"] = elo_gains
+                _apply_character_stats(cursor, match_data, match_data["winner"])
+                match_id = _insert_match(cursor, match_data)
+                results.append((match_id, elo_gains))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        if results:
+            _checkpoint_if_due(conn, results[-1][0])
+        return results
+
+
+def _save_players_checkpoint(cursor):
+    """
+    Checkpoint the players table as the rating state after the latest match
+    (no commit). Call under the exclusive rating lock. Returns that match_id.
+    """
+    cursor.execute('''
+        INSERT INTO rating_checkpoints (match_id, player_ids, elo, games_played, wins)
+        SELECT (SELECT COALESCE(MAX(match_id), 0) FROM matches),
+               COALESCE(array_agg(discord_id ORDER BY discord_id), '{}'),
+               COALESCE(array_agg(elo::float8 ORDER BY discord_id), '{}'),
+               COALESCE(array_agg(games_played ORDER BY discord_id), '{}'),
+               COALESCE(array_agg(wins ORDER BY discord_id), '{}')
+        FROM players
+        ON CONFLICT (match_id) DO UPDATE SET
+            player_ids = EXCLUDED.player_ids,
+            elo = EXCLUDED.elo,
+            games_played = EXCLUDED.games_played,
+            wins = EXCLUDED.wins,
+            created_at = NOW()
+        RETURNING match_id
+    ''')
+    return cursor.fetchone()['match_id']
+
+
+def _checkpoint_if_due(conn, match_id):
+    """
+    Checkpoint the ratings once committed matches cross a
+    RATING_CHECKPOINT_INTERVAL boundary (or if no checkpoint exists).
+
+    Runs in its own transaction under the exclusive rating lock: commits only
+    hold it shared, so a match with a lower id may still be in flight until
+    then. A failure is logged; the matches themselves are already committed.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT MAX(match_id) AS latest FROM rating_checkpoints")
+        latest = cursor.fetchone()['latest']
+        if latest is not None and match_id // RATING_CHECKPOINT_INTERVAL <= latest // RATING_CHECKPOINT_INTERVAL:
+            conn.rollback()
+            return
+        hold_rating_lock(cursor, exclusive=True)
+        _save_players_checkpoint(cursor)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        print(f"[WARNING] Could not checkpoint ratings after match {match_id}: {e}")
+
+
 def rollback_match(match_id):
     with get_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("SELECT match_id, elo_gains, raw_data FROM matches WHERE match_id = %s", (match_id,))
-        match = cursor.fetchone()
-
-        if not match:
-            return False, "No matches to rollback"
-
-        match_id = match['match_id']
-        elo_gains = match['elo_gains']
-        match_data = match['raw_data'] if isinstance(match['raw_data'], dict) else json.loads(match['raw_data'])
-        winner = match_data.get("winner")
-        # --- Revert ELO Data ---
-        elo_data = load_elo_data()
-        changes_made = False
-
-        for player_id, gain in elo_gains.items():
-            if str(player_id) in elo_data:
-                changes_made = True
-                player_data = elo_data[str(player_id)]
-                player_data['elo'] -= gain
-                games = player_data['games_played'] - 1
-                player_data['games_played'] = max(0, games)
-
-                if games > 0:
-                    current = player_data['win_rate']
-                    if gain > 0:
-                        player_data['win_rate'] = ((current * (games + 1)) - 1) / games
-                    else:
-                        player_data['win_rate'] = (current * (games + 1)) / games
-                else:
-                    player_data['win_rate'] = 0.0
-
-        if not changes_made:
-            return False, "No ELO data was affected."
-
-        # --- Revert Character Table Stats ---
-        seen_codes = set()
-
-        for team_key in ["blue_picks", "red_picks"]:
-            picks = match_data.get(team_key, [])
-            team_won = (team_key == "blue_picks" and winner == "blue") or (team_key == "red_picks" and winner == "red")
-
-            for pick in picks:
-                code = pick.get("code")
-                eid = pick.get("eidolon")
-
-                if not code or eid is None:
-                    continue
+        hold_rating_lock(cursor)
+        success, message = _rollback_match(cursor, match_id)
+        if success:
+            conn.commit()
+        return success, message
 
-                if code not in seen_codes:
-                    seen_codes.add(code)
-                    cursor.execute(
-                        "UPDATE characters SET appearance_count = GREATEST(appearance_count - 1, 0) WHERE code = %s", (code,)
-                    )
 
-                cursor.execute("UPDATE characters SET pick_count = GREATEST(pick_count - 1, 0) WHERE code = %s", (code,))
+def _rollback_match(cursor, match_id):
+    """Subtract a match's stored gains and counters, then delete it (no commit)."""
+    cursor.execute("SELECT match_id, elo_gains, raw_data FROM matches WHERE match_id = %s FOR UPDATE", (match_id,))
+    match = cursor.fetchone()
+
+    if not match:
+        return False, "No matches to rollback"
+
+    match_id = match['match_id']
+    elo_gains = match['elo_gains']
+    match_data = match['raw_data'] if isinstance(match['raw_data'], dict) else json.loads(match['raw_data'])
+    # --- Revert ELO Data (row-locked, relative updates) ---
+    locked = _lock_players(cursor, elo_gains.keys())
+
+    if not locked:
+        return False, "No ELO data was affected."
+
+    for player_id in locked:
+        gain = elo_gains[player_id]
+        won = 1 if gain > 0 else 0
+        cursor.execute('''
+            UPDATE players SET
+                elo = elo - %s,
+                games_played = GREATEST(games_played - 1, 0),
+                wins = GREATEST(wins - %s, 0),
+                win_rate = CASE
+                    WHEN games_played > 1 THEN GREATEST(wins - %s, 0)::real / (games_played - 1)
+                    ELSE 0.0
+                END
+            WHERE discord_id = %s
+        ''', (gain, won, won, player_id))
+
+    _revert_character_stats(cursor, match_data)
+
+    # Finalize rollback; checkpoints taken at or after this match still carry
+    # its effects, so later undos and replays must not restore from them
+    cursor.execute("DELETE FROM matches WHERE match_id = %s", (match_id,))
+    cursor.execute("DELETE FROM rating_checkpoints WHERE match_id >= %s", (match_id,))
+    return True, "Match rollback successful"
+
+
+def _revert_character_stats(cursor, match_data):
+    winner = match_data.get("winner")
+    seen_codes = set()
+
+    for team_key in ["blue_picks", "red_picks"]:
+        picks = match_data.get(team_key, [])
+        team_won = (team_key == "blue_picks" and winner == "blue") or (team_key == "red_picks" and winner == "red")
+
+        for pick in picks:
+            code = pick.get("code")
+            eid = pick.get("eidolon")
+
+            if not code or eid is None:
+                continue
+
+            if code not in seen_codes:
+                seen_codes.add(code)
+                cursor.execute(
+                    "UPDATE characters SET appearance_count = GREATEST(appearance_count - 1, 0) WHERE code = %s", (code,)
+                )
+
+            cursor.execute("UPDATE characters SET pick_count = GREATEST(pick_count - 1, 0) WHERE code = %s", (code,))
 
+            cursor.execute(
+                sql.SQL("UPDATE characters SET {} = GREATEST({} - 1, 0) WHERE code = %s").format(
+                    sql.Identifier(f"e{eid}_uses"),
+                    sql.Identifier(f"e{eid}_uses")
+                ),
+                (code,)
+            )
+
+            if team_won:
                 cursor.execute(
                     sql.SQL("UPDATE characters SET {} = GREATEST({} - 1, 0) WHERE code = %s").format(
-                        sql.Identifier(f"e{eid}_uses"),
-                        sql.Identifier(f"e{eid}_uses")
+                        sql.Identifier(f"e{eid}_wins"),
+                        sql.Identifier(f"e{eid}_wins")
                     ),
                     (code,)
                 )
 
-                if team_won:
-                    cursor.execute(
-                        sql.SQL("UPDATE characters SET {} = GREATEST({} - 1, 0) WHERE code = %s").format(
-                            sql.Identifier(f"e{eid}_wins"),
-                            sql.Identifier(f"e{eid}_wins")
-                        ),
-                        (code,)
-                    )
-
-        for team_key in ["blue_bans", "red_bans"]:
-            bans = match_data.get(team_key, [])
-            for ban in bans:
-                code = ban.get("code")
-                if code:
-                    if code not in seen_codes:
-                        seen_codes.add(code)
-                        cursor.execute(
-                            "UPDATE characters SET appearance_count = GREATEST(appearance_count - 1, 0) WHERE code = %s", (code,)
-                        )
-                    cursor.execute("UPDATE characters SET ban_count = GREATEST(ban_count - 1, 0) WHERE code = %s", (code,))
-
-        for field, column in [("prebans", "preban_count"), ("jokers", "joker_count")]:
-            for code in match_data.get(field, []):
+    for team_key in ["blue_bans", "red_bans"]:
+        bans = match_data.get(team_key, [])
+        for ban in bans:
+            code = ban.get("code")
+            if code:
                 if code not in seen_codes:
                     seen_codes.add(code)
                     cursor.execute(
                         "UPDATE characters SET appearance_count = GREATEST(appearance_count - 1, 0) WHERE code = %s", (code,)
                     )
+                cursor.execute("UPDATE characters SET ban_count = GREATEST(ban_count - 1, 0) WHERE code = %s", (code,))
+
+    for field, column in [("prebans", "preban_count"), ("jokers", "joker_count")]:
+        for code in match_data.get(field, []):
+            if code not in seen_codes:
+                seen_codes.add(code)
                 cursor.execute(
-                    sql.SQL("UPDATE characters SET {} = GREATEST({} - 1, 0) WHERE code = %s").format(
-                        sql.Identifier(column),
-                        sql.Identifier(column)
-                    ),
-                    (code,)
+                    "UPDATE characters SET appearance_count = GREATEST(appearance_count - 1, 0) WHERE code = %s", (code,)
                 )
-
-        # Finalize rollback
-        save_elo_data(elo_data)
-        cursor.execute("DELETE FROM matches WHERE match_id = %s", (match_id,))
-        conn.commit()
-        return True, "Match rollback successful"
+            cursor.execute(
+                sql.SQL("UPDATE characters SET {} = GREATEST({} - 1, 0) WHERE code = %s").format(
+                    sql.Identifier(column),
+                    sql.Identifier(column)
+                ),
+                (code,)
+            )
 
 
 def calculate_team_elo_change(
@@ -271,7 +585,12 @@ def calculate_team_elo_change(
     base_gain: float = 25,
     base_loss: float = 20,
     variance_gain: float = 1.5,
-    variance_loss: float = 0.65
+    variance_loss: float = 0.65,
+    gain_taper: float = 30,
+    gain_taper_rate: float = 0.5,
+    loss_taper: float = 30,
+    loss_taper_rate: float = 0.2,
+    elo_floor: float = 100
 ) -> dict:
     # Initialize player data if missing and get current ELOs
     original_elos = {}
@@ -307,16 +626,15 @@ def calculate_team_elo_change(
         individual_gain = base_gain * variance_gain * ratio
         
         # Apply tapering
-        if individual_gain > 30:
-            excess = individual_gain - 30
-            individual_gain = 30 + (excess * 0.5)
+        if individual_gain > gain_taper:
+            excess = individual_gain - gain_taper
+            individual_gain = gain_taper + (excess * gain_taper_rate)
         
-        # Update stats (using your original win rate calculation)
-        player_data["elo"] = max(100, round(player_elo + individual_gain, 2))
+        # Update stats (win rate is derived from the integer win counter)
+        player_data["elo"] = max(elo_floor, round(player_elo + individual_gain, 2))
+        player_data["wins"] = _row_wins(player_data) + 1
         player_data["games_played"] += 1
-        wins = player_data["win_rate"] * (player_data["games_played"] - 1)
-        wins += 1  
-        player_data["win_rate"] = wins / player_data["games_played"]
+        player_data["win_rate"] = player_data["wins"] / player_data["games_played"]
         changes[player_id] = round(individual_gain, 2)
     
     # Process losers
@@ -330,101 +648,105 @@ def calculate_team_elo_change(
         individual_loss = base_loss * variance_loss * ratio
         
         # Apply tapering
-        if individual_loss > 30:
-            excess = individual_loss - 30
-            individual_loss = 30 + (excess * 0.2)
+        if individual_loss > loss_taper:
+            excess = individual_loss - loss_taper
+            individual_loss = loss_taper + (excess * loss_taper_rate)
         
-        # Update stats (using your original win rate calculation)
-        player_data["elo"] = max(100, round(player_elo - individual_loss, 2))
+        # Update stats (win rate is derived from the integer win counter)
+        player_data["elo"] = max(elo_floor, round(player_elo - individual_loss, 2))
+        player_data["wins"] = _row_wins(player_data)
         player_data["games_played"] += 1
-        wins = player_data["win_rate"] * (player_data["games_played"] - 1)
-        player_data["win_rate"] = wins / player_data["games_played"]
+        player_data["win_rate"] = player_data["wins"] / player_data["games_played"]
         changes[player_id] = round(-individual_loss, 2)
     
     return changes
 
 def update_character_table_stats(match_data, winning_team: str):
     with get_cursor(commit=True) as cursor:
-        all_codes = set()
+        _apply_character_stats(cursor, match_data, winning_team)
 
-        for team_key in ["blue_picks", "red_picks"]:
-            picks = match_data.get(team_key, [])
-            team_won = (team_key == "blue_picks" and winning_team == "blue") or (team_key == "red_picks" and winning_team == "red")
 
-            for pick in picks:
-                code = pick["code"]
-                eid = pick["eidolon"]
+def _apply_character_stats(cursor, match_data, winning_team: str):
+    all_codes = set()
 
-                all_codes.add(code)
+    for team_key in ["blue_picks", "red_picks"]:
+        picks = match_data.get(team_key, [])
+        team_won = (team_key == "blue_picks" and winning_team == "blue") or (team_key == "red_picks" and winning_team == "red")
 
-                # Fetch or create metadata
-                cursor.execute("SELECT name, subname, rarity, image_url FROM characters WHERE code = %s", (code,))
-                existing = cursor.fetchone()
-                if not existing:
-                    print(f"[WARNING] Character '{code}' not found. Skipping.")
-                    continue
+        for pick in picks:
+            code = pick["code"]
+            eid = pick["eidolon"]
 
-                name = existing["name"]
-                subname = existing.get("subname", "")
-                rarity = existing["rarity"]
-                image_url = existing["image_url"]
+            all_codes.add(code)
 
-                cursor.execute("""
-                    INSERT INTO characters (code, name, subname, rarity, image_url)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (code) DO NOTHING
-                """, (code, name, subname, rarity, image_url))
+            # Fetch or create metadata
+            cursor.execute("SELECT name, subname, rarity, image_url FROM characters WHERE code = %s", (code,))
+            existing = cursor.fetchone()
+            if not existing:
+                print(f"[WARNING] Character '{code}' not found. Skipping.")
+                continue
 
-                cursor.execute("UPDATE characters SET pick_count = pick_count + 1 WHERE code = %s", (code,))
+            name = existing["name"]
+            subname = existing.get("subname", "")
+            rarity = existing["rarity"]
+            image_url = existing["image_url"]
+
+            cursor.execute("""
+                INSERT INTO characters (code, name, subname, rarity, image_url)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (code) DO NOTHING
+            """, (code, name, subname, rarity, image_url))
+
+            cursor.execute("UPDATE characters SET pick_count = pick_count + 1 WHERE code = %s", (code,))
+            cursor.execute(
+                sql.SQL("UPDATE characters SET e{}_uses = e{}_uses + 1 WHERE code = %s").format(
+                    sql.Literal(eid), sql.Literal(eid)
+                ),
+                (code,)
+            )
+            if team_won:
                 cursor.execute(
-                    sql.SQL("UPDATE characters SET e{}_uses = e{}_uses + 1 WHERE code = %s").format(
+                    sql.SQL("UPDATE characters SET e{}_wins = e{}_wins + 1 WHERE code = %s").format(
                         sql.Literal(eid), sql.Literal(eid)
                     ),
                     (code,)
                 )
-                if team_won:
-                    cursor.execute(
-                        sql.SQL("UPDATE characters SET e{}_wins = e{}_wins + 1 WHERE code = %s").format(
-                            sql.Literal(eid), sql.Literal(eid)
-                        ),
-                        (code,)
-                    )
 
-        for team_key in ["blue_bans", "red_bans"]:
-            bans = match_data.get(team_key, [])
-            for ban in bans:
-                code = ban["code"]
-                all_codes.add(code)
-
-                cursor.execute("SELECT name, subname, rarity, image_url FROM characters WHERE code = %s", (code,))
-                existing = cursor.fetchone()
-                if not existing:
-                    print(f"[WARNING] Character '{code}' not found. Skipping.")
-                    continue
-
-                name = existing["name"]
-                subname = existing.get("subname", "")
-                rarity = existing["rarity"]
-                image_url = existing["image_url"]
-
-                cursor.execute("""
-                    INSERT INTO characters (code, name, subname, rarity, image_url)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (code) DO NOTHING
-                """, (code, name, subname, rarity, image_url))
-
-                cursor.execute("UPDATE characters SET ban_count = ban_count + 1 WHERE code = %s", (code,))
-            
-        for code in match_data.get("prebans", []):
+    for team_key in ["blue_bans", "red_bans"]:
+        bans = match_data.get(team_key, [])
+        for ban in bans:
+            code = ban["code"]
             all_codes.add(code)
-            cursor.execute("UPDATE characters SET preban_count = preban_count + 1 WHERE code = %s", (code,))
 
-        for code in match_data.get("jokers", []):
-            all_codes.add(code)
-            cursor.execute("UPDATE characters SET joker_count = joker_count + 1 WHERE code = %s", (code,))
+            cursor.execute("SELECT name, subname, rarity, image_url FROM characters WHERE code = %s", (code,))
+            existing = cursor.fetchone()
+            if not existing:
+                print(f"[WARNING] Character '{code}' not found. Skipping.")
+                continue
+
+            name = existing["name"]
+            subname = existing.get("subname", "")
+            rarity = existing["rarity"]
+            image_url = existing["image_url"]
+
+            cursor.execute("""
+                INSERT INTO characters (code, name, subname, rarity, image_url)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (code) DO NOTHING
+            """, (code, name, subname, rarity, image_url))
+
+            cursor.execute("UPDATE characters SET ban_count = ban_count + 1 WHERE code = %s", (code,))
+        
+    for code in match_data.get("prebans", []):
+        all_codes.add(code)
+        cursor.execute("UPDATE characters SET preban_count = preban_count + 1 WHERE code = %s", (code,))
+
+    for code in match_data.get("jokers", []):
+        all_codes.add(code)
+        cursor.execute("UPDATE characters SET joker_count = joker_count + 1 WHERE code = %s", (code,))
 
-        for code in all_codes:
-            cursor.execute("UPDATE characters SET appearance_count = appearance_count + 1 WHERE code = %s", (code,))
+    for code in all_codes:
+        cursor.execute("UPDATE characters SET appearance_count = appearance_count + 1 WHERE code = %s", (code,))
 
 
 def get_match_distribution():
@@ -0,0 +1,279 @@
+"""
+Bulk importer for archived match results.
+
+Reads a CSV of
+
+    submission_string,blue_1,blue_2,red_1,red_2,timestamp
+
+(Discord IDs; timestamp in ISO format), parses and validates each row as it
+streams in, rates the matches in file order on top of the current ratings,
+and loads everything with COPY into temp tables followed by set-based
+merges, all in one transaction.
+
+    python -m utils.importer archive.csv [--apply]
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import NamedTuple
+
+from utils.db_utils import (
+    get_connection,
+    hold_rating_lock,
+    calculate_team_elo_change,
+    initialize_player_data,
+    _player_from_row,
+)
+from utils.replay import LIVE_PARAMS, _as_stored
+from utils.submission import parse_submission_string
+
+EIDOLONS = range(7)
+COUNTER_COLUMNS = (
+    ["pick_count", "ban_count", "preban_count", "joker_count", "appearance_count"]
+    + [f"e{e}_uses" for e in EIDOLONS]
+    + [f"e{e}_wins" for e in EIDOLONS]
+)
+
+
+class ImportedPlayer(NamedTuple):
+    """Stand-in for discord.Member inside calculate_team_elo_change."""
+    id: int
+
+
+class RowError(Exception):
+    pass
+
+
+def submission_codes(parsed: dict) -> set:
+    codes = {p["code"] for key in ("blue_picks", "red_picks", "blue_bans", "red_bans") for p in parsed[key]}
+    return codes | set(parsed["prebans"]) | set(parsed["jokers"])
+
+
+def character_deltas(match_data: dict, counters: dict):
+    """Add one match's character counters to {code: Counter}, as _apply_character_stats would."""
+    winner = match_data["winner"]
+    appeared = set()
+
+    for side in ("blue", "red"):
+        for pick in match_data[f"{side}_picks"]:
+            code, eid = pick["code"], pick["eidolon"]
+            appeared.add(code)
+            counters[code]["pick_count"] += 1
+            counters[code][f"e{eid}_uses"] += 1
+            if side == winner:
+                counters[code][f"e{eid}_wins"] += 1
+        for ban in match_data[f"{side}_bans"]:
+            appeared.add(ban["code"])
+            counters[ban["code"]]["ban_count"] += 1
+
+    for field, column in (("prebans", "preban_count"), ("jokers", "joker_count")):
+        for code in match_data[field]:
+            appeared.add(code)
+            counters[code][column] += 1
+
+    for code in appeared:
+        counters[code]["appearance_count"] += 1
+
+
+def read_rows(stream):
+    """Yield (line number, fields) for every non-empty, non-comment CSV row."""
+    for line_no, fields in enumerate(csv.reader(stream), start=1):
+        if not fields or fields[0].startswith("#") or fields[0] == "submission_string":
+            continue
+        yield line_no, [f.strip() for f in fields]
+
+
+def build_match(fields, known_codes: set, nicknames: dict):
+    """Turn one CSV row into (timestamp, the raw_data record /submit-match would store)."""
+    if len(fields) != 6:
+        raise RowError(f"expected 6 columns, got {len(fields)}")
+    submission, *ids, stamp = fields
+
+    if not all(i.isdigit() for i in ids):
+        raise RowError("player IDs must be Discord IDs")
+    blue_ids, red_ids = ids[:2], ids[2:]
+    if set(blue_ids) & set(red_ids):
+        raise RowError("same player on both teams")
+
+    try:
+        when = datetime.fromisoformat(stamp)
+    except ValueError:
+        raise RowError(f"bad timestamp {stamp!r}")
+
+    try:
+        data = parse_submission_string(submission)
+    except (ValueError, IndexError) as e:
+        raise RowError(f"unparseable submission: {e}")
+
+    if data["winner"] == "tie":
+        raise RowError("cycles and points are tied; a tiebreak must be chosen by hand")
+    for pick in data["blue_picks"] + data["red_picks"]:
+        if pick["eidolon"] not in EIDOLONS:
+            raise RowError(f"bad eidolon for {pick['code']}")
+    unknown = submission_codes(data) - known_codes
+    if unknown:
+        raise RowError(f"unknown character codes {sorted(unknown)}")
+
+    def team(player_ids, cycles):
+        return [{"id": pid, "name": nicknames.get(pid) or pid, "cycles": c} for pid, c in zip(player_ids, cycles)]
+
+    return when.isoformat(), {
+        "date": when.strftime("%d/%m/%Y"),
+        "blue_team": team(blue_ids, data["blue_cycles"]),
+        "red_team": team(red_ids, data["red_cycles"]),
+        "blue_score": data["total_blue_cycles"],
+        "red_score": data["total_red_cycles"],
+        "blue_penalty": data["blue_penalty"],
+        "red_penalty": data["red_penalty"],
+        "winner": data["winner"],
+        "elo_gains": {},
+        "blue_picks": data["blue_picks"],
+        "red_picks": data["red_picks"],
+        "blue_bans": data["blue_bans"],
+        "red_bans": data["red_bans"],
+        "prebans": data["prebans"],
+        "jokers": data["jokers"],
+    }
+
+
+def _copy(cursor, table: str, columns, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def import_matches(stream, apply: bool = False, dsn: str = None) -> dict:
+    """Import every valid row of `stream`; returns a summary with per-line errors."""
+    started = time.perf_counter()
+    errors = []
+    match_rows = []
+    touched = set()
+    counters = defaultdict(Counter)
+    elo_params = LIVE_PARAMS._asdict()
+
+    with get_connection(dsn) as conn:
+        cursor = conn.cursor()
+        try:
+            # No live submission may interleave with ratings computed here
+            hold_rating_lock(cursor, exclusive=True)
+
+            cursor.execute("SELECT code FROM characters")
+            known_codes = {row["code"] for row in cursor.fetchall()}
+            cursor.execute("SELECT * FROM players")
+            players = {row["discord_id"]: _player_from_row(row) for row in cursor.fetchall()}
+            nicknames = {pid: p.get("nickname") for pid, p in players.items()}
+            existing = set(players)
+
+            for line_no, fields in read_rows(stream):
+                try:
+                    stamp, match = build_match(fields, known_codes, nicknames)
+                except RowError as e:
+                    errors.append((line_no, str(e)))
+                    continue
+
+                blue = [ImportedPlayer(int(p["id"])) for p in match["blue_team"]]
+                red = [ImportedPlayer(int(p["id"])) for p in match["red_team"]]
+                winners, losers = (blue, red) if match["winner"] == "blue" else (red, blue)
+                match["elo_gains"] = calculate_team_elo_change(winners, losers, players, **elo_params)
+                # players.elo is INTEGER: live commits and replays round after
+                # every match, so the next match must be rated on whole points
+                for pid in match["elo_gains"]:
+                    players[pid]["elo"] = float(_as_stored(players[pid]["elo"]))
+                touched.update(match["elo_gains"])
+
+                character_deltas(match, counters)
+                match_rows.append((len(match_rows), stamp, json.dumps(match["elo_gains"]), json.dumps(match)))
+
+            if apply and match_rows:
+                cursor.execute('''
+                    CREATE TEMP TABLE import_matches (seq INTEGER, timestamp TEXT, elo_gains JSONB, raw_data JSONB) ON COMMIT DROP;
+                    CREATE TEMP TABLE import_players (discord_id TEXT, elo DOUBLE PRECISION, games_played INTEGER, wins INTEGER) ON COMMIT DROP;
+                ''')
+                cursor.execute(
+                    f"CREATE TEMP TABLE import_characters (code TEXT, {', '.join(f'{c} INTEGER' for c in COUNTER_COLUMNS)}) ON COMMIT DROP"
+                )
+
+                _copy(cursor, "import_matches", ("seq", "timestamp", "elo_gains", "raw_data"), match_rows)
+                _copy(cursor, "import_players", ("discord_id", "elo", "games_played", "wins"), (
+                    (pid, players[pid]["elo"], players[pid]["games_played"], players[pid]["wins"])
+                    for pid in sorted(touched)
+                ))
+                _copy(cursor, "import_characters", ("code", *COUNTER_COLUMNS), (
+                    (code, *(counts[c] for c in COUNTER_COLUMNS)) for code, counts in counters.items()
+                ))
+
+                # Matches keep file order so replay sees them in the order rated
+                cursor.execute('''
+                    INSERT INTO matches (timestamp, elo_gains, raw_data, has_character_data)
+                    SELECT timestamp, elo_gains, raw_data, TRUE FROM import_matches ORDER BY seq
+                ''')
+
+                default = initialize_player_data(None)
+                cursor.execute('''
+                    INSERT INTO players (discord_id, nickname, elo, games_played, win_rate, wins, uid, mirror_id, points, description, color)
+                    SELECT discord_id, '', elo, games_played,
+                           CASE WHEN games_played > 0 THEN wins::real / games_played ELSE 0.0 END,
+                           wins, %s, %s, %s, %s, %s
+                    FROM import_players
+                    ON CONFLICT (discord_id) DO UPDATE SET
+                        elo = EXCLUDED.elo,
+                        games_played = EXCLUDED.games_played,
+                        wins = EXCLUDED.wins,
+                        win_rate = EXCLUDED.win_rate
+                ''', (default["uid"], default["mirror_id"], default["points"], default["description"], default["color"]))
+
+                assignments = ", ".join(f"{c} = ch.{c} + d.{c}" for c in COUNTER_COLUMNS)
+                cursor.execute(f'''
+                    UPDATE characters AS ch SET {assignments}
+                    FROM import_characters AS d
+                    WHERE ch.code = d.code
+                ''')
+                conn.commit()
+            else:
+                conn.rollback()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return {
+        "imported": len(match_rows),
+        "new_players": len(touched - existing),
+        "players": len(touched),
+        "characters": len(counters),
+        "errors": errors,
+        "applied": apply,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.importer", description="Bulk-import archived match results.")
+    parser.add_argument("file", help="CSV of submission_string,blue_1,blue_2,red_1,red_2,timestamp ('-' for stdin)")
+    parser.add_argument("--apply", action="store_true", help="write the matches (default: validate and rate only)")
+    parser.add_argument("--dsn", default=None, help="database to write (default: DATABASE_URL)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
+
+    stream = sys.stdin if args.file == "-" else open(args.file, newline="", encoding="utf-8")
+    with stream:
+        summary = import_matches(stream, apply=args.apply, dsn=args.dsn)
+
+    for line_no, message in summary["errors"]:
+        print(f"line {line_no}: {message}", file=sys.stderr)
+    print(
+        f"{summary['imported']} matches, {summary['players']} players ({summary['new_players']} new), "
+        f"{summary['characters']} characters, {len(summary['errors'])} rejected rows "
+        f"in {summary['seconds']:.2f}s — {'applied' if summary['applied'] else 'dry run'}"
+    )
+    raise SystemExit(1 if summary["errors"] and not summary["imported"] else 0)
+
+
+if __name__ == "__main__":
+    main()
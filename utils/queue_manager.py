@@ -0,0 +1,112 @@
+"""
+Several named matchmaking queues side by side (by mode or by ELO bracket).
+
+Each NamedQueue has its own WaitingQueue and asyncio.Lock, so a slow match
+announcement in one queue never holds up joins in another. A player may
+wait in several queues at once; QueueManager keeps a uid -> queue names
+index, and claim() takes a formed match's players out of every queue they
+were in. claim() never awaits, so it is atomic on the event loop: once one
+queue has taken a player, no other queue can match them too, and no second
+lock has to be taken (so no lock ordering to get wrong).
+"""
+import asyncio
+from typing import Dict, Iterator, List, NamedTuple, Optional, Set
+
+from utils.waiting_queue import QueueEntry, WaitingQueue
+
+
+class QueueSpec(NamedTuple):
+    name: str                        # stable key (stored in queue_entries.queue_name)
+    label: str                       # shown to players
+    team_size: int = 2               # 2 -> 2v2, 1 -> 1v1
+    min_elo: Optional[float] = None  # bracket bounds, inclusive
+    max_elo: Optional[float] = None
+
+    @property
+    def match_size(self) -> int:
+        return 2 * self.team_size
+
+    def accepts(self, elo: float) -> bool:
+        return (self.min_elo is None or elo >= self.min_elo) and (self.max_elo is None or elo <= self.max_elo)
+
+
+class NamedQueue:
+    def __init__(self, spec: QueueSpec):
+        self.spec = spec
+        self.waiting = WaitingQueue()
+        self.lock = asyncio.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.spec.name
+
+    def __len__(self) -> int:
+        return len(self.waiting)
+
+
+class QueueManager:
+    def __init__(self, specs: List[QueueSpec]):
+        self.queues: Dict[str, NamedQueue] = {spec.name: NamedQueue(spec) for spec in specs}
+        self._joined: Dict[int, Set[str]] = {}  # uid -> names of the queues they wait in
+
+    def __getitem__(self, name: str) -> NamedQueue:
+        return self.queues[name]
+
+    def __iter__(self) -> Iterator[NamedQueue]:
+        return iter(self.queues.values())
+
+    def __contains__(self, uid: int) -> bool:
+        """Waiting in any queue."""
+        return uid in self._joined
+
+    # ───────────── mutation (never awaits) ─────────────
+
+    def join(self, name: str, uid: int, joined_at: Optional[float] = None, channel_id: Optional[int] = None) -> Optional[QueueEntry]:
+        entry = self.queues[name].waiting.join(uid, joined_at, channel_id)
+        if entry is not None:
+            self._joined.setdefault(uid, set()).add(name)
+        return entry
+
+    def leave(self, name: str, uid: int) -> Optional[QueueEntry]:
+        entry = self.queues[name].waiting.leave(uid)
+        if entry is not None:
+            self._forget(name, uid)
+        return entry
+
+    def leave_all(self, uid: int) -> Dict[str, QueueEntry]:
+        """Remove a player from every queue; {queue name: their entry there}."""
+        removed = {}
+        for name in list(self._joined.get(uid, ())):
+            entry = self.leave(name, uid)
+            if entry is not None:
+                removed[name] = entry
+        return removed
+
+    def claim(self, uids: List[int]) -> Dict[str, List[QueueEntry]]:
+        """Take a formed match's players out of every queue at once; {queue name: entries removed}."""
+        claimed: Dict[str, List[QueueEntry]] = {}
+        for uid in uids:
+            for name, entry in self.leave_all(uid).items():
+                claimed.setdefault(name, []).append(entry)
+        return claimed
+
+    def requeue(self, name: str, entries: List[QueueEntry]):
+        """Put players back at the front of a queue with their original join times."""
+        self.queues[name].waiting.push_front(entries)
+        for entry in entries:
+            self._joined.setdefault(entry.uid, set()).add(name)
+
+    def clear(self, name: str) -> List[int]:
+        q = self.queues[name]
+        uids = list(q.waiting)
+        q.waiting.clear()
+        for uid in uids:
+            self._forget(name, uid)
+        return uids
+
+    def _forget(self, name: str, uid: int):
+        names = self._joined.get(uid)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del self._joined[uid]
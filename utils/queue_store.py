@@ -0,0 +1,99 @@
+"""
+Write-through persistence for the matchmaking queues (table queue_entries,
+one row per player per named queue).
+
+Writes are applied in order by one background task so queue commands never
+wait on the database; a failed write is logged and the in-memory queue
+stays authoritative. On startup load() returns what was queued before the
+restart, oldest first.
+"""
+import asyncio
+import logging
+from collections import deque
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+import asyncpg
+
+from utils.waiting_queue import QueueEntry
+
+
+def _ts(seconds: float) -> datetime:
+    return datetime.fromtimestamp(seconds, timezone.utc)
+
+
+class QueueStore:
+    def __init__(self, pool: Optional[asyncpg.Pool]):
+        self.pool = pool
+        self._pending: "deque[tuple]" = deque()
+        self._writer: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.pool is not None
+
+    # ───────────── writes (queued, applied in order) ─────────────
+
+    def add(self, guild_id: int, queue_name: str, entries: Iterable[QueueEntry]):
+        rows = [(str(e.uid), queue_name, guild_id, e.channel_id, _ts(e.joined_at)) for e in entries]
+        if rows:
+            self._submit(
+                """
+                INSERT INTO queue_entries (discord_id, queue_name, guild_id, channel_id, joined_at)
+                VALUES ($1, $2, $3, $4, $5)
+                ON CONFLICT (discord_id, queue_name) DO UPDATE
+                SET guild_id = EXCLUDED.guild_id, channel_id = EXCLUDED.channel_id, joined_at = EXCLUDED.joined_at
+                """,
+                rows,
+            )
+
+    def remove(self, uids: Iterable[int], queue_name: Optional[str] = None):
+        """Drop players from one queue, or from every queue when queue_name is None."""
+        ids = [str(uid) for uid in uids]
+        if not ids:
+            return
+        if queue_name is None:
+            self._submit("DELETE FROM queue_entries WHERE discord_id = ANY($1::text[])", [(ids,)])
+        else:
+            self._submit("DELETE FROM queue_entries WHERE discord_id = ANY($1::text[]) AND queue_name = $2", [(ids, queue_name)])
+
+    def _submit(self, query: str, rows: List[tuple]):
+        if not self.enabled:
+            return
+        self._pending.append((query, rows))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def _write_loop(self):
+        while self._pending:
+            query, rows = self._pending.popleft()
+            try:
+                async with self.pool.acquire() as conn:
+                    await conn.executemany(query, rows)
+            except Exception as e:
+                logging.error(f"[QueueStore] Write failed: {e}")
+
+    async def flush(self):
+        """Wait until every queued write has been applied."""
+        if self._writer is not None:
+            await asyncio.shield(self._writer)
+
+    # ───────────── startup ─────────────
+
+    async def load(self, guild_id: int) -> List[Tuple[str, QueueEntry]]:
+        """(queue name, entry) pairs, oldest first."""
+        if not self.enabled:
+            return []
+        try:
+            async with self.pool.acquire() as conn:
+                rows = await conn.fetch(
+                    "SELECT discord_id, queue_name, channel_id, joined_at FROM queue_entries WHERE guild_id = $1 ORDER BY joined_at",
+                    guild_id,
+                )
+        except Exception as e:
+            logging.error(f"[QueueStore] Could not load queue: {e}")
+            return []
+        return [
+            (r["queue_name"], QueueEntry(int(r["discord_id"]), r["joined_at"].timestamp(), r["channel_id"]))
+            for r in rows
+        ]
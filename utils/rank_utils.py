@@ -31,11 +31,35 @@ async def update_rank_role(
     elo_data: dict,
     channel: discord.TextChannel = None,
     announce_demotions: bool = False,
-    force_old_rank: str = None
+    force_old_rank: str = None,
+    announcements: list = None,
+    rate_limit=None
 ):
+    """
+    Move a member onto the role for their ELO and announce the change.
+
+    If `announcements` is given, messages are appended to it instead of being
+    sent, so the caller can post them together. If `rate_limit` is given, its
+    `acquire()` is awaited before every role edit.
+    """
     guild = member.guild
     player_id = str(member.id)
 
+    async def announce(text):
+        if announcements is not None:
+            if text not in announcements:
+                announcements.append(text)
+        elif channel is not None:
+            await channel.send(text)
+
+    async def edit_roles(target, remove=(), add=()):
+        if rate_limit is not None:
+            await rate_limit.acquire()
+        if remove:
+            await target.remove_roles(*remove)
+        if add:
+            await target.add_roles(*add)
+
     old_rank = force_old_rank if force_old_rank else get_rank(
         elo_data.get(player_id, {}).get("elo", 200),
         player_id=player_id,
@@ -82,8 +106,7 @@ async def update_rank_role(
 
     roles_to_remove = [role for role in member.roles if role.name in rank_order]
     try:
-        await member.remove_roles(*roles_to_remove)
-        await member.add_roles(rank_role)
+        await edit_roles(member, remove=roles_to_remove, add=[rank_role])
     except discord.Forbidden:
         print(f"❌ Missing permission to update {member.display_name}'s roles")
         return
@@ -108,11 +131,13 @@ async def update_rank_role(
                     )
                     fallback_role = get(guild.roles, name=fallback_rank)
                     try:
-                        await user.remove_roles(CipherChampion_role)
-                        if fallback_role:
-                            await user.add_roles(fallback_role)
+                        await edit_roles(
+                            user,
+                            remove=[CipherChampion_role],
+                            add=[fallback_role] if fallback_role else []
+                        )
                         if channel and announce_demotions:
-                            await channel.send(
+                            await announce(
                                 f"{user.mention} has stepped down from **Cipher Champion**.\n"
                                 f"Even the fates must bow to the ever-changing threads…"
                             )
@@ -128,7 +153,7 @@ async def update_rank_role(
         top_CipherChampion_ids = [pid for pid, _ in top_CipherChampions]
 
         if str(member.id) in top_CipherChampion_ids and not was_CipherChampion and channel:
-            await channel.send(
+            await announce(
                 f"{member.mention} has ascended as the **Cipher Champion**, Weaver of Fates!\n"
                 f"The loom bows to their threads — all destinies now orbit their will."
             )
@@ -137,12 +162,12 @@ async def update_rank_role(
     if channel:
         try:
             if new_rank == "Cipher Champion" and old_rank != "Cipher Champion":
-                await channel.send(
+                await announce(
                     f"{member.mention} has ascended as the **Cipher Champion**, Weaver of Fates!\n"
                     f"The loom bows to their threads — all destinies now orbit their will."
                 )
             elif new_index > old_index:
-                await channel.send(
+                await announce(
                     f"{member.mention} has awakened as an **{new_rank}**!\n"
                     f"The threads of fate weave ever forward..."
                 )
@@ -151,12 +176,12 @@ async def update_rank_role(
                 (was_CipherChampion and new_rank != "Cipher Champion")
             ):
                 if old_rank == "Cipher Champion" and new_rank != "Cipher Champion":
-                    await channel.send(
+                    await announce(
                         f"{member.mention} has stepped down from **Cipher Champion**.\n"
                         f"Even the fates must bow to the ever-changing threads…"
                     )
                 else:
-                    await channel.send(
+                    await announce(
                         f"{member.mention} has returned to the path of **{new_rank}**.\n"
                         f"The threads shift softly... but they never break."
                     )
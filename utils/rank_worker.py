@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+import discord
+from utils.db_utils import load_rank_context
+from utils.rank_utils import update_rank_role, get_rank
+
+ROLE_EDITS_PER_SECOND = 1.0
+ROLE_EDIT_BURST = 5
+
+
+class RateBudget:
+    """Token bucket shared by every role edit the worker makes."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class RankRoleWorker:
+    """
+    Re-evaluates rank roles in the background.
+
+    Writers call enqueue() right after their commit and return. Entries for
+    the same player are coalesced until the worker picks them up, each batch
+    is ranked against one DB read, and the announcements a batch produces are
+    posted as a single message per channel.
+    """
+
+    def __init__(self, rate: float = ROLE_EDITS_PER_SECOND, burst: int = ROLE_EDIT_BURST):
+        # (guild_id, player_id) -> {"guild", "channel", "change"}
+        self.pending = {}
+        self.wakeup = asyncio.Event()
+        self.budget = RateBudget(rate, burst)
+        self.task = None
+
+    def enqueue(self, guild: discord.Guild, elo_changes: dict, channel: discord.abc.Messageable = None):
+        """Queue a re-evaluation for every player in {player_id: elo change}."""
+        for player_id, change in elo_changes.items():
+            key = (guild.id, str(player_id))
+            entry = self.pending.get(key)
+            if entry is None:
+                self.pending[key] = {"guild": guild, "channel": channel, "change": change}
+            else:
+                # Keep the oldest baseline: the rank before the first queued change
+                entry["change"] += change
+                entry["channel"] = channel or entry["channel"]
+
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+        self.wakeup.set()
+
+    async def _run(self):
+        while True:
+            await self.wakeup.wait()
+            self.wakeup.clear()
+
+            batch, self.pending = self.pending, {}
+            if not batch:
+                continue
+
+            try:
+                await self._process(batch)
+            except Exception as e:
+                logging.error(f"[RankRoleWorker] Batch failed: {e}")
+
+    async def _process(self, batch: dict):
+        elo_data = await asyncio.to_thread(load_rank_context, [pid for _, pid in batch])
+        announcements = {}  # channel id -> (channel, [messages])
+
+        for (_, player_id), entry in batch.items():
+            member = entry["guild"].get_member(int(player_id))
+            if member is None or player_id not in elo_data:
+                continue
+
+            new_elo = elo_data[player_id]["elo"]
+            old_rank = get_rank(new_elo - entry["change"], player_id=player_id, elo_data=elo_data)
+
+            channel = entry["channel"]
+            messages = None
+            if channel is not None:
+                messages = announcements.setdefault(channel.id, (channel, []))[1]
+
+            try:
+                await update_rank_role(
+                    member,
+                    new_elo,
+                    elo_data,
+                    channel=channel,
+                    announce_demotions=True,
+                    force_old_rank=old_rank,
+                    announcements=messages,
+                    rate_limit=self.budget
+                )
+            except Exception as e:
+                logging.error(f"[RankRoleWorker] Failed to update {member.display_name}: {e}")
+
+        for channel, messages in announcements.values():
+            for chunk in _chunk_messages(messages):
+                try:
+                    await channel.send(chunk)
+                except Exception as e:
+                    logging.error(f"[RankRoleWorker] Failed to send rank announcement: {e}")
+
+
+def _chunk_messages(messages, limit=2000):
+    chunk = ""
+    for text in messages:
+        candidate = f"{chunk}\n\n{text}" if chunk else text
+        if len(candidate) > limit and chunk:
+            yield chunk
+            chunk = text
+        else:
+            chunk = candidate
+    if chunk:
+        yield chunk
+
+
+rank_role_worker = RankRoleWorker()
@@ -0,0 +1,550 @@
+"""
+Match history replay engine.
+
+Re-applies the live rating formula (calculate_team_elo_change) over the
+ordered match history with NumPy rating vectors. Rating state is
+checkpointed every CHECKPOINT_INTERVAL matches into rating_checkpoints, so
+undoing match N only replays the matches after the nearest checkpoint
+before N instead of the whole history. Manual rating changes (/reset,
+/change-rating) rebase the checkpoints on the players table, and a reset
+records a season boundary that replays never cross.
+
+    python -m utils.replay rebuild [--since MATCH_ID] [--apply]
+    python -m utils.replay rollback MATCH_ID
+"""
+import argparse
+import json
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from utils.db_utils import (
+    RATING_CHECKPOINT_INTERVAL as CHECKPOINT_INTERVAL,
+    get_connection,
+    hold_rating_lock,
+    initialize_player_data,
+    _lock_players,
+    _rollback_match,
+    _revert_character_stats,
+    _save_players_checkpoint,
+)
+
+START_ELO = initialize_player_data(None)["elo"]
+
+
+class EloParams(NamedTuple):
+    """Keyword arguments of calculate_team_elo_change, live values as defaults."""
+    base_gain: float = 25
+    base_loss: float = 20
+    variance_gain: float = 1.5
+    variance_loss: float = 0.65
+    gain_taper: float = 30
+    gain_taper_rate: float = 0.5
+    loss_taper: float = 30
+    loss_taper_rate: float = 0.2
+    elo_floor: float = 100
+
+
+LIVE_PARAMS = EloParams()
+
+
+def _as_stored(elo: np.ndarray) -> np.ndarray:
+    """
+    Round to whole points like the live UPDATE does: players.elo is INTEGER,
+    so Postgres rounds every match's result (halves away from zero, and
+    ratings are always positive).
+    """
+    return np.floor(elo + 0.5)
+
+
+class RatingState:
+    """
+    Ratings of every player seen so far, one column per player.
+
+    `elo` has one row per parameter set being replayed (a single row for a
+    normal replay); games and wins do not depend on the formula.
+    """
+
+    def __init__(self, player_ids=(), elo=None, games=None, wins=None, n_params=1):
+        self.player_ids: List[str] = list(player_ids)
+        self.index: Dict[str, int] = {pid: i for i, pid in enumerate(self.player_ids)}
+        n = len(self.player_ids)
+        base = np.full(n, START_ELO, dtype=np.float64) if elo is None else np.asarray(elo, dtype=np.float64)
+        self.elo = np.tile(base, (n_params, 1))
+        self.games = np.zeros(n, dtype=np.int64) if games is None else np.asarray(games, dtype=np.int64)
+        self.wins = np.zeros(n, dtype=np.int64) if wins is None else np.asarray(wins, dtype=np.int64)
+
+    def indices(self, player_ids):
+        """Column indices for the given ids, adding unseen players at START_ELO."""
+        new = [pid for pid in dict.fromkeys(player_ids) if pid not in self.index]
+        if new:
+            for pid in new:
+                self.index[pid] = len(self.player_ids)
+                self.player_ids.append(pid)
+            k = len(new)
+            self.elo = np.hstack([self.elo, np.full((self.elo.shape[0], k), START_ELO, dtype=np.float64)])
+            self.games = np.concatenate([self.games, np.zeros(k, dtype=np.int64)])
+            self.wins = np.concatenate([self.wins, np.zeros(k, dtype=np.int64)])
+        return [self.index[pid] for pid in player_ids]
+
+
+class EncodedHistory(NamedTuple):
+    match_ids: np.ndarray  # (M,)
+    winners: np.ndarray    # (M, 2) column indices, solo sides repeat their player
+    losers: np.ndarray     # (M, 2)
+    skipped: int
+
+
+def _side_ids(side) -> Optional[List[str]]:
+    ids = [str(p["id"]) for p in side or [] if isinstance(p, dict) and p.get("id")]
+    if len(ids) == 1:
+        ids = ids * 2
+    return ids if len(ids) == 2 else None
+
+
+def load_history(cursor, state: RatingState, after_match_id: int = 0, exclude_match_id: int = None) -> EncodedHistory:
+    """Read matches after `after_match_id` in order and encode them against `state`."""
+    cursor.execute('''
+        SELECT match_id,
+               raw_data->'blue_team' AS blue_team,
+               raw_data->'red_team' AS red_team,
+               raw_data->>'winner' AS winner
+        FROM matches
+        WHERE match_id > %s AND match_id IS DISTINCT FROM %s
+        ORDER BY match_id
+    ''', (after_match_id, exclude_match_id))
+
+    match_ids, winners, losers = [], [], []
+    skipped = 0
+    for row in cursor.fetchall():
+        blue = _side_ids(row['blue_team'])
+        red = _side_ids(row['red_team'])
+        if blue is None or red is None or row['winner'] not in ("blue", "red"):
+            skipped += 1
+            continue
+        win, lose = (blue, red) if row['winner'] == "blue" else (red, blue)
+        match_ids.append(row['match_id'])
+        winners.append(state.indices(win))
+        losers.append(state.indices(lose))
+
+    if skipped:
+        logging.warning(f"[replay] Skipped {skipped} matches without two sides and a winner")
+
+    return EncodedHistory(
+        np.asarray(match_ids, dtype=np.int64),
+        np.asarray(winners, dtype=np.int64).reshape(-1, 2),
+        np.asarray(losers, dtype=np.int64).reshape(-1, 2),
+        skipped,
+    )
+
+
+def _param_columns(params):
+    """Stack one or many EloParams into (K, 1) columns per field."""
+    if isinstance(params, EloParams):
+        params = [params]
+    table = np.asarray(params, dtype=np.float64).reshape(-1, len(EloParams._fields))
+    return EloParams(*(table[:, i:i + 1] for i in range(table.shape[1])))
+
+
+def replay(state: RatingState, history: EncodedHistory, params=LIVE_PARAMS,
+           start: int = 0, stop: int = None, gains: np.ndarray = None,
+           checkpoint_every: int = None, on_checkpoint=None, on_match=None):
+    """
+    Apply history[start:stop] to `state` in place.
+
+    Mirrors calculate_team_elo_change for every parameter set at once: team
+    averages include a solo player twice, each distinct player is updated
+    once, and ratings are rounded to 2 decimals, floored, then rounded to
+    whole points as players.elo stores them after every match. If `gains` is
+    given, row m receives the stored gains of the first parameter set as
+    [winner 1, winner 2, loser 1, loser 2]. `on_checkpoint(m)` runs after
+    every `checkpoint_every` matches; `on_match(m, winner_avg, loser_avg)`
+    sees the pre-match team averages.
+    """
+    p = _param_columns(params)
+    stop = len(history.match_ids) if stop is None else stop
+    elo, games, wins = state.elo, state.games, state.wins
+    gain_scale = p.base_gain * p.variance_gain
+    loss_scale = p.base_loss * p.variance_loss
+
+    for m in range(start, stop):
+        w = history.winners[m]
+        l = history.losers[m]
+        rw = elo[:, w]
+        rl = elo[:, l]
+        w_avg = rw.mean(axis=1, keepdims=True)
+        l_avg = rl.mean(axis=1, keepdims=True)
+
+        if on_match is not None:
+            on_match(m, w_avg, l_avg)
+
+        gain = gain_scale * (l_avg / rw)
+        gain = np.where(gain > p.gain_taper, p.gain_taper + (gain - p.gain_taper) * p.gain_taper_rate, gain)
+        loss = loss_scale * (rl / w_avg)
+        loss = np.where(loss > p.loss_taper, p.loss_taper + (loss - p.loss_taper) * p.loss_taper_rate, loss)
+
+        # Duplicate columns (solo sides) receive identical values, so they
+        # are written and counted once, just like unique_players().
+        elo[:, w] = _as_stored(np.maximum(p.elo_floor, np.round(rw + gain, 2)))
+        elo[:, l] = _as_stored(np.maximum(p.elo_floor, np.round(rl - loss, 2)))
+        games[w] += 1
+        games[l] += 1
+        wins[w] += 1
+
+        if gains is not None:
+            gains[m, :2] = np.round(gain[0], 2)
+            gains[m, 2:] = np.round(-loss[0], 2)
+
+        if checkpoint_every and on_checkpoint is not None and (m + 1 - start) % checkpoint_every == 0:
+            on_checkpoint(m)
+
+
+# ───────────────────────────── checkpoints ─────────────────────────────
+
+def _load_checkpoint(cursor, before_match_id: int):
+    cursor.execute('''
+        SELECT match_id, player_ids, elo, games_played, wins
+        FROM rating_checkpoints
+        WHERE match_id < %s
+        ORDER BY match_id DESC
+        LIMIT 1
+    ''', (before_match_id,))
+    return cursor.fetchone()
+
+
+def _save_checkpoint(cursor, match_id: int, state: RatingState):
+    cursor.execute('''
+        INSERT INTO rating_checkpoints (match_id, player_ids, elo, games_played, wins)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (match_id) DO UPDATE SET
+            player_ids = EXCLUDED.player_ids,
+            elo = EXCLUDED.elo,
+            games_played = EXCLUDED.games_played,
+            wins = EXCLUDED.wins,
+            created_at = NOW()
+    ''', (
+        int(match_id),
+        list(state.player_ids),
+        state.elo[0].tolist(),
+        state.games.tolist(),
+        state.wins.tolist(),
+    ))
+
+
+def _replay_with_checkpoints(cursor, state, history, params):
+    """Replay everything in `history`, writing checkpoints as it goes. Returns gains."""
+    gains = np.zeros((len(history.match_ids), 4), dtype=np.float64)
+
+    def checkpoint(m):
+        _save_checkpoint(cursor, history.match_ids[m], state)
+
+    replay(
+        state, history, params,
+        gains=gains,
+        checkpoint_every=CHECKPOINT_INTERVAL,
+        on_checkpoint=checkpoint,
+    )
+    return gains
+
+
+def rebase_checkpoints(cursor) -> int:
+    """
+    Replace every checkpoint with one of the players table as it is now.
+
+    Call after changing ratings by hand, under the exclusive rating lock:
+    later replays then start from the changed ratings instead of silently
+    restoring older ones. Returns the match_id the checkpoint sits at.
+    """
+    cursor.execute("DELETE FROM rating_checkpoints")
+    return _save_players_checkpoint(cursor)
+
+
+def season_start(cursor) -> int:
+    """Last match before the current season (0 if ratings were never reset)."""
+    cursor.execute("SELECT COALESCE(MAX(starts_after_match_id), 0) AS start FROM rating_seasons")
+    return cursor.fetchone()['start']
+
+
+# ───────────────────────────── write-back ─────────────────────────────
+
+def _write_players(cursor, state: RatingState, columns):
+    columns = sorted(set(int(c) for c in columns))
+    if not columns:
+        return
+    ids = [state.player_ids[c] for c in columns]
+    _lock_players(cursor, ids, create_missing=True)
+    cursor.execute('''
+        UPDATE players AS p SET
+            elo = v.elo,
+            games_played = v.games,
+            wins = v.wins,
+            win_rate = CASE WHEN v.games > 0 THEN v.wins::real / v.games ELSE 0.0 END
+        FROM unnest(%s::text[], %s::float8[], %s::int[], %s::int[]) AS v(discord_id, elo, games, wins)
+        WHERE p.discord_id = v.discord_id
+    ''', (
+        ids,
+        state.elo[0, columns].tolist(),
+        state.games[columns].tolist(),
+        state.wins[columns].tolist(),
+    ))
+
+
+def _write_gains(cursor, state: RatingState, history: EncodedHistory, gains: np.ndarray):
+    if not len(history.match_ids):
+        return
+    payloads = []
+    for m in range(len(history.match_ids)):
+        cols = list(history.winners[m]) + list(history.losers[m])
+        payloads.append(json.dumps({state.player_ids[c]: float(g) for c, g in zip(cols, gains[m])}))
+    cursor.execute('''
+        UPDATE matches AS m SET
+            elo_gains = v.gains::jsonb,
+            raw_data = jsonb_set(m.raw_data, '{elo_gains}', v.gains::jsonb)
+        FROM unnest(%s::int[], %s::text[]) AS v(match_id, gains)
+        WHERE m.match_id = v.match_id
+    ''', (history.match_ids.tolist(), payloads))
+
+
+def _current_elos(cursor, player_ids):
+    cursor.execute("SELECT discord_id, elo FROM players WHERE discord_id = ANY(%s)", (list(player_ids),))
+    return {row['discord_id']: row['elo'] for row in cursor.fetchall()}
+
+
+# ───────────────────────────── entry points ─────────────────────────────
+
+def rebuild_ratings(since_match_id: int = None, params: EloParams = LIVE_PARAMS, apply: bool = False) -> dict:
+    """
+    Recompute every rating from the match history since `since_match_id`
+    (default: the start of the current season), starting each player at
+    START_ELO.
+
+    With apply=True the players table, stored per-match gains and the
+    checkpoints are replaced in one transaction. Returns a summary with
+    {player_id: (current elo, replayed elo)} under "changes".
+    """
+    started = time.perf_counter()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if apply:
+                hold_rating_lock(cursor, exclusive=True)
+
+            if since_match_id is None:
+                since_match_id = season_start(cursor) + 1
+                if since_match_id == 1:
+                    cursor.execute("SELECT COALESCE(MIN(match_id), 1) AS first FROM matches")
+                    since_match_id = cursor.fetchone()['first']
+
+            state = RatingState()
+            history = load_history(cursor, state, after_match_id=since_match_id - 1)
+
+            if apply:
+                cursor.execute("DELETE FROM rating_checkpoints")
+                # Base checkpoint: everyone unrated just before the first match
+                _save_checkpoint(cursor, since_match_id - 1, RatingState())
+                gains = _replay_with_checkpoints(cursor, state, history, params)
+            else:
+                gains = None
+                replay(state, history, params)
+
+            current = _current_elos(cursor, state.player_ids)
+            changes = {
+                pid: (current.get(pid), float(state.elo[0, i]))
+                for i, pid in enumerate(state.player_ids)
+            }
+
+            if apply:
+                _write_players(cursor, state, range(len(state.player_ids)))
+                _write_gains(cursor, state, history, gains)
+                conn.commit()
+            else:
+                conn.rollback()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return {
+        "since_match_id": since_match_id,
+        "matches": len(history.match_ids),
+        "skipped": history.skipped,
+        "players": len(state.player_ids),
+        "seconds": time.perf_counter() - started,
+        "applied": apply,
+        "changes": changes,
+    }
+
+
+def rollback_match(match_id: int, params: EloParams = LIVE_PARAMS):
+    """
+    Undo a match and recompute every rating that depended on it.
+
+    The latest match is simply subtracted. For older matches the state is
+    restored from the nearest checkpoint before it and the later matches are
+    replayed without it. Returns (success, message) like db_utils.rollback_match.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            hold_rating_lock(cursor, exclusive=True)
+
+            cursor.execute("SELECT raw_data FROM matches WHERE match_id = %s FOR UPDATE", (match_id,))
+            match = cursor.fetchone()
+            if not match:
+                conn.rollback()
+                return False, "No matches to rollback"
+
+            if match_id <= season_start(cursor):
+                conn.rollback()
+                return False, "That match belongs to a previous season; ratings have been reset since"
+
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM matches WHERE match_id > %s) AS later", (match_id,))
+            later = cursor.fetchone()['later']
+            checkpoint = _load_checkpoint(cursor, match_id) if later else None
+
+            if checkpoint is None:
+                success, message = _rollback_match(cursor, match_id)
+                if success:
+                    conn.commit()
+                    if later:
+                        logging.warning(f"[replay] No checkpoint before match {match_id}; later ratings were not replayed")
+                        message += " (no checkpoint: later matches were not re-rated)"
+                else:
+                    conn.rollback()
+                return success, message
+
+            raw = match['raw_data'] if isinstance(match['raw_data'], dict) else json.loads(match['raw_data'])
+
+            state = RatingState(
+                checkpoint['player_ids'],
+                checkpoint['elo'],
+                checkpoint['games_played'],
+                checkpoint['wins'],
+            )
+            history = load_history(
+                cursor, state,
+                after_match_id=checkpoint['match_id'],
+                exclude_match_id=match_id,
+            )
+            # The undone match's players change even if they never played again
+            removed = state.indices((_side_ids(raw.get("blue_team")) or []) + (_side_ids(raw.get("red_team")) or []))
+
+            cursor.execute("DELETE FROM rating_checkpoints WHERE match_id >= %s", (match_id,))
+            gains = _replay_with_checkpoints(cursor, state, history, params)
+
+            touched = set(removed)
+            touched.update(history.winners.ravel().tolist())
+            touched.update(history.losers.ravel().tolist())
+            _write_players(cursor, state, touched)
+            _write_gains(cursor, state, history, gains)
+
+            _revert_character_stats(cursor, raw)
+            cursor.execute("DELETE FROM matches WHERE match_id = %s", (match_id,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    return True, f"Match rollback successful ({len(history.match_ids)} later matches re-rated)"
+
+
+def set_rating(player_id: str, elo: int):
+    """Set one player's rating by hand and rebase the checkpoints on it, so undos keep it."""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            hold_rating_lock(cursor, exclusive=True)
+            _lock_players(cursor, [player_id], create_missing=True)
+            cursor.execute("UPDATE players SET elo = %s WHERE discord_id = %s", (elo, str(player_id)))
+            rebase_checkpoints(cursor)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+
+def reset_season() -> int:
+    """
+    Start a new season: every player back to START_ELO with no games played.
+
+    Checkpoints are rebased on the reset ratings and the boundary is
+    recorded, so undos and replays never reach back into last season.
+    Returns the last match_id of the season that ended.
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            hold_rating_lock(cursor, exclusive=True)
+            cursor.execute(
+                "UPDATE players SET elo = %s, win_rate = 0.0, wins = 0, games_played = 0",
+                (START_ELO,)
+            )
+            boundary = rebase_checkpoints(cursor)
+            cursor.execute("INSERT INTO rating_seasons (starts_after_match_id) VALUES (%s)", (boundary,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return boundary
+
+
+def rollback_matches(match_ids):
+    """Undo several matches, newest first, stopping at the first failure."""
+    undone = 0
+    for match_id in sorted(match_ids, reverse=True):
+        success, message = rollback_match(match_id)
+        if not success:
+            if undone:
+                message = f"{message} (after undoing {undone} of {len(match_ids)} matches)"
+            return False, message
+        undone += 1
+    if len(match_ids) == 1:
+        return True, message
+    return True, f"Rollback of {undone} matches successful"
+
+
+# ───────────────────────────── CLI ─────────────────────────────
+
+def _format_summary(summary: dict, limit: int = 15) -> str:
+    movers = sorted(
+        ((pid, old, new) for pid, (old, new) in summary["changes"].items() if old is not None),
+        key=lambda x: abs(x[2] - x[1]),
+        reverse=True
+    )[:limit]
+    lines = [
+        f"Replayed {summary['matches']} matches from #{summary['since_match_id']} "
+        f"({summary['skipped']} skipped) for {summary['players']} players "
+        f"in {summary['seconds']:.2f}s — {'applied' if summary['applied'] else 'dry run'}"
+    ]
+    lines += [f"  {pid}: {old:.2f} -> {new:.2f} ({new - old:+.2f})" for pid, old, new in movers]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m utils.replay", description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    rebuild = sub.add_parser("rebuild", help="recompute all ratings from the match history")
+    rebuild.add_argument("--since", type=int, default=None, help="first match_id of the season")
+    rebuild.add_argument("--apply", action="store_true", help="write results (default: dry run)")
+    for field, default in zip(EloParams._fields, LIVE_PARAMS):
+        rebuild.add_argument(f"--{field.replace('_', '-')}", type=float, default=default)
+
+    rollback = sub.add_parser("rollback", help="undo one match and re-rate everything after it")
+    rollback.add_argument("match_id", type=int)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s: %(message)s')
+
+    if args.command == "rebuild":
+        params = EloParams(*(getattr(args, f) for f in EloParams._fields))
+        print(_format_summary(rebuild_ratings(args.since, params, apply=args.apply)))
+    else:
+        success, message = rollback_match(args.match_id)
+        print(message)
+        raise SystemExit(0 if success else 1)
+
+
+if __name__ == "__main__":
+    main()
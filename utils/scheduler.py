@@ -0,0 +1,132 @@
+"""
+One coroutine driving every queue timer.
+
+Timers live in a heap of (deadline, seq, kind, key) entries. schedule() is
+O(log n); cancel() only forgets the timer, and its heap entry is skipped
+when it surfaces (lazy cancel). A timer is identified by (kind, key), so
+scheduling the same one again simply moves its deadline. Handlers are
+registered per kind and awaited one at a time by the scheduler itself, so
+no task is created per timer.
+
+The clock is injectable: with a fake clock, run_due() fires whatever is due
+without any real waiting.
+"""
+import asyncio
+import heapq
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+Handler = Callable[[Hashable, Any], Awaitable[None]]
+
+
+class _Timer(NamedTuple):
+    deadline: float
+    seq: int
+    payload: Any
+
+
+class TimerScheduler:
+    def __init__(self, handlers: Dict[str, Handler], clock: Callable[[], float] = time.monotonic):
+        self.handlers = handlers
+        self.clock = clock
+        self._heap: List[Tuple[float, int, str, Hashable]] = []
+        self._timers: Dict[Tuple[str, Hashable], _Timer] = {}
+        self._seq = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, timer: Tuple[str, Hashable]) -> bool:
+        return timer in self._timers
+
+    # ───────────── scheduling ─────────────
+
+    def schedule(self, kind: str, key: Hashable = None, delay: float = 0.0, payload: Any = None):
+        """Fire handlers[kind](key, payload) after `delay` seconds, replacing any pending (kind, key) timer."""
+        if kind not in self.handlers:
+            raise KeyError(f"No handler for timer kind {kind!r}")
+        self._seq += 1
+        deadline = self.clock() + max(0.0, delay)
+        self._timers[(kind, key)] = _Timer(deadline, self._seq, payload)
+        heapq.heappush(self._heap, (deadline, self._seq, kind, key))
+        self._compact()
+        self._poke(deadline)
+
+    def cancel(self, kind: str, key: Hashable = None) -> bool:
+        return self._timers.pop((kind, key), None) is not None
+
+    def cancel_kind(self, kind: str):
+        for timer in [t for t in self._timers if t[0] == kind]:
+            del self._timers[timer]
+
+    def deadline(self, kind: str, key: Hashable = None) -> Optional[float]:
+        timer = self._timers.get((kind, key))
+        return timer.deadline if timer else None
+
+    def _compact(self):
+        # Cancelled entries stay in the heap until they surface; rebuild once they dominate it
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._timers):
+            self._heap = [(t.deadline, t.seq, kind, key) for (kind, key), t in self._timers.items()]
+            heapq.heapify(self._heap)
+
+    # ───────────── firing ─────────────
+
+    async def run_due(self, now: Optional[float] = None) -> int:
+        """Fire every timer due by `now` (default: the clock), earliest first; returns how many fired."""
+        now = self.clock() if now is None else now
+        fired = 0
+        while self._heap and self._heap[0][0] <= now:
+            _, seq, kind, key = heapq.heappop(self._heap)
+            timer = self._timers.get((kind, key))
+            if timer is None or timer.seq != seq:
+                continue  # cancelled or rescheduled
+            del self._timers[(kind, key)]
+            fired += 1
+            try:
+                await self.handlers[kind](key, timer.payload)
+            except Exception as e:
+                logging.error(f"[Timers] {kind} timer for {key!r} failed: {e}")
+        return fired
+
+    def _next_delay(self) -> Optional[float]:
+        while self._heap:
+            _, seq, kind, key = self._heap[0]
+            timer = self._timers.get((kind, key))
+            if timer is not None and timer.seq == seq:
+                return max(0.0, timer.deadline - self.clock())
+            heapq.heappop(self._heap)
+        return None
+
+    def _poke(self, deadline: float):
+        if self._task is None or self._task.done():
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                return  # no loop yet (e.g. driven by run_due in a test)
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+        elif self._heap[0][0] == deadline:
+            self._wake.set()  # new earliest timer; re-arm the sleep
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            delay = self._next_delay()
+            self._wake.clear()
+            handle = loop.call_later(delay, self._wake.set) if delay is not None else None
+            try:
+                await self._wake.wait()
+            finally:
+                if handle is not None:
+                    handle.cancel()
+            await self.run_due()
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._timers.clear()
+        self._heap.clear()
@@ -0,0 +1,119 @@
+"""
+What-if simulator for the ELO formula parameters.
+
+Replays the whole match history once for a grid of EloParams, with every
+parameter set in its own row of the rating matrix, and reports per set:
+
+- log_loss:  how well the pre-match team averages predicted the winner
+- inflation: mean rating of everyone who played, minus the starting ELO
+- top15:     rating spread (highest minus 15th) among active players
+
+    python -m utils.simulate --base-gain 20,25,30 --gain-taper 25,30,40
+    python -m utils.simulate --dsn postgresql://localhost/cipher_snapshot --csv grid.csv
+"""
+import argparse
+import csv
+import itertools
+import sys
+import time
+from typing import List
+
+import numpy as np
+
+from utils.db_utils import get_connection
+from utils.replay import EloParams, LIVE_PARAMS, RatingState, START_ELO, load_history, replay
+
+TOP_N = 15
+# Rating difference at which the stronger team is expected to win 10:1
+DEFAULT_SCALE = 400
+
+
+def parameter_grid(values: dict) -> List[EloParams]:
+    """Cartesian product of {field: [values]}; fields left out keep the live value."""
+    axes = [values.get(field) or [default] for field, default in zip(EloParams._fields, LIVE_PARAMS)]
+    return [EloParams(*combo) for combo in itertools.product(*axes)]
+
+
+def simulate(history, player_ids: list, grid: List[EloParams], scale: float = DEFAULT_SCALE,
+             min_games: int = 1) -> List[dict]:
+    """Replay `history` once for every parameter set in `grid` and score each."""
+    state = RatingState(player_ids, n_params=len(grid))
+    log_loss = np.zeros(len(grid))
+
+    def score(m, winner_avg, loser_avg):
+        # P(winner) = 1 / (1 + 10^((loser - winner) / scale)), accumulated as -log P
+        log_loss[:] += np.logaddexp(0, (loser_avg[:, 0] - winner_avg[:, 0]) * (np.log(10) / scale))
+
+    replay(state, history, grid, on_match=score)
+
+    matches = max(len(history.match_ids), 1)
+    active = state.games >= min_games
+    elo = state.elo[:, active]
+    top = -np.sort(-elo, axis=1)[:, :TOP_N]
+
+    results = []
+    for k, params in enumerate(grid):
+        results.append({
+            **params._asdict(),
+            "log_loss": float(log_loss[k] / matches),
+            "inflation": float(elo[k].mean() - START_ELO) if elo.shape[1] else 0.0,
+            "top15": float(top[k, 0] - top[k, -1]) if top.shape[1] else 0.0,
+        })
+    return results
+
+
+def _float_list(text: str) -> List[float]:
+    return [float(v) for v in text.split(",") if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.simulate",
+        description="Score a grid of ELO formula parameters against the match history."
+    )
+    parser.add_argument("--dsn", default=None, help="database to read (default: DATABASE_URL)")
+    parser.add_argument("--since", type=int, default=0, help="first match_id to replay")
+    parser.add_argument("--scale", type=float, default=DEFAULT_SCALE, help="logistic scale for log-loss")
+    parser.add_argument("--min-games", type=int, default=1, help="games needed to count towards inflation/top15")
+    parser.add_argument("--sort", default="log_loss", choices=["log_loss", "inflation", "top15"])
+    parser.add_argument("--csv", default=None, help="also write every result row to this file")
+    for field, default in zip(EloParams._fields, LIVE_PARAMS):
+        parser.add_argument(
+            f"--{field.replace('_', '-')}", type=_float_list, default=None,
+            help=f"comma-separated values (live: {default})"
+        )
+    args = parser.parse_args(argv)
+
+    grid = parameter_grid({field: getattr(args, field) for field in EloParams._fields})
+
+    started = time.perf_counter()
+    with get_connection(args.dsn) as conn:
+        cursor = conn.cursor()
+        index = RatingState()
+        history = load_history(cursor, index, after_match_id=args.since - 1)
+    loaded = time.perf_counter()
+
+    results = simulate(history, index.player_ids, grid, scale=args.scale, min_games=args.min_games)
+    results.sort(key=lambda r: r[args.sort])
+    finished = time.perf_counter()
+
+    print(
+        f"{len(history.match_ids)} matches, {len(index.player_ids)} players, {len(grid)} parameter sets "
+        f"(load {loaded - started:.2f}s, simulate {finished - loaded:.2f}s)"
+    )
+    varied = [f for f in EloParams._fields if len(getattr(args, f) or []) > 1] or ["base_gain"]
+    header = varied + ["log_loss", "inflation", "top15"]
+    print("  ".join(f"{h:>12}" for h in header))
+    for row in results[:25]:
+        print("  ".join(f"{row[h]:>12.4f}" for h in header))
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+            writer.writeheader()
+            writer.writerows(results)
+        print(f"Wrote {len(results)} rows to {args.csv}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
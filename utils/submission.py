@@ -0,0 +1,123 @@
+"""Parsing of the draft website's match submission string."""
+
+
+def parse_submission_string(submission: str):
+    # Slot map by position
+    slot_map = {
+        1: ("blue_bans", 2),
+        2: ("red_bans", 2),
+        3: ("blue_picks", 4),
+        4: ("red_picks", 4),
+        5: ("red_picks", 4),
+        6: ("blue_picks", 4),
+        7: ("blue_bans", 2),
+        8: ("red_bans", 2),
+        9: ("red_picks", 4),
+        10: ("blue_picks", 4),
+        11: ("blue_picks", 4),
+        12: ("red_picks", 4),
+        13: ("red_picks", 4),
+        14: ("blue_picks", 4),
+        15: ("blue_picks", 4),
+        16: ("red_picks", 4),
+        17: ("red_picks", 4),
+        18: ("blue_picks", 4),
+        19: ("blue_picks", 4),
+        20: ("red_picks", 4)
+    }
+
+    index = 0
+    parsed = {
+        "blue_bans": [], "red_bans": [],
+        "blue_picks": [], "red_picks": []
+    }
+
+    for slot in range(1, 21):
+        key, length = slot_map[slot]
+        raw = submission[index:index + length]
+        if length == 2:
+            parsed[key].append({"code": raw})
+        else:
+            parsed[key].append({
+                "code": raw[:2],
+                "eidolon": int(raw[2]),
+                "superimposition": int(raw[3])
+            })
+        index += length
+        
+    blue_first = int(submission[index:index+2])
+    index += 2
+    blue_second = int(submission[index:index+2])
+    index += 2
+    red_first = int(submission[index:index+2])
+    index += 2
+    red_second = int(submission[index:index+2])
+    index += 2
+
+    for name, value in zip(["blue_first", "blue_second", "red_first", "red_second"],
+                           [blue_first, blue_second, red_first, red_second]):
+        if value < 0 or value > 15:
+            raise ValueError(
+                f"U-Um… `{name}` was `{value}`, but only 0 to 15 cycles are allowed! "
+                "I’m really sorry… could you double-check your code?"
+            )
+
+    blue_cycle_penalty = int(submission[index:index+2])
+    index += 2
+    red_cycle_penalty = int(submission[index:index+2])
+    index += 2
+
+    blue_time_penalty = int(submission[index:index+2])
+    index += 2
+    red_time_penalty = int(submission[index:index+2])
+    index += 2
+
+    blue_penalty = blue_cycle_penalty + blue_time_penalty
+    red_penalty = red_cycle_penalty + red_time_penalty
+
+    blue_points = int(submission[index:index+2])
+    index += 2
+    red_points = int(submission[index:index+2])
+    index += 2
+
+    side_selector = submission[index]  # 'b' or 'r'
+    index += 1
+
+    # Parse prebans and jokers
+    split = submission[index:].split("|")
+    prebans = [split[0][i:i + 2] for i in range(0, len(split[0]), 2)] if split and split[0] else []
+    jokers = [split[1][i:i + 2] for i in range(0, len(split[1]), 2)] if len(split) > 1 else []
+
+    total_blue_cycles = blue_first + blue_second + blue_penalty
+    total_red_cycles = red_first + red_second + red_penalty
+
+    if total_blue_cycles < total_red_cycles:
+        winner = "blue"
+    elif total_red_cycles < total_blue_cycles:
+        winner = "red"
+    else:
+        # Cycle clear is tied, check points
+        if blue_points < red_points:
+            winner = "blue"
+        elif red_points < blue_points:
+            winner = "red"
+        else:
+            # Both cycle clear and points are tied
+            winner = "tie"
+    
+    parsed.update({
+        "blue_cycles": [blue_first, blue_second],
+        "red_cycles": [red_first, red_second],
+        "blue_penalty": blue_penalty,
+        "red_penalty": red_penalty,
+        "blue_points": blue_points,
+        "red_points": red_points,
+        "winner": winner,
+        "prebans": prebans,
+        "jokers": jokers,
+        "total_blue_cycles": total_blue_cycles,
+        "total_red_cycles": total_red_cycles,
+        "side_selector": side_selector
+    })
+
+    return parsed
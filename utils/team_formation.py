@@ -0,0 +1,171 @@
+"""
+Team formation for the matchmaking queues.
+
+A group of four has three possible 2v2 splits; best_split() scores each by
+ELO gap and prebans-points gap and keeps the most even one. With more than
+four people waiting, form_matches() repeatedly anchors on the player who
+has waited longest, looks for partners in nearby rating buckets only, and
+picks the group whose imbalance, minus a bonus for how long its members
+have waited, is lowest. Everyone eventually gets matched: the longest
+waiter is always in the next group. form_duels() does the same for 1v1
+queues, pairing each anchor with the closest opponent.
+"""
+import itertools
+import math
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, NamedTuple, Sequence, Tuple
+
+from utils.db_utils import initialize_player_data
+
+# One "unit" of imbalance: 100 ELO apart, or 100 points (= one preban) apart
+ELO_SCALE = float(os.getenv("TEAM_ELO_SCALE", "100"))
+POINTS_SCALE = float(os.getenv("TEAM_POINTS_SCALE", "100"))
+# Imbalance units forgiven per minute a player has been waiting
+WAIT_WEIGHT = float(os.getenv("TEAM_WAIT_WEIGHT", "0.05"))
+WAIT_CAP_MINUTES = 30
+# Rating buckets: partners come from the anchor's bucket outwards until
+# there are CANDIDATES of them, so cost stays flat however long the queue is
+BUCKET_WIDTH = 100
+CANDIDATES = 11
+
+DEFAULT_ELO = initialize_player_data("")["elo"]
+
+# The three ways to split four players into two pairs
+SPLITS = (((0, 1), (2, 3)), ((0, 2), (1, 3)), ((0, 3), (1, 2)))
+
+
+class Candidate(NamedTuple):
+    uid: int
+    elo: float
+    points: float
+    waited: float  # seconds in the queue
+
+
+class Formation(NamedTuple):
+    team1: Tuple[int, ...]
+    team2: Tuple[int, ...]
+    imbalance: float
+
+
+def candidates_from(queue: Iterable[int], players: Dict[str, dict], waited: Dict[int, float]) -> List[Candidate]:
+    """Queued user IDs + player rows (load_elo_data() shape) + seconds waited -> candidates; unknown players get starting ELO."""
+    out = []
+    for uid in queue:
+        row = players.get(str(uid)) or {}
+        out.append(Candidate(uid, float(row.get("elo") or DEFAULT_ELO), float(row.get("points") or 0), waited.get(uid, 0.0)))
+    return out
+
+
+def pair_points(a: Candidate, b: Candidate) -> float:
+    """Same weighting the prebans calculation uses for a 2-player team."""
+    low, high = sorted((a.points, b.points))
+    return 0.65 * low + 0.35 * high
+
+
+def split_imbalance(t1: Tuple[Candidate, Candidate], t2: Tuple[Candidate, Candidate]) -> float:
+    elo_gap = abs((t1[0].elo + t1[1].elo) - (t2[0].elo + t2[1].elo)) / 2
+    points_gap = abs(pair_points(*t1) - pair_points(*t2))
+    return elo_gap / ELO_SCALE + points_gap / POINTS_SCALE
+
+
+def duel_imbalance(a: Candidate, b: Candidate) -> float:
+    return abs(a.elo - b.elo) / ELO_SCALE + abs(a.points - b.points) / POINTS_SCALE
+
+
+def best_split(group: Sequence[Candidate]) -> Formation:
+    """Most balanced of the three 2v2 splits of a group of four."""
+    best = None
+    for (a, b), (c, d) in SPLITS:
+        t1, t2 = (group[a], group[b]), (group[c], group[d])
+        score = split_imbalance(t1, t2)
+        if best is None or score < best[0]:
+            best = (score, t1, t2)
+    score, t1, t2 = best
+    return Formation((t1[0].uid, t1[1].uid), (t2[0].uid, t2[1].uid), score)
+
+
+def _wait_bonus(members: Sequence[Candidate]) -> float:
+    return WAIT_WEIGHT * sum(min(m.waited / 60, WAIT_CAP_MINUTES) for m in members)
+
+
+def _nearby(anchor: Candidate, buckets: Dict[int, List[Candidate]]) -> List[Candidate]:
+    """Up to CANDIDATES partners, taken bucket by bucket outwards from the anchor's rating."""
+    home = math.floor(anchor.elo / BUCKET_WIDTH)
+    lowest, highest = min(buckets), max(buckets)
+    found: List[Candidate] = []
+    for step in itertools.count():
+        if home - step < lowest and home + step > highest:
+            break
+        for key in {home - step, home + step}:
+            found.extend(c for c in buckets.get(key, ()) if c.uid != anchor.uid)
+        if len(found) >= CANDIDATES:
+            break
+    found.sort(key=lambda c: abs(c.elo - anchor.elo))
+    return found[:CANDIDATES]
+
+
+def _take(buckets: Dict[int, List[Candidate]], c: Candidate):
+    key = math.floor(c.elo / BUCKET_WIDTH)
+    buckets[key].remove(c)
+    if not buckets[key]:
+        del buckets[key]
+
+
+def form_matches(candidates: Sequence[Candidate]) -> List[Formation]:
+    """
+    Split everyone who can be matched into balanced 2v2 games.
+
+    Candidates are expected in queue order; at most len // 4 matches are
+    formed and the leftovers stay queued.
+    """
+    remaining = sorted(candidates, key=lambda c: -c.waited)
+    by_uid = {c.uid: c for c in remaining}
+    buckets: Dict[int, List[Candidate]] = defaultdict(list)
+    for c in remaining:
+        buckets[math.floor(c.elo / BUCKET_WIDTH)].append(c)
+
+    matches: List[Formation] = []
+    taken = set()
+    for anchor in remaining:
+        if len(remaining) - len(taken) < 4:
+            break
+        if anchor.uid in taken:
+            continue
+
+        best = None
+        for trio in itertools.combinations(_nearby(anchor, buckets), 3):
+            formation = best_split((anchor, *trio))
+            cost = formation.imbalance - _wait_bonus(trio)
+            if best is None or cost < best[0]:
+                best = (cost, formation)
+
+        formation = best[1]
+        matches.append(formation)
+        for uid in (*formation.team1, *formation.team2):
+            taken.add(uid)
+            _take(buckets, by_uid[uid])
+    return matches
+
+
+def form_duels(candidates: Sequence[Candidate]) -> List[Formation]:
+    """1v1 version of form_matches(): pair each longest waiter with their closest available opponent."""
+    remaining = sorted(candidates, key=lambda c: -c.waited)
+    buckets: Dict[int, List[Candidate]] = defaultdict(list)
+    for c in remaining:
+        buckets[math.floor(c.elo / BUCKET_WIDTH)].append(c)
+
+    matches: List[Formation] = []
+    taken = set()
+    for anchor in remaining:
+        if len(remaining) - len(taken) < 2:
+            break
+        if anchor.uid in taken:
+            continue
+
+        opponent = min(_nearby(anchor, buckets), key=lambda c: duel_imbalance(anchor, c) - _wait_bonus((c,)))
+        matches.append(Formation((anchor.uid,), (opponent.uid,), duel_imbalance(anchor, opponent)))
+        for c in (anchor, opponent):
+            taken.add(c.uid)
+            _take(buckets, c)
+    return matches
@@ -5,15 +5,9 @@ from discord import ui
 from discord import Interaction
 from discord import Embed
 from datetime import datetime
-from utils.rank_utils import update_rank_role, get_rank
-from utils.db_utils import ( 
-    save_elo_data, 
-    load_elo_data, 
-    save_match_history,
-    rollback_match,
-    calculate_team_elo_change,
-    update_character_table_stats
-)
+from utils.rank_worker import rank_role_worker
+from utils.db_utils import commit_match, commit_series
+from utils.replay import rollback_matches
 logging.basicConfig(level=logging.DEBUG)
 class UpdateEloView(ui.View):
     def __init__(self, blue_team, red_team, blue_scores, red_scores, blue_cycle_penalty, red_cycle_penalty, allowed_user_id, match_data):
@@ -25,7 +19,6 @@ class UpdateEloView(ui.View):
         self.blue_cycle_penalty = blue_cycle_penalty
         self.red_cycle_penalty = red_cycle_penalty
         self.allowed_user_id = allowed_user_id
-        self.elo_data = load_elo_data()
         self.elo_gains={}
         self.match_data = match_data
 
@@ -101,41 +94,6 @@ class UpdateEloView(ui.View):
                 tiebreaker_view.message = message
                 return
 
-        processed_ids = set()
-        self.elo_gains = {}
-
-        all_players = winner_team + loser_team
-        all_scores = winner_scores + loser_scores
-        avg_team_cycle = (sum(self.blue_scores) + sum(self.red_scores)) / len(all_players)
-
-        # Get average ELO for each team
-        winner_elos = [self.elo_data.get(str(p.id), {"elo": 200})["elo"] for p in winner_team]
-        loser_elos = [self.elo_data.get(str(p.id), {"elo": 200})["elo"] for p in loser_team]
-        avg_winner_elo = sum(winner_elos) / len(winner_elos)
-        avg_loser_elo = sum(loser_elos) / len(loser_elos)
-
-        base_gain = 25
-        base_loss = 20
-        variance_gain = 1.5
-        variance_loss = 0.65
-
-        self.elo_gains = calculate_team_elo_change(
-            winning_team=winner_team,
-            losing_team=loser_team,
-            elo_data=self.elo_data,
-            base_gain=25,
-            base_loss=20,
-            variance_gain=1.5,
-            variance_loss=0.65
-        )
-        save_elo_data(self.elo_data)
-
-        await asyncio.to_thread(
-            update_character_table_stats,
-            self.match_data,
-            winning_team=self.match_data["winner"]
-        )
-
         match_data = {
             "date": datetime.now().strftime("%d/%m/%Y"),
             "blue_team": [{"id": str(p.id), "name": p.display_name, "cycles": s} for p, s in zip(self.blue_team, self.blue_scores)],
@@ -145,7 +103,7 @@ class UpdateEloView(ui.View):
             "blue_penalty": self.blue_cycle_penalty,
             "red_penalty": self.red_cycle_penalty,
             "winner": "blue" if winner_team == self.blue_team else "red",
-            "elo_gains": self.elo_gains,
+            "elo_gains": {},
             "blue_picks": self.match_data["blue_picks"],
             "red_picks": self.match_data["red_picks"],
             "blue_bans": self.match_data["blue_bans"],
@@ -154,7 +112,18 @@ class UpdateEloView(ui.View):
             "jokers": self.match_data.get("jokers", [])
         }
 
-        self.elo_data = load_elo_data()
+        # Ratings, character counters and the match row land in one transaction
+        match_id, self.elo_gains = await asyncio.to_thread(
+            commit_match,
+            match_data,
+            winner_team,
+            loser_team,
+            base_gain=25,
+            base_loss=20,
+            variance_gain=1.5,
+            variance_loss=0.65
+        )
+        logging.info(f"Match {match_id} saved successfully for winner: {match_data['winner']}")
 
         embed = discord.Embed(
             title="Threads of Victory",
@@ -184,8 +153,6 @@ class UpdateEloView(ui.View):
             inline=False
         )
 
-        match_id = save_match_history(match_data)
-        logging.info(f"Match {match_id} saved successfully for winner: {match_data['winner']}")
         confirm_view = ConfirmRollbackView(match_id=match_id)
 
         try:
@@ -204,25 +171,8 @@ class UpdateEloView(ui.View):
             logging.error(f"❌ Unexpected error while sending result: {e}")
 
 
-        await asyncio.sleep(1)
-
-        for player_id, change in self.elo_gains.items():
-            member = interaction.guild.get_member(int(player_id))
-            if member:
-                previous_elo = self.elo_data[str(player_id)]["elo"] - change
-                old_rank = get_rank(previous_elo, player_id=member.id, elo_data=self.elo_data)
-
-                new_elo = self.elo_data[str(player_id)]["elo"]
-                new_rank = get_rank(new_elo, player_id=member.id, elo_data=self.elo_data)
-
-                await update_rank_role(
-                    member,
-                    new_elo,
-                    self.elo_data,
-                    channel=interaction.channel,
-                    announce_demotions=True,
-                    force_old_rank=old_rank 
-                )
+        # Role edits and rank announcements happen in the background worker
+        rank_role_worker.enqueue(interaction.guild, self.elo_gains, interaction.channel)
 
 
     @ui.button(label="Cancel", style=discord.ButtonStyle.red)
@@ -243,7 +193,6 @@ class TiebreakerView(ui.View):
         self.red_total_score = red_total_score
         self.elo_gains = elo_gains
         self.allowed_user_id = allowed_user_id
-        self.elo_data = load_elo_data()
         self.match_data = match_data
         self.message = None
 
@@ -291,38 +240,8 @@ class TiebreakerView(ui.View):
     async def handle_tiebreaker(self, interaction: Interaction, winner_team, loser_team):
         if not interaction.response.is_done():
             await interaction.response.defer()
-        processed_ids = set()
-        self.elo_gains = {}
-
-        winner_scores = self.blue_scores if winner_team == self.blue_team else self.red_scores
-        loser_scores = self.red_scores if loser_team == self.red_team else self.blue_scores
-
-        avg_team_cycle = (sum(self.blue_scores) + sum(self.red_scores)) / (len(winner_team) + len(loser_team))
-
-        winner_elos = [self.elo_data.get(str(p.id), {"elo": 200})["elo"] for p in winner_team]
-        loser_elos = [self.elo_data.get(str(p.id), {"elo": 200})["elo"] for p in loser_team]
-        avg_winner_elo = sum(winner_elos) / len(winner_elos)
-        avg_loser_elo = sum(loser_elos) / len(loser_elos)
-
-        self.elo_gains = calculate_team_elo_change(
-            winning_team=winner_team,
-            losing_team=loser_team,
-            elo_data=self.elo_data,
-            base_gain=25,
-            base_loss=20,
-            variance_gain=1.5,
-            variance_loss=0.65
-        )
-        save_elo_data(self.elo_data)
-
         self.match_data["winner"] = "blue" if winner_team == self.blue_team else "red"
 
-        await asyncio.to_thread(
-            update_character_table_stats,
-            self.match_data,
-            winning_team=self.match_data["winner"]
-        )
-
         match_data = {
             "date": datetime.now().strftime("%d/%m/%Y"),
             "blue_team": [
@@ -338,7 +257,7 @@ class TiebreakerView(ui.View):
             "blue_penalty": self.blue_cycle_penalty,
             "red_penalty": self.red_cycle_penalty,
             "winner": "blue" if winner_team == self.blue_team else "red",
-            "elo_gains": self.elo_gains,
+            "elo_gains": {},
             "blue_picks": self.match_data["blue_picks"],
             "red_picks": self.match_data["red_picks"],
             "blue_bans": self.match_data["blue_bans"],
@@ -347,7 +266,17 @@ class TiebreakerView(ui.View):
             "jokers": self.match_data.get("jokers", [])
         }
 
-        self.elo_data = load_elo_data()
+        match_id, self.elo_gains = await asyncio.to_thread(
+            commit_match,
+            match_data,
+            winner_team,
+            loser_team,
+            base_gain=25,
+            base_loss=20,
+            variance_gain=1.5,
+            variance_loss=0.65
+        )
+        logging.info(f"Match {match_id} saved successfully for winner: {match_data['winner']}")
 
         embed = Embed(
             title="Tiebreaker Results: Fate Has Decided",
@@ -388,8 +317,6 @@ class TiebreakerView(ui.View):
             inline=False
         )
 
-        match_id = save_match_history(match_data)
-        logging.info(f"Match {match_id} saved successfully for winner: {match_data['winner']}")
         confirm_view = ConfirmRollbackView(match_id=match_id)
 
         try:
@@ -408,32 +335,155 @@ class TiebreakerView(ui.View):
             logging.error(f"❌ Unexpected error while sending tiebreaker result: {e}")
 
 
-        await asyncio.sleep(1)
+        # Role edits and rank announcements happen in the background worker
+        rank_role_worker.enqueue(interaction.guild, self.elo_gains, interaction.channel)
+        
+        self.stop()
 
-        for player_id, change in self.elo_gains.items():
-            member = interaction.guild.get_member(int(player_id))
-            if member:
-                previous_elo = self.elo_data[str(player_id)]["elo"] - change
-                old_rank = get_rank(previous_elo, player_id=member.id, elo_data=self.elo_data)
+class SeriesConfirmView(ui.View):
+    """Confirmation for /submit-series: every game is committed in one transaction."""
 
-                new_elo = self.elo_data[str(player_id)]["elo"]
-                new_rank = get_rank(new_elo, player_id=member.id, elo_data=self.elo_data)
+    def __init__(self, blue_team, red_team, games, allowed_user_id):
+        super().__init__(timeout=300)
+        self.blue_team = blue_team
+        self.red_team = red_team
+        self.games = games  # parsed submission strings, in play order
+        self.allowed_user_id = allowed_user_id
 
-                await update_rank_role(
-                    member,
-                    new_elo,
-                    self.elo_data,
-                    channel=interaction.channel,
-                    announce_demotions=True,
-                    force_old_rank=old_rank 
-                )
-        
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        if interaction.user.id != self.allowed_user_id:
+            await interaction.response.send_message(
+                "<:Unamurice:1349309283669377064> I’m sorry, but you’re not allowed to interact with this…\n"
+                "I must respectfully ask for your understanding.",
+                ephemeral=True
+            )
+            return False
+        return True
+
+    def _match_record(self, data):
+        return {
+            "date": datetime.now().strftime("%d/%m/%Y"),
+            "blue_team": [{"id": str(p.id), "name": p.display_name, "cycles": s} for p, s in zip(self.blue_team, data["blue_cycles"])],
+            "red_team": [{"id": str(p.id), "name": p.display_name, "cycles": s} for p, s in zip(self.red_team, data["red_cycles"])],
+            "blue_score": data["total_blue_cycles"],
+            "red_score": data["total_red_cycles"],
+            "blue_penalty": data["blue_penalty"],
+            "red_penalty": data["red_penalty"],
+            "winner": data["winner"],
+            "elo_gains": {},
+            "blue_picks": data["blue_picks"],
+            "red_picks": data["red_picks"],
+            "blue_bans": data["blue_bans"],
+            "red_bans": data["red_bans"],
+            "prebans": data.get("prebans", []),
+            "jokers": data.get("jokers", [])
+        }
+
+    @ui.button(label="Submit Series", style=discord.ButtonStyle.green)
+    async def submit(self, interaction: discord.Interaction, button: discord.ui.Button):
+        for child in self.children:
+            child.disabled = True
+        await interaction.response.defer()
+        await interaction.message.edit(view=self)
+
+        games = []
+        for data in self.games:
+            match_data = self._match_record(data)
+            if data["winner"] == "blue":
+                games.append((match_data, self.blue_team, self.red_team))
+            else:
+                games.append((match_data, self.red_team, self.blue_team))
+
+        try:
+            results = await asyncio.to_thread(
+                commit_series,
+                games,
+                base_gain=25,
+                base_loss=20,
+                variance_gain=1.5,
+                variance_loss=0.65
+            )
+        except Exception as e:
+            logging.error(f"Series commit failed: {e}")
+            await interaction.followup.send(
+                "I-I'm so sorry… the series could not be woven into fate. Nothing was saved — please try again.",
+                ephemeral=True
+            )
+            self.stop()
+            return
+
+        match_ids = [match_id for match_id, _ in results]
+        logging.info(f"Series saved successfully as matches {match_ids}")
+
+        net_gains = {}
+        for _, elo_gains in results:
+            for player_id, gain in elo_gains.items():
+                net_gains[player_id] = round(net_gains.get(player_id, 0) + gain, 2)
+
+        blue_wins = sum(1 for data in self.games if data["winner"] == "blue")
+        red_wins = len(self.games) - blue_wins
+
+        embed = Embed(
+            title="Threads of Victory: Series Result",
+            color=discord.Color.blue() if blue_wins > red_wins else discord.Color.red()
+        )
+        embed.add_field(
+            name="Blue Team",
+            value=f"{self.blue_team[0].display_name} & {self.blue_team[1].display_name}",
+            inline=True
+        )
+        embed.add_field(
+            name="Red Team",
+            value=f"{self.red_team[0].display_name} & {self.red_team[1].display_name}",
+            inline=True
+        )
+        embed.add_field(
+            name="Games",
+            value="\n".join(
+                f"Game {i}: {data['total_blue_cycles']} vs {data['total_red_cycles']} — {'Blue' if data['winner'] == 'blue' else 'Red'}"
+                for i, data in enumerate(self.games, start=1)
+            ),
+            inline=False
+        )
+        embed.add_field(name="Series Score", value=f"Blue {blue_wins} – {red_wins} Red", inline=False)
+
+        elo_changes_text = "\n".join(
+            f"<@{player_id}>: {'+' if gain >= 0 else ''}{gain:.2f} ELO" if gain != 0 else f"<@{player_id}>: No change"
+            for player_id, gain in sorted(net_gains.items())
+        )
+        embed.add_field(
+            name="ELO Changes",
+            value=elo_changes_text or "No changes to the threads...",
+            inline=False
+        )
+
+        confirm_view = ConfirmRollbackView(match_ids=match_ids)
+
+        try:
+            await interaction.followup.send(embed=embed, view=confirm_view)
+        except discord.NotFound:
+            logging.warning("❌ Webhook expired — posting result to channel instead.")
+            await interaction.channel.send(
+                "⚠️ The interaction expired before I could show the result. Here it is anyway:",
+                embed=embed,
+                view=confirm_view
+            )
+        except Exception as e:
+            logging.error(f"❌ Unexpected error while sending series result: {e}")
+
+        # One rank pass for the whole series
+        rank_role_worker.enqueue(interaction.guild, net_gains, interaction.channel)
+        self.stop()
+
+    @ui.button(label="Cancel", style=discord.ButtonStyle.red)
+    async def cancel(self, interaction: Interaction, button: ui.Button):
+        await interaction.response.send_message("❌ Series update canceled.", ephemeral=False)
         self.stop()
 
 class ConfirmRollbackView(discord.ui.View):
-    def __init__(self, match_id: int):
+    def __init__(self, match_id: int = None, match_ids: list = None):
         super().__init__(timeout=None)
-        self.match_id = match_id  #  Store match ID for targeted rollback
+        self.match_ids = match_ids or [match_id]  #  Store match IDs for targeted rollback
         self.confirmation_active = False
         self.message = None
 
@@ -457,8 +507,8 @@ class ConfirmRollbackView(discord.ui.View):
             return
 
         self.confirmation_active = True
-        #  Pass match_id to ConfirmUndoView
-        confirm_view = ConfirmUndoView(parent_view=self, match_id=self.match_id)
+        #  Pass match IDs to ConfirmUndoView
+        confirm_view = ConfirmUndoView(parent_view=self, match_ids=self.match_ids)
 
         try:
             # Disable all buttons in this view
@@ -468,7 +518,9 @@ class ConfirmRollbackView(discord.ui.View):
 
             # Show confirmation prompt
             await interaction.response.send_message(
-                "⚠️ This action will permanently revert the match you just submitted... Are you sure?",
+                "⚠️ This action will permanently revert the match you just submitted... Are you sure?"
+                if len(self.match_ids) == 1 else
+                f"⚠️ This action will permanently revert all {len(self.match_ids)} games of the series you just submitted... Are you sure?",
                 view=confirm_view,
                 ephemeral=True
             )
@@ -480,10 +532,10 @@ class ConfirmRollbackView(discord.ui.View):
 
 
 class ConfirmUndoView(discord.ui.View):
-    def __init__(self, parent_view: discord.ui.View, match_id: int):
+    def __init__(self, parent_view: discord.ui.View, match_ids: list):
         super().__init__(timeout=300)
         self.parent_view = parent_view
-        self.match_id = match_id
+        self.match_ids = match_ids
         self.message = None
 
     @discord.ui.button(label="CONFIRM UNDO", style=discord.ButtonStyle.danger)
@@ -496,8 +548,8 @@ class ConfirmUndoView(discord.ui.View):
                 return
 
         try:
-            #  Perform rollback of the specific match
-            success, message = rollback_match(self.match_id)
+            #  Perform rollback of the specific match(es)
+            success, message = await asyncio.to_thread(rollback_matches, self.match_ids)
 
             # Disable all buttons in this view
             for item in self.children:
@@ -0,0 +1,99 @@
+"""
+Ordered waiting queue with O(1) join, leave, membership and pop-front.
+
+Backed by an OrderedDict of user ID -> QueueEntry (join time on the wall
+clock and the channel they joined from), so a snapshot can be persisted
+and restored across restarts. Iteration yields user IDs longest-waiting
+first.
+"""
+import statistics
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+
+class QueueEntry(NamedTuple):
+    uid: int
+    joined_at: float                  # time.time() when they joined
+    channel_id: Optional[int] = None  # where they joined from (queue messages go there)
+
+
+class WaitStats(NamedTuple):
+    count: int
+    longest: float  # seconds
+    mean: float
+    median: float
+
+
+class WaitingQueue:
+    def __init__(self, entries: Iterable[QueueEntry] = (), clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._entries: "OrderedDict[int, QueueEntry]" = OrderedDict((e.uid, e) for e in entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __bool__(self) -> bool:
+        return bool(self._entries)
+
+    def __contains__(self, uid: int) -> bool:
+        return uid in self._entries
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self._entries))
+
+    # ───────────── mutation ─────────────
+
+    def join(self, uid: int, joined_at: Optional[float] = None, channel_id: Optional[int] = None) -> Optional[QueueEntry]:
+        """Add to the back; None if they are already queued."""
+        if uid in self._entries:
+            return None
+        entry = QueueEntry(uid, self.clock() if joined_at is None else joined_at, channel_id)
+        self._entries[uid] = entry
+        return entry
+
+    def leave(self, uid: int) -> Optional[QueueEntry]:
+        return self._entries.pop(uid, None)
+
+    def take(self, uids: Iterable[int]) -> List[QueueEntry]:
+        """Remove the given players (e.g. a formed match), wherever they are in line."""
+        return [entry for entry in map(self.leave, uids) if entry is not None]
+
+    def pop_front(self, k: int = 1) -> List[QueueEntry]:
+        out = []
+        while self._entries and len(out) < k:
+            out.append(self._entries.popitem(last=False)[1])
+        return out
+
+    def push_front(self, entries: Iterable[QueueEntry]):
+        """Put players back at the front, keeping their original join times."""
+        for entry in reversed(list(entries)):
+            self._entries[entry.uid] = entry
+            self._entries.move_to_end(entry.uid, last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    # ───────────── queries ─────────────
+
+    def peek(self) -> Optional[int]:
+        """Longest-waiting user ID, or None."""
+        return next(iter(self._entries), None)
+
+    def get(self, uid: int) -> Optional[QueueEntry]:
+        return self._entries.get(uid)
+
+    def waited(self, now: Optional[float] = None) -> Dict[int, float]:
+        """user ID -> seconds in the queue."""
+        now = self.clock() if now is None else now
+        return {uid: max(0.0, now - e.joined_at) for uid, e in self._entries.items()}
+
+    def wait_stats(self, now: Optional[float] = None) -> WaitStats:
+        waits = list(self.waited(now).values())
+        if not waits:
+            return WaitStats(0, 0.0, 0.0, 0.0)
+        return WaitStats(len(waits), max(waits), statistics.fmean(waits), statistics.median(waits))
+
+    def snapshot(self) -> List[QueueEntry]:
+        """Ordered copy of the queue, safe to keep or persist while the queue changes."""
+        return list(self._entries.values())